@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Offline portfolio scoring for QuickFlow Capital
+Scores CSV or Parquet portfolios without the HTTP API: debt-to-income, a local risk score and
+lender matches are computed in vectorized passes over chunks, chunks are spread across a
+process pool, and results stream to a Parquet file as they complete.
+
+The LLM is optional (--llm): only rows whose local score falls in the borderline band are sent,
+through a token bucket so a large portfolio can't exhaust the provider quota.
+
+Run from the backend directory:
+    python batch_score.py portfolio.csv scored.parquet --workers 8 --chunk-size 100000
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import typer
+
+REQUIRED_COLUMNS = [
+    "industry", "years_in_business", "annual_revenue", "credit_score",
+    "monthly_cash_flow", "existing_debt", "loan_amount_requested",
+]
+
+# Same factor weights the analysis prompt gives the LLM
+RISK_WEIGHTS = {
+    "credit": 0.25,
+    "cash_flow": 0.20,
+    "years": 0.15,
+    "debt_to_income": 0.20,
+    "industry": 0.10,
+    "loan_to_revenue": 0.10,
+}
+
+# Relative industry strength (1 = lowest risk); unlisted industries score DEFAULT_INDUSTRY_SCORE
+INDUSTRY_SCORES = {
+    "Healthcare": 0.8, "Professional Services": 0.8, "Technology": 0.7, "Manufacturing": 0.7,
+    "Education": 0.7, "Finance": 0.7, "Agriculture": 0.6, "Construction": 0.5, "Real Estate": 0.5,
+    "Retail": 0.5, "Transportation": 0.5, "E-commerce": 0.5, "Marketing": 0.5,
+    "Food Service": 0.4, "Entertainment": 0.4,
+}
+DEFAULT_INDUSTRY_SCORE = 0.5
+
+TOP_MATCHES = 3
+
+def debt_to_income_ratios(monthly_cash_flow: np.ndarray, existing_debt: np.ndarray) -> np.ndarray:
+    """Vectorized calculate_debt_to_income_ratio: 5% monthly payment over cash flow, 999 if cash flow <= 0"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = existing_debt * 0.05 / monthly_cash_flow * 100
+    return np.where(monthly_cash_flow <= 0, 999.0, ratio)
+
+def local_risk_scores(frame: pd.DataFrame, dti: np.ndarray) -> np.ndarray:
+    """0-100 qualification score from the prompt's weighted factors, without the LLM"""
+    revenue = np.maximum(frame["annual_revenue"].to_numpy(float), 1.0)
+    cash_flow = frame["monthly_cash_flow"].to_numpy(float)
+    factors = {
+        "credit": np.clip((frame["credit_score"].to_numpy(float) - 500) / 300, 0, 1),
+        "cash_flow": np.clip(cash_flow * 12 / revenue / 0.3, 0, 1),
+        "years": np.clip(frame["years_in_business"].to_numpy(float) / 10, 0, 1),
+        "debt_to_income": 1 - np.clip(dti / 50, 0, 1),
+        "industry": frame["industry"].map(INDUSTRY_SCORES).fillna(DEFAULT_INDUSTRY_SCORE).to_numpy(float),
+        "loan_to_revenue": 1 - np.clip(frame["loan_amount_requested"].to_numpy(float) / revenue, 0, 1),
+    }
+    total = sum(RISK_WEIGHTS[name] * values for name, values in factors.items())
+    return np.rint(total * 100).astype(np.int64)
+
+def classify(scores: np.ndarray):
+    """Map scores to (qualification_status, risk_assessment) label arrays"""
+    status = np.select([scores >= 75, scores >= 55], ["Approved", "Conditional"], "Declined")
+    risk = np.select([scores >= 75, scores >= 55], ["Low", "Medium"], "High")
+    return status, risk
+
+# Set in each worker process by _init_worker
+_lenders: List[dict] = []
+_rules: dict = {}
+
+def _init_worker(lenders: List[dict], rules: dict):
+    global _lenders, _rules
+    _lenders, _rules = lenders, rules
+
+def score_chunk(frame: pd.DataFrame, id_column: Optional[str] = None, lenders=None, rules=None) -> pd.DataFrame:
+    """Score one chunk; runs in a worker process"""
+    from lender_rules import score_columns
+
+    lenders = lenders if lenders is not None else _lenders
+    rules = rules if rules is not None else _rules
+    frame = frame.reset_index(drop=True)
+    dti = debt_to_income_ratios(frame["monthly_cash_flow"].to_numpy(float), frame["existing_debt"].to_numpy(float))
+    scores = local_risk_scores(frame, dti)
+    status, risk = classify(scores)
+
+    columns = {field: frame[field].to_numpy() for field in REQUIRED_COLUMNS}
+    columns["ai.qualification_score"] = scores
+    columns["ai.risk_assessment"] = risk
+    lender_scores, eligible, industry_match = score_columns(lenders, columns, rules)
+
+    out = pd.DataFrame({
+        "row": frame["_row"].to_numpy(np.int64),
+        "debt_to_income_ratio": dti,
+        "local_score": scores,
+        "qualification_status": status,
+        "risk_assessment": risk,
+        "matched_lender_count": eligible.sum(axis=1).astype(np.int64),
+    })
+    if id_column:
+        out.insert(1, id_column, frame[id_column].astype(str).to_numpy())
+
+    # Stable sort keeps catalog order among equal scores, like match_lenders
+    ranking = np.where(eligible, -lender_scores, np.inf)
+    order = np.argsort(ranking, axis=1, kind="stable")[:, :TOP_MATCHES]
+    names = np.array([lender["lender_name"] for lender in lenders], dtype=object)
+    rows = np.arange(len(frame))
+    for k in range(min(TOP_MATCHES, len(lenders))):
+        index = order[:, k]
+        ok = eligible[rows, index]
+        out[f"lender_{k + 1}"] = np.where(ok, names[index], None)
+        out[f"lender_{k + 1}_score"] = np.where(ok, lender_scores[rows, index], np.nan)
+        out[f"lender_{k + 1}_industry_match"] = ok & industry_match[rows, index]
+    return out
+
+def output_schema(id_column: Optional[str], lender_count: int, llm: bool):
+    """Parquet schema of score_chunk's output; declared so all-null chunks can't narrow a column's type"""
+    import pyarrow as pa
+
+    fields = [("row", pa.int64())]
+    if id_column:
+        fields.append((id_column, pa.string()))
+    fields += [
+        ("debt_to_income_ratio", pa.float64()),
+        ("local_score", pa.int64()),
+        ("qualification_status", pa.string()),
+        ("risk_assessment", pa.string()),
+        ("matched_lender_count", pa.int64()),
+    ]
+    for k in range(min(TOP_MATCHES, lender_count)):
+        fields += [
+            (f"lender_{k + 1}", pa.string()),
+            (f"lender_{k + 1}_score", pa.float64()),
+            (f"lender_{k + 1}_industry_match", pa.bool_()),
+        ]
+    if llm:
+        fields += [("llm_score", pa.int64()), ("llm_status", pa.string()), ("llm_source", pa.string())]
+    return pa.schema(fields)
+
+def read_chunks(path: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """Stream an input portfolio in chunks, tagging each row with its position"""
+    offset = 0
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        batches = (batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size))
+    else:
+        batches = pd.read_csv(path, chunksize=chunk_size)
+    for frame in batches:
+        missing = [c for c in REQUIRED_COLUMNS if c not in frame.columns]
+        if missing:
+            raise typer.BadParameter(f"input is missing columns: {', '.join(missing)}")
+        frame["_row"] = np.arange(offset, offset + len(frame))
+        offset += len(frame)
+        yield frame
+
+def scored_chunks(chunks: Iterator[pd.DataFrame], workers: int, id_column: Optional[str], lenders, rules) -> Iterator[pd.DataFrame]:
+    """Score chunks across a process pool, yielding results in input order with bounded read-ahead"""
+    if workers <= 1:
+        for frame in chunks:
+            yield score_chunk(frame, id_column, lenders, rules)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(lenders, rules)) as pool:
+        pending = []
+        for frame in chunks:
+            pending.append(pool.submit(score_chunk, frame, id_column))
+            if len(pending) >= workers * 2:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+async def apply_llm(frame: pd.DataFrame, source: pd.DataFrame, rate: float, concurrency: int) -> pd.DataFrame:
+    """Re-analyze selected rows with the LLM, paced by a token bucket"""
+    import server
+    from rate_limit import LocalBucketStore
+
+    bucket = LocalBucketStore()
+    semaphore = asyncio.Semaphore(concurrency)
+    # CSV readers infer numbers for columns like contact_phone; the model wants strings
+    text_fields = {name for name, field in server.BusinessApplication.model_fields.items() if field.annotation is str}
+    defaults = {"business_name": "", "loan_purpose": "", "contact_email": "", "contact_phone": ""}
+
+    async def analyze(position: int):
+        while True:
+            delay = bucket.take("llm", rate, max(rate, 1.0))
+            if not delay:
+                break
+            await asyncio.sleep(delay)
+        async with semaphore:
+            details = dict(defaults)
+            for field, value in source.iloc[position].items():
+                if field in text_fields:
+                    details[field] = str(value)
+                elif field in server.BusinessApplication.model_fields:
+                    details[field] = value.item() if hasattr(value, "item") else value
+            application = server.BusinessApplication(**details)
+            analysis = await server.analyze_loan_application_with_ai(application)
+            return position, analysis, server.match_lenders(application, analysis)
+
+    results = await asyncio.gather(*(analyze(p) for p in range(len(frame))))
+    for position, analysis, matches in results:
+        frame.loc[position, "llm_score"] = analysis["qualification_score"]
+        frame.loc[position, "llm_status"] = analysis["qualification_status"]
+        frame.loc[position, "llm_source"] = analysis.get("analysis_source")
+        for k, match in enumerate(matches[:TOP_MATCHES]):
+            frame.loc[position, f"lender_{k + 1}"] = match["lender_name"]
+            frame.loc[position, f"lender_{k + 1}_score"] = match["match_score"]
+            frame.loc[position, f"lender_{k + 1}_industry_match"] = match["industry_match"]
+    return frame
+
+app = typer.Typer(add_completion=False)
+
+@app.command()
+def score(
+    input_path: str = typer.Argument(..., help="CSV or Parquet portfolio"),
+    output_path: str = typer.Argument(..., help="Parquet file to write"),
+    chunk_size: int = typer.Option(100_000, help="Rows per chunk"),
+    workers: int = typer.Option(os.cpu_count() or 1, help="Scoring processes"),
+    id_column: Optional[str] = typer.Option(None, help="Input column copied to the output"),
+    llm: bool = typer.Option(False, help="Send borderline rows to the LLM"),
+    llm_min_score: int = typer.Option(50, help="Lowest local score sent to the LLM"),
+    llm_max_score: int = typer.Option(75, help="Highest local score sent to the LLM"),
+    llm_max_rows: int = typer.Option(1000, help="Cap on LLM calls for the whole run"),
+    llm_rate: float = typer.Option(2.0, help="LLM calls per second"),
+    llm_concurrency: int = typer.Option(4, help="Concurrent LLM calls"),
+):
+    """Score a loan portfolio offline and stream the results to Parquet"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import server
+
+    lenders = server.lender_catalog.lenders
+    rules = server.lender_catalog.rules
+    started = time.monotonic()
+    total, llm_calls = 0, 0
+    schema = output_schema(id_column, len(lenders), llm)
+    writer = pq.ParquetWriter(output_path, schema)
+    source_rows = {}
+
+    chunks = read_chunks(input_path, chunk_size)
+    if llm:
+        # Keep the raw rows of each chunk until it is scored so borderline rows can be re-analyzed
+        def remember(frames):
+            for frame in frames:
+                source_rows[int(frame["_row"].iloc[0])] = frame
+                yield frame
+        chunks = remember(chunks)
+
+    try:
+        for result in scored_chunks(chunks, workers, id_column, lenders, rules):
+            if llm:
+                source = source_rows.pop(int(result["row"].iloc[0])).reset_index(drop=True)
+                for column in ("llm_score", "llm_status", "llm_source"):
+                    result[column] = None
+                band = result.index[(result["local_score"] >= llm_min_score) & (result["local_score"] <= llm_max_score)]
+                band = band[: max(0, llm_max_rows - llm_calls)]
+                if len(band):
+                    subset = asyncio.run(apply_llm(result.loc[band].reset_index(drop=True), source.loc[band].reset_index(drop=True),
+                                                   llm_rate, llm_concurrency))
+                    subset.index = band
+                    result.loc[band] = subset
+                    llm_calls += len(band)
+                result["llm_score"] = result["llm_score"].astype("Int64")
+
+            writer.write_table(pa.Table.from_pandas(result, schema=schema, preserve_index=False))
+            total += len(result)
+            elapsed = time.monotonic() - started
+            typer.echo(f"{total:,} rows scored ({total / elapsed:,.0f} rows/s)")
+    finally:
+        writer.close()
+
+    elapsed = time.monotonic() - started
+    typer.echo(f"Done: {total:,} rows in {elapsed:.1f}s, {llm_calls} LLM calls -> {output_path}")
+
+if __name__ == "__main__":
+    app()
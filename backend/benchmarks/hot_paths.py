@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the request hot path
+Times DTI calculation, prompt construction, lender matching, BusinessApplication validation,
+response encoding and full ASGI round trips (submit and lookup) in process, with the LLM and
+MongoDB replaced by in-memory stand-ins so only our own code is measured.
+
+Results are compared against a JSON baseline; any case slower than the baseline by more than
+BENCH_REGRESSION_THRESHOLD (default 25%) fails the run. Record a baseline on the reference
+machine first; a missing baseline fails the run unless --allow-missing-baseline is given, so a
+gate can't pass without comparing anything:
+
+    python benchmarks/hot_paths.py --save
+    python benchmarks/hot_paths.py            # compare against benchmarks/baselines/hot_paths.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Measure the LLM path every time, without throttling or sampled tracing
+os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+os.environ.setdefault('SIMILAR_REUSE_DISTANCE', '-1')
+os.environ.setdefault('TRACE_SAMPLE_RATE', '0')
+os.environ.setdefault('CONCURRENCY_LIMIT_ENABLED', 'false')
+
+import httpx
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import server
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "hot_paths.json")
+THRESHOLD = float(os.environ.get('BENCH_REGRESSION_THRESHOLD', '0.25'))
+
+# A case over the threshold is re-measured this many times and only fails if it stays slow,
+# so one noisy run on a shared machine doesn't fail the gate
+RECHECKS = 2
+
+APPLICATION = {
+    "business_name": "Bench Co",
+    "industry": "Technology",
+    "years_in_business": 6,
+    "annual_revenue": 1_200_000.0,
+    "credit_score": 720,
+    "monthly_cash_flow": 40_000.0,
+    "existing_debt": 150_000.0,
+    "loan_amount_requested": 250_000.0,
+    "loan_purpose": "Equipment",
+    "contact_email": "bench@example.com",
+    "contact_phone": "555-0100",
+}
+
+LLM_RESPONSE = json.dumps({
+    "qualification_score": 82,
+    "qualification_status": "Approved",
+    "recommended_loan_amount": 240000.0,
+    "interest_rate_range": "6.0% - 8.5%",
+    "risk_assessment": "Low",
+    "analysis_summary": "Strong cash flow and credit history support the requested amount.",
+    "key_strengths": ["Consistent revenue", "Good credit"],
+    "key_concerns": ["Concentrated customer base"],
+    "improvement_suggestions": ["Diversify revenue"],
+})
+
+class StubChat:
+    """Answers instantly with a fixed analysis"""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def with_model(self, *args):
+        return self
+
+    def with_max_tokens(self, *args):
+        return self
+
+    async def send_message(self, message):
+        return LLM_RESPONSE
+
+class StubMessage:
+    def __init__(self, text):
+        self.text = text
+
+class MemoryCollection:
+    """Just enough of a Motor collection for the request path"""
+
+    def __init__(self):
+        self.docs = []
+
+    async def find_one(self, query, projection=None):
+        for doc in self.docs:
+            if all(doc.get(k) == v for k, v in query.items()):
+                return {k: v for k, v in doc.items() if k != "_id"}
+        return None
+
+    async def insert_one(self, doc):
+        self.docs.append(doc)
+
+    async def insert_many(self, docs):
+        self.docs.extend(docs)
+
+    async def create_index(self, *args, **kwargs):
+        pass
+
+class MemoryDatabase(dict):
+    def __missing__(self, name):
+        collection = self[name] = MemoryCollection()
+        return collection
+
+    def __getattr__(self, name):
+        return self[name]
+
+def install_stubs():
+    server._llm_classes = (StubChat, StubMessage)
+    server.db = server.read_db = MemoryDatabase()
+    server.tenant_router = server.TenantRouter(server.db, server.read_db)
+    # Keep the similarity index empty so every iteration does the same work
+    server.similar_index.add = lambda *args, **kwargs: None
+
+def per_call_seconds(fn, repeat: int = 5) -> float:
+    """Best-of-repeat time per call, with the loop count picked by timeit.autorange"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def asgi_per_call_seconds(make_request, requests: int = 200, repeat: int = 5) -> float:
+    """Best-of-repeat time per in-process ASGI request"""
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            await make_request(client)  # warm up routing and validation caches
+            best = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                for _ in range(requests):
+                    await make_request(client)
+                best = min(best, (time.perf_counter() - started) / requests)
+            return best
+    return asyncio.run(run())
+
+async def _submit_once(submit):
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        return await submit(client)
+
+def cases() -> dict:
+    """Benchmark name -> callable returning seconds per call"""
+    install_stubs()
+    application = server.BusinessApplication(**APPLICATION)
+    dti = server.calculate_debt_to_income_ratio(application.monthly_cash_flow, application.existing_debt)
+    ai_analysis = json.loads(LLM_RESPONSE)
+    loan_result = dict(
+        ai_analysis,
+        application_id="00000000-0000-0000-0000-000000000000",
+        ai_analysis=ai_analysis["analysis_summary"],
+        matched_lenders=server.match_lenders(application, ai_analysis),
+        next_steps=["Review matched lenders and their terms"] * 4,
+        created_at=server.datetime.utcnow(),
+    )
+
+    async def submit(client):
+        response = await client.post("/api/submit-application", json=APPLICATION)
+        assert response.status_code == 200, response.text
+        return response.json()["application_id"]
+
+    stored_id = asyncio.run(_submit_once(submit))
+
+    async def lookup(client):
+        response = await client.get(f"/api/application/{stored_id}")
+        assert response.status_code == 200, response.text
+
+    return {
+        "calculate_debt_to_income_ratio": lambda: per_call_seconds(
+            lambda: server.calculate_debt_to_income_ratio(application.monthly_cash_flow, application.existing_debt)),
+        "build_analysis_prompt": lambda: per_call_seconds(lambda: server.build_analysis_prompt(application, dti)),
+        "match_lenders": lambda: per_call_seconds(lambda: server.match_lenders(application, ai_analysis)),
+        "business_application_validation": lambda: per_call_seconds(lambda: server.BusinessApplication(**APPLICATION)),
+        "response_encoding": lambda: per_call_seconds(lambda: JSONResponse(jsonable_encoder(loan_result)).body),
+        "asgi_submit_application": lambda: asgi_per_call_seconds(submit),
+        "asgi_get_application": lambda: asgi_per_call_seconds(lookup),
+    }
+
+def run(benchmarks: dict, baseline: dict, threshold: float):
+    """Measure every case, print it against the baseline and return (results, regressions)"""
+    results, failures = {}, []
+    for name, measure in benchmarks.items():
+        seconds = measure()
+        reference = baseline.get(name)
+        for _ in range(RECHECKS if reference else 0):
+            if seconds / reference - 1 <= threshold:
+                break
+            seconds = min(seconds, measure())
+        results[name] = seconds
+
+        line = f"{name:34s} {seconds * 1e6:10.2f} us"
+        if reference:
+            change = seconds / reference - 1
+            line += f"   baseline {reference * 1e6:10.2f} us   {change:+7.1%}"
+            if change > threshold:
+                failures.append(f"{name} is {change:.0%} slower than baseline (threshold {threshold:.0%})")
+        print(line)
+    return results, failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark backend hot paths against a JSON baseline")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--allow-missing-baseline", action="store_true",
+                        help="Only print results when there is no baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="Allowed slowdown, e.g. 0.25 for 25%%")
+    args = parser.parse_args()
+
+    baseline = {}
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    results, failures = run(cases(), baseline, args.threshold)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": results}, f, indent=2)
+        print(f"✅ Baseline saved to {args.baseline}")
+        return 0
+    if not baseline:
+        if args.allow_missing_baseline:
+            print(f"No baseline at {args.baseline}; run with --save to record one")
+            return 0
+        print(f"❌ No baseline at {args.baseline}; run with --save to record one")
+        return 1
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ No regressions beyond threshold")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
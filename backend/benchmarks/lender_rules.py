@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Lender-matching benchmark
+Compares the compiled rule catalog against the interpreted rule walker and the original
+hand-written match loop, checks that all three agree, and exits non-zero if the compiled
+rules are slower than either.
+
+At a couple of microseconds per call, single timings swing with machine load, so the three
+strategies are timed in interleaved rounds and compared by the median of their per-round
+ratios. The hand-written comparison also widens its tolerance by the measured noise between
+rounds; compiled rules must always beat the interpreted ones.
+"""
+
+import os
+import random
+import statistics
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lender_rules import CompiledCatalog, evaluate_interpreted, merge_catalog
+from server import MOCK_LENDERS, BusinessApplication
+
+# Allowed slowdown of compiled rules relative to the hand-written loop, before noise is added
+TOLERANCE = float(os.environ.get('RULES_BENCH_TOLERANCE', '1.10'))
+
+# Interleaved timing rounds; each times every strategy once
+ROUNDS = int(os.environ.get('RULES_BENCH_ROUNDS', '25'))
+
+INDUSTRIES = ["Technology", "Retail", "Manufacturing", "Agriculture", "Education", "Food Service"]
+
+def hand_written(application, ai_analysis):
+    """The match_lenders loop as it was before rules were declarative"""
+    matched_lenders = []
+    for lender in MOCK_LENDERS:
+        if application.credit_score >= lender["min_credit_score"]:
+            if application.loan_amount_requested <= lender["max_loan_amount"]:
+                industry_match = application.industry in lender["specialties"]
+                match_score = 0
+                if industry_match:
+                    match_score += 30
+                if application.credit_score >= lender["min_credit_score"] + 50:
+                    match_score += 25
+                if ai_analysis["qualification_score"] >= 80:
+                    match_score += 20
+                if ai_analysis["risk_assessment"] == "Low":
+                    match_score += 15
+                else:
+                    match_score += 10
+                matched_lenders.append({
+                    "lender_name": lender["lender_name"],
+                    "lender_type": lender["lender_type"],
+                    "interest_rate_range": lender["interest_rate_range"],
+                    "match_score": match_score,
+                    "industry_match": industry_match,
+                    "pre_approval_likelihood": "High" if match_score >= 70 else "Medium" if match_score >= 50 else "Low"
+                })
+    matched_lenders.sort(key=lambda x: x["match_score"], reverse=True)
+    return matched_lenders[:3]
+
+def sample_inputs(count: int = 200):
+    rng = random.Random(7)
+    inputs = []
+    for _ in range(count):
+        application = BusinessApplication(
+            business_name="Bench Co",
+            industry=rng.choice(INDUSTRIES),
+            years_in_business=rng.randint(0, 30),
+            annual_revenue=rng.uniform(1e5, 1e7),
+            credit_score=rng.randint(550, 820),
+            monthly_cash_flow=rng.uniform(-1e4, 2e5),
+            existing_debt=rng.uniform(0, 2e6),
+            loan_amount_requested=rng.uniform(1e4, 6e6),
+            loan_purpose="Working Capital",
+            contact_email="bench@example.com",
+            contact_phone="555-0100",
+        )
+        ai_analysis = {
+            "qualification_score": rng.randint(30, 100),
+            "risk_assessment": rng.choice(["Low", "Medium", "High"]),
+        }
+        inputs.append((application, ai_analysis))
+    return inputs
+
+def per_call_us(fn, inputs, number: int = 20) -> float:
+    def run():
+        for application, ai_analysis in inputs:
+            fn(application, ai_analysis)
+    return timeit.timeit(run, number=number) / (number * len(inputs)) * 1e6
+
+def interleaved(strategies: dict, inputs, rounds: int = ROUNDS) -> dict:
+    """Per-call timings of every strategy for each round, rotating the order between rounds"""
+    names = list(strategies)
+    timings = {name: [] for name in names}
+    for name in names:
+        per_call_us(strategies[name], inputs, number=2)  # warm up
+    for r in range(rounds):
+        for name in names[r % len(names):] + names[:r % len(names)]:
+            timings[name].append(per_call_us(strategies[name], inputs))
+    return timings
+
+def relative_spread(samples: list) -> float:
+    """Median absolute deviation as a fraction of the median"""
+    median = statistics.median(samples)
+    return statistics.median(abs(s - median) for s in samples) / median
+
+def main():
+    inputs = sample_inputs()
+    catalog = CompiledCatalog(MOCK_LENDERS)
+    # Merged once, like the compiler, so the comparison is between evaluation strategies
+    merged = merge_catalog(MOCK_LENDERS)
+
+    for application, ai_analysis in inputs:
+        expected = hand_written(application, ai_analysis)
+        if catalog.match(application, ai_analysis) != expected:
+            print("❌ compiled rules disagree with the hand-written loop")
+            return 1
+        if evaluate_interpreted(MOCK_LENDERS, merged, application, ai_analysis) != expected:
+            print("❌ interpreted rules disagree with the hand-written loop")
+            return 1
+
+    timings = interleaved({
+        "hand": hand_written,
+        "interpreted": lambda a, ai: evaluate_interpreted(MOCK_LENDERS, merged, a, ai),
+        "compiled": catalog.match,
+    }, inputs)
+    hand, interpreted, compiled = timings["hand"], timings["interpreted"], timings["compiled"]
+
+    print(f"hand-written loop : {statistics.median(hand):7.2f} us/call (median of {len(hand)} rounds)")
+    print(f"interpreted rules : {statistics.median(interpreted):7.2f} us/call")
+    print(f"compiled rules    : {statistics.median(compiled):7.2f} us/call")
+
+    vs_interpreted = statistics.median(c / i for c, i in zip(compiled, interpreted))
+    vs_hand = statistics.median(c / h for c, h in zip(compiled, hand))
+    # Two independent timings each carry the round-to-round noise
+    allowed = TOLERANCE + 2 * max(relative_spread(hand), relative_spread(compiled))
+    print(f"compiled / interpreted {vs_interpreted:.2f}x, compiled / hand-written {vs_hand:.2f}x (allowed {allowed:.2f}x)")
+
+    failures = []
+    if vs_interpreted >= 1:
+        failures.append("compiled rules are not faster than interpreted rules")
+    if vs_hand > allowed:
+        failures.append(f"compiled rules are more than {allowed:.2f}x the hand-written loop")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Compiled rules within budget")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Similarity index query benchmark
+Fills a SimilarityIndex to SIMILAR_INDEX_MAX_SIZE with synthetic applications and times
+k-nearest-neighbour queries at a few index sizes up to it. Exits non-zero if the median query at
+the full default size exceeds QUERY_BUDGET_MS.
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from similarity import SIMILAR_INDEX_MAX_SIZE, SimilarityIndex
+
+# Median query time allowed at the full index size
+QUERY_BUDGET_MS = float(os.environ.get('SIMILAR_QUERY_BUDGET_MS', '0.3'))
+QUERIES = 500
+K = 3
+
+INDUSTRIES = [
+    "Technology", "Retail", "Food Service", "Healthcare", "Manufacturing", "Construction",
+    "Professional Services", "Transportation", "Real Estate", "Education",
+]
+
+def application(rng: random.Random) -> dict:
+    return {
+        "industry": rng.choice(INDUSTRIES),
+        "annual_revenue": rng.uniform(50_000, 5_000_000),
+        "monthly_cash_flow": rng.uniform(-2_000, 80_000),
+        "existing_debt": rng.uniform(0, 500_000),
+        "credit_score": rng.randint(450, 820),
+        "years_in_business": rng.randint(0, 20),
+        "loan_amount_requested": rng.uniform(10_000, 1_000_000),
+    }
+
+RESULT = {
+    "qualification_score": 70, "qualification_status": "Conditional", "recommended_loan_amount": 100_000.0,
+    "interest_rate_range": "7.5% - 10.0%", "risk_assessment": "Medium",
+}
+
+def median_query_ms(index: SimilarityIndex, queries: list) -> float:
+    for details in queries[:50]:
+        index.query(details, K)
+    samples = []
+    for details in queries:
+        start = time.perf_counter()
+        index.query(details, K)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def main():
+    rng = random.Random(42)
+    queries = [application(rng) for _ in range(QUERIES)]
+    index = SimilarityIndex()
+    sizes = sorted({size for size in (1_000, 10_000, SIMILAR_INDEX_MAX_SIZE) if size <= SIMILAR_INDEX_MAX_SIZE})
+
+    median = 0.0
+    for size in sizes:
+        while len(index) < size:
+            index.add(f"app-{len(index)}", application(rng), RESULT)
+        median = median_query_ms(index, queries)
+        print(f"{size:>8,d} applications   {median:7.3f} ms per {K}-NN query (median)")
+
+    if median > QUERY_BUDGET_MS:
+        print(f"❌ {median:.3f} ms at {SIMILAR_INDEX_MAX_SIZE:,} applications exceeds the {QUERY_BUDGET_MS} ms budget")
+        return 1
+    print(f"✅ Queries at the default size stay within {QUERY_BUDGET_MS} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
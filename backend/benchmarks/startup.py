@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the QuickFlow Capital API
+Measures import cost of server.py (python -X importtime) and time-to-first-healthy
+for a freshly spawned uvicorn process. Exits non-zero when a budget is exceeded.
+The forbidden-module check also runs under pytest (tests/test_startup.py); the import budget
+only does with RUN_TIMING_TESTS=1, since wall-clock limits are unreliable on shared runners.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Budgets can be tightened per environment; defaults suit a cold container
+IMPORT_BUDGET_MS = float(os.environ.get('STARTUP_IMPORT_BUDGET_MS', '1500'))
+HEALTHY_BUDGET_MS = float(os.environ.get('STARTUP_HEALTHY_BUDGET_MS', '5000'))
+
+# Modules that must never be imported just by loading the app
+FORBIDDEN_AT_IMPORT = ["emergentintegrations", "pandas", "numpy", "boto3"]
+
+def measure_import():
+    """Run `python -X importtime -c 'import server'` and return (total_ms, top_modules, loaded)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import server failed:\n{result.stderr}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = _parse(line)
+        rows.append((name, self_us, cumulative_us))
+
+    # Top-level entries (no leading indentation) sum to the total import cost
+    total_us = sum(cum for name, _, cum in rows if not name.startswith(" "))
+    top = sorted(rows, key=lambda r: r[2], reverse=True)[:10]
+    loaded = {name.strip().split(".")[0] for name, _, _ in rows}
+    return total_us / 1000, top, loaded
+
+def _parse(line):
+    """Split one importtime line into (self_us, cumulative_us, name)"""
+    body = line[len("import time:"):]
+    self_us, cumulative_us, name = body.split("|", 2)
+    # Keep the name's indentation: nesting depth marks transitive imports
+    return int(self_us), int(cumulative_us), name[1:].rstrip()
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def measure_time_to_healthy():
+    """Spawn uvicorn and poll /api/health until it answers; returns milliseconds"""
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + max(HEALTHY_BUDGET_MS / 1000 * 4, 30)
+        while time.perf_counter() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError("uvicorn exited before becoming healthy")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=0.5) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("timed out waiting for /api/health")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+def main():
+    failures = []
+
+    import_ms, top, loaded = measure_import()
+    print(f"import server: {import_ms:.1f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)")
+    for name, self_us, cumulative_us in top:
+        print(f"   {cumulative_us / 1000:8.1f} ms  {name.strip()}")
+    if import_ms > IMPORT_BUDGET_MS:
+        failures.append(f"import time {import_ms:.1f} ms exceeds {IMPORT_BUDGET_MS:.0f} ms")
+    eager = sorted(set(FORBIDDEN_AT_IMPORT) & loaded)
+    if eager:
+        failures.append(f"heavy modules imported eagerly: {', '.join(eager)}")
+
+    healthy_ms = measure_time_to_healthy()
+    print(f"time to first healthy: {healthy_ms:.1f} ms (budget {HEALTHY_BUDGET_MS:.0f} ms)")
+    if healthy_ms > HEALTHY_BUDGET_MS:
+        failures.append(f"time to healthy {healthy_ms:.1f} ms exceeds {HEALTHY_BUDGET_MS:.0f} ms")
+
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Startup within budget")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Structured-output parser benchmark
+Builds a corpus of realistic LLM responses (clean, fenced, prose-wrapped, trailing commas,
+truncated at every field boundary) and reports parse success and cost per response for plain
+json.loads and for structured_output.parse_analysis, both whole and streamed in small chunks.
+Exits non-zero if the tolerant parser recovers fewer responses than SUCCESS_BUDGET.
+"""
+
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from structured_output import IncrementalJSONParser, parse_analysis
+
+# Share of the corpus that must validate (fully or with defaults filled in)
+SUCCESS_BUDGET = float(os.environ.get('PARSE_SUCCESS_BUDGET', '0.95'))
+
+ANALYSIS = {
+    "qualification_score": 78,
+    "qualification_status": "Conditional",
+    "recommended_loan_amount": 160000.0,
+    "interest_rate_range": "7.5% - 10.0%",
+    "risk_assessment": "Medium",
+    "analysis_summary": "Solid revenue and \"steady\" cash flow, but a thin credit history warrants conditions.",
+    "key_strengths": ["Consistent revenue growth", "Healthy cash flow"],
+    "key_concerns": ["Credit score near threshold", "Short operating history"],
+    "improvement_suggestions": ["Reduce revolving debt", "Provide 12 months of bank statements"],
+}
+
+DEFAULTS = {
+    "qualification_score": 75,
+    "qualification_status": "Conditional",
+    "recommended_loan_amount": 100000.0,
+    "interest_rate_range": "7.5% - 10.2%",
+    "risk_assessment": "Medium",
+    "analysis_summary": "Manual review required.",
+}
+
+def build_corpus():
+    clean = json.dumps(ANALYSIS, indent=2)
+    corpus = [
+        ("clean", clean),
+        ("compact", json.dumps(ANALYSIS)),
+        ("fenced", f"```json\n{clean}\n```"),
+        ("fenced_bare", f"```\n{clean}\n```"),
+        ("prose", f"Here is my assessment of the application:\n\n{clean}\n\nLet me know if you need more."),
+        ("prose_fenced", f"Sure! Below is the analysis.\n```json\n{clean}\n```\nThanks."),
+        ("trailing_comma", clean.replace('"Provide 12 months of bank statements"', '"Provide 12 months of bank statements",')),
+        ("string_numbers", clean.replace("78", '"78"').replace("160000.0", '"$160,000"')),
+        ("lowercase_labels", clean.replace('"Conditional"', '"conditional"').replace('"Medium"', '"medium"')),
+    ]
+    # Truncated responses, cut part-way through every line after the first field
+    lines = clean.splitlines()
+    for i in range(2, len(lines) - 1):
+        cut = "\n".join(lines[:i]) + "\n" + lines[i][: max(1, len(lines[i]) // 2)]
+        corpus.append(("truncated", cut))
+    return corpus
+
+def timed(fn, text, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(text)
+    return result, (time.perf_counter() - start) / repeat * 1e6
+
+def plain(text):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
+
+def tolerant(text):
+    analysis, _ = parse_analysis(text, defaults=DEFAULTS)
+    return analysis
+
+def streamed(text, chunk_size=7):
+    parser = IncrementalJSONParser()
+    for i in range(0, len(text), chunk_size):
+        if parser.feed(text[i:i + chunk_size]):
+            break
+    return parser.result()[0]
+
+def main():
+    corpus = build_corpus()
+    totals = Counter()
+    outcomes = Counter()
+    costs = Counter()
+    print(f"{'case':<18}{'json.loads':>12}{'tolerant':>10}{'streamed':>10}{'outcome':>11}{'us':>9}")
+    for name, text in corpus:
+        plain_ok = plain(text) is not None
+        result, cost = timed(tolerant, text)
+        _, outcome = parse_analysis(text, defaults=DEFAULTS)
+        streamed_ok = streamed(text) is not None
+        totals["plain"] += plain_ok
+        totals["tolerant"] += result is not None
+        totals["streamed"] += streamed_ok
+        outcomes[outcome] += 1
+        costs["tolerant"] += cost
+        print(f"{name:<18}{'ok' if plain_ok else '-':>12}{'ok' if result else '-':>10}"
+              f"{'ok' if streamed_ok else '-':>10}{outcome:>11}{cost:>9.1f}")
+
+    n = len(corpus)
+    print()
+    print(f"json.loads success : {totals['plain']}/{n} ({totals['plain'] / n:.0%})")
+    print(f"tolerant success   : {totals['tolerant']}/{n} ({totals['tolerant'] / n:.0%})")
+    print(f"streamed objects   : {totals['streamed']}/{n}")
+    print(f"mean tolerant cost : {costs['tolerant'] / n:.1f} us")
+    print(f"outcomes           : {dict(outcomes)}")
+
+    if totals["tolerant"] / n < SUCCESS_BUDGET:
+        print(f"❌ tolerant parser success below {SUCCESS_BUDGET:.0%}")
+        return 1
+    print("✅ Parser success within budget")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
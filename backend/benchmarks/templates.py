@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Response-assembly allocation benchmark
+Uses tracemalloc to compare the memory each submission allocates when next steps, fallbacks and
+the loan result are built inline (the original code, kept below) against assembly from the
+shared template fragments. Reports bytes and blocks per request, both kept alive (stored results)
+and at peak, and exits non-zero if the template path allocates more than the inline one.
+"""
+
+import os
+import sys
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import templates
+
+REQUESTS = 2000
+
+ANALYSES = [
+    {
+        "qualification_score": score,
+        "qualification_status": status,
+        "recommended_loan_amount": 180000.0,
+        "interest_rate_range": "6.0% - 8.5%",
+        "risk_assessment": "Low",
+        "analysis_summary": "Strong cash flow and credit history.",
+        "key_strengths": ["Consistent revenue"],
+        "key_concerns": ["Customer concentration"],
+        "improvement_suggestions": ["Diversify revenue"],
+    }
+    for score, status in ((85, "Approved"), (65, "Conditional"), (40, "Declined"))
+]
+MATCHES = [{"lender_name": "Capital Growth Partners", "match_score": 90}]
+
+def inline_request(application_id, ai_analysis, loan_amount, created_at):
+    """Fallback defaults, next steps and loan result as submit_loan_application built them"""
+    fallback_analysis = {
+        "qualification_score": 75,
+        "qualification_status": "Conditional",
+        "recommended_loan_amount": loan_amount * 0.8,
+        "interest_rate_range": "7.5% - 10.2%",
+        "risk_assessment": "Medium",
+        "analysis_summary": "..." + "...",
+        "key_strengths": ["Business experience", "Positive cash flow"],
+        "key_concerns": ["Credit score evaluation needed", "Industry analysis required"],
+        "improvement_suggestions": ["Improve credit score", "Increase cash flow"],
+    }
+    next_steps = []
+    if ai_analysis["qualification_status"] == "Approved":
+        next_steps = [
+            "Review matched lenders and their terms",
+            "Prepare required documentation",
+            "Schedule consultation with preferred lender",
+            "Submit formal loan application"
+        ]
+    elif ai_analysis["qualification_status"] == "Conditional":
+        next_steps = [
+            "Address key concerns identified in analysis",
+            "Gather additional financial documentation",
+            "Consider improving credit score if needed",
+            "Review matched lenders for best fit"
+        ]
+    else:
+        next_steps = [
+            "Review improvement suggestions",
+            "Work on strengthening financial position",
+            "Consider alternative financing options",
+            "Reapply after addressing concerns"
+        ]
+    loan_result = {
+        "application_id": application_id,
+        "qualification_score": ai_analysis["qualification_score"],
+        "qualification_status": ai_analysis["qualification_status"],
+        "recommended_loan_amount": ai_analysis["recommended_loan_amount"],
+        "interest_rate_range": ai_analysis["interest_rate_range"],
+        "risk_assessment": ai_analysis["risk_assessment"],
+        "ai_analysis": ai_analysis["analysis_summary"],
+        "key_strengths": ai_analysis.get("key_strengths", []),
+        "key_concerns": ai_analysis.get("key_concerns", []),
+        "improvement_suggestions": ai_analysis.get("improvement_suggestions", []),
+        "matched_lenders": MATCHES,
+        "next_steps": next_steps,
+        "created_at": created_at
+    }
+    return fallback_analysis, loan_result
+
+def template_request(application_id, ai_analysis, loan_amount, created_at):
+    fallback_analysis = templates.unparsed_fallback(loan_amount, "...")
+    return fallback_analysis, templates.assemble_result(application_id, ai_analysis, MATCHES, created_at)
+
+def measure(build):
+    """(retained bytes, retained blocks, peak bytes) per request; only the loan result is kept"""
+    ids = [f"app-{i}" for i in range(REQUESTS)]
+    created_at = datetime.utcnow()
+    build(ids[0], ANALYSES[0], 200000.0, created_at)  # warm caches outside the trace
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = []
+    for i, application_id in enumerate(ids):
+        _, loan_result = build(application_id, ANALYSES[i % len(ANALYSES)], 200000.0, created_at)
+        kept.append(loan_result)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "filename")
+    size = sum(s.size_diff for s in stats)
+    blocks = sum(s.count_diff for s in stats)
+    # The list holding the results is the same for both; discount it
+    size -= sys.getsizeof(kept)
+    blocks -= 1
+    return size / REQUESTS, blocks / REQUESTS, peak / REQUESTS
+
+def main():
+    inline = measure(inline_request)
+    shared = measure(template_request)
+
+    print(f"{'':18s} {'bytes/req':>10s} {'blocks/req':>11s} {'peak bytes/req':>15s}")
+    print(f"{'inline assembly':18s} {inline[0]:10.0f} {inline[1]:11.1f} {inline[2]:15.0f}")
+    print(f"{'template registry':18s} {shared[0]:10.0f} {shared[1]:11.1f} {shared[2]:15.0f}")
+
+    if shared[0] > inline[0] or shared[1] > inline[1]:
+        print("❌ template assembly allocates more than inline assembly")
+        return 1
+    print(f"✅ Template assembly keeps {1 - shared[0] / inline[0]:.0%} fewer bytes per stored result")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Adaptive concurrency limiting for LLM-bound endpoints
+The in-flight cap follows observed LLM latency with AIMD control: each call that finishes under
+CONCURRENCY_LATENCY_TARGET grows the limit by about one per full window of calls, and a slower
+or failed call cuts it multiplicatively, at most once per target interval so a single slow burst
+doesn't collapse it. Requests over the limit wait briefly in a bounded queue and are otherwise
+shed, so a slow provider can't pile up unbounded coroutines.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY_LIMIT_ENABLED = os.environ.get('CONCURRENCY_LIMIT_ENABLED', 'true').lower() == 'true'
+CONCURRENCY_INITIAL_LIMIT = int(os.environ.get('CONCURRENCY_INITIAL_LIMIT', '20'))
+CONCURRENCY_MIN_LIMIT = int(os.environ.get('CONCURRENCY_MIN_LIMIT', '2'))
+CONCURRENCY_MAX_LIMIT = int(os.environ.get('CONCURRENCY_MAX_LIMIT', '200'))
+CONCURRENCY_LATENCY_TARGET = float(os.environ.get('CONCURRENCY_LATENCY_TARGET', '8.0'))
+CONCURRENCY_QUEUE_SIZE = int(os.environ.get('CONCURRENCY_QUEUE_SIZE', '50'))
+CONCURRENCY_QUEUE_TIMEOUT = float(os.environ.get('CONCURRENCY_QUEUE_TIMEOUT', '2.0'))
+
+# Multiplicative decrease applied when latency exceeds the target
+BACKOFF_RATIO = 0.75
+
+# Weight of the newest sample in the latency moving average
+LATENCY_SMOOTHING = 0.2
+
+metrics.describe("requests_shed_total", "counter", "Requests rejected by the adaptive concurrency limiter")
+metrics.describe("concurrency_limit", "gauge", "Current adaptive in-flight limit")
+metrics.describe("concurrency_in_flight", "gauge", "Requests holding a concurrency slot")
+metrics.describe("concurrency_queued", "gauge", "Requests waiting for a concurrency slot")
+
+class LimitExceeded(Exception):
+    """Raised when a request is shed; retry_after is a hint in seconds"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdaptiveLimiter:
+    """AIMD-controlled semaphore with a bounded, time-limited wait queue"""
+
+    def __init__(self, initial: int = CONCURRENCY_INITIAL_LIMIT, min_limit: int = CONCURRENCY_MIN_LIMIT,
+                 max_limit: int = CONCURRENCY_MAX_LIMIT, latency_target: float = CONCURRENCY_LATENCY_TARGET,
+                 queue_size: int = CONCURRENCY_QUEUE_SIZE, queue_timeout: float = CONCURRENCY_QUEUE_TIMEOUT,
+                 enabled: bool = CONCURRENCY_LIMIT_ENABLED):
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.enabled = enabled
+        self.in_flight = 0
+        self.waiters: deque = deque()
+        self.latency_ewma: Optional[float] = None
+        self.shed = 0
+        self._last_decrease = 0.0
+        self._publish()
+
+    async def acquire(self):
+        """Take a slot, waiting up to queue_timeout; raises LimitExceeded when shed"""
+        if not self.enabled or (self.in_flight < int(self.limit) and not self.waiters):
+            self.in_flight += 1
+            self._publish()
+            return
+        if len(self.waiters) >= self.queue_size:
+            self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self._publish()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._reject("queue_timeout")
+        except asyncio.CancelledError:
+            # A slot handed over just as the caller went away must be returned
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            self._publish()
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+        self._publish()
+
+    def record(self, latency: float, ok: bool = True):
+        """Feed one downstream call's latency into the control loop"""
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += LATENCY_SMOOTHING * (latency - self.latency_ewma)
+
+        if ok and latency <= self.latency_target:
+            # Only grow while the limit is actually being used
+            if self.in_flight >= self.limit / 2:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+                self._wake()
+        else:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.latency_target:
+                self._last_decrease = now
+                self.limit = max(self.min_limit, self.limit * BACKOFF_RATIO)
+                logger.info("Concurrency limit reduced to %d (latency %.2fs)", int(self.limit), latency)
+        self._publish()
+
+    def state(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+            "latency_ewma_seconds": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            "latency_target_seconds": self.latency_target,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "shed_total": self.shed,
+        }
+
+    def _wake(self):
+        """Hand free slots to queued requests in arrival order"""
+        while self.waiters and self.in_flight < int(self.limit):
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _reject(self, reason: str):
+        self.shed += 1
+        metrics.inc("requests_shed_total", reason=reason)
+        raise LimitExceeded(reason, self.latency_ewma or self.latency_target)
+
+    def _publish(self):
+        metrics.set_gauge("concurrency_limit", int(self.limit))
+        metrics.set_gauge("concurrency_in_flight", self.in_flight)
+        metrics.set_gauge("concurrency_queued", len(self.waiters))
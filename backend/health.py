@@ -0,0 +1,129 @@
+"""
+Liveness and readiness for the QuickFlow Capital API
+Dependency probes run on a background interval and the endpoints only read the cached results,
+so a load balancer polling readiness never blocks on, or adds load to, MongoDB or the LLM.
+
+MongoDB is pinged on each interval and must answer for the instance to be ready. The LLM is
+informational, because submissions fall back to a rule-based analysis without it. With
+LLM_HEALTH_URL set it is checked by a GET (any non-5xx answer counts as reachable); otherwise
+its state comes from the most recent real LLM call.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+HEALTH_PROBE_INTERVAL = float(os.environ.get('HEALTH_PROBE_INTERVAL', '10'))
+HEALTH_PROBE_TIMEOUT = float(os.environ.get('HEALTH_PROBE_TIMEOUT', '2'))
+LLM_HEALTH_URL = os.environ.get('LLM_HEALTH_URL')
+
+# Cached results older than this many intervals mean the probe loop itself is stuck
+STALE_AFTER_INTERVALS = 3
+
+class HealthMonitor:
+    """Runs registered probes in the background and caches their latest results"""
+
+    def __init__(self, interval: float = HEALTH_PROBE_INTERVAL, timeout: float = HEALTH_PROBE_TIMEOUT):
+        self.interval = interval
+        self.timeout = timeout
+        self.probes: Dict[str, Callable[[], Awaitable[Optional[dict]]]] = {}
+        self.required = set()
+        self.results: Dict[str, dict] = {}
+        self.passive: Dict[str, dict] = {}
+        self.last_run: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def probe(self, name: str, required: bool = True):
+        """Decorator registering an async probe; it may return extra fields for the report"""
+        def register(fn):
+            self.probes[name] = fn
+            if required:
+                self.required.add(name)
+            return fn
+        return register
+
+    def observe(self, name: str, latency: float, ok: bool, error: Optional[str] = None):
+        """Record the outcome of a real call, for dependencies without an active probe"""
+        self.passive[name] = {
+            "status": "ok" if ok else "failing",
+            "latency_ms": round(latency * 1000, 1),
+            "observed_at": datetime.utcnow().isoformat(),
+            **({"error": error} if error else {}),
+        }
+
+    async def _run_probe(self, name: str, fn) -> dict:
+        """A probe's returned fields (including its own status or latency) override the defaults"""
+        started = time.perf_counter()
+        try:
+            extra = await asyncio.wait_for(fn(), self.timeout)
+            result = {"status": "ok", **(extra or {})}
+        except asyncio.TimeoutError:
+            result = {"status": "failing", "error": f"timed out after {self.timeout}s"}
+        except Exception as e:
+            result = {"status": "failing", "error": f"{type(e).__name__}: {e}"}
+        result.setdefault("latency_ms", round((time.perf_counter() - started) * 1000, 1))
+        result["checked_at"] = datetime.utcnow().isoformat()
+        return result
+
+    async def refresh(self):
+        """Run every probe once, concurrently"""
+        names = list(self.probes)
+        outcomes = await asyncio.gather(*(self._run_probe(n, self.probes[n]) for n in names))
+        for name, result in zip(names, outcomes):
+            previous = self.results.get(name, {}).get("status")
+            if result["status"] != previous and previous is not None:
+                logger.warning("Health probe %s changed %s -> %s", name, previous, result["status"])
+            self.results[name] = result
+        self.last_run = time.monotonic()
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Health probe cycle failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def readiness(self) -> dict:
+        """Cached readiness report; never runs a probe itself"""
+        if self.last_run is None:
+            return {"status": "starting", "checks": dict(self.results)}
+        checks = dict(self.results)
+        ready = all(checks.get(name, {}).get("status") == "ok" for name in self.required)
+        age = time.monotonic() - self.last_run
+        if age > self.interval * STALE_AFTER_INTERVALS:
+            ready = False
+            checks["probes"] = {"status": "failing", "error": f"last probe cycle {age:.0f}s ago"}
+        return {"status": "ready" if ready else "not_ready", "checks": checks}
+
+def llm_probe(monitor: HealthMonitor):
+    """Active GET when LLM_HEALTH_URL is set, else the last observed LLM call"""
+    async def check():
+        if LLM_HEALTH_URL:
+            import httpx
+            async with httpx.AsyncClient(timeout=monitor.timeout) as client:
+                response = await client.get(LLM_HEALTH_URL)
+            if response.status_code >= 500:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            return {"mode": "active"}
+        observed = monitor.passive.get("llm")
+        if observed is None:
+            return {"mode": "passive", "status": "unknown", "latency_ms": None}
+        return {"mode": "passive", **observed}
+    return check
@@ -0,0 +1,307 @@
+"""
+Declarative lender eligibility and scoring rules
+Rules are plain dicts so they can live in JSON next to the lender catalog. At catalog load
+they are compiled into Python functions with every lender threshold folded into a constant,
+so evaluation costs the same as a hand-written loop.
+
+Rule format:
+    {"name": "credit_margin",
+     "when": {"field": "credit_score", "op": ">=", "lender_field": "min_credit_score", "offset": 50},
+     "points": 25, "else": 0}
+
+`field` is a BusinessApplication attribute, or `ai.<key>` for the AI analysis. The right-hand
+side is either a literal `value` or a `lender_field` (plus optional `offset`). Eligibility rules
+only have `when` and may only read application fields. A lender may carry a "rules" dict whose named entries override or extend the
+defaults, e.g. {"scoring": {"industry_match": {"points": 40}}}; {"enabled": false} removes one.
+"""
+
+import copy
+import json
+import os
+from operator import itemgetter
+from typing import Callable, List, Optional
+
+OPERATORS = {
+    ">=": lambda a, b: a >= b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    "<": lambda a, b: a < b,
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "in": lambda a, b: a in b,
+    "not in": lambda a, b: a not in b,
+}
+
+DEFAULT_RULES = {
+    "eligibility": [
+        {"name": "min_credit_score", "when": {"field": "credit_score", "op": ">=", "lender_field": "min_credit_score"}},
+        {"name": "max_loan_amount", "when": {"field": "loan_amount_requested", "op": "<=", "lender_field": "max_loan_amount"}},
+    ],
+    "scoring": [
+        {"name": "industry_match", "when": {"field": "industry", "op": "in", "lender_field": "specialties"}, "points": 30},
+        {"name": "credit_margin", "when": {"field": "credit_score", "op": ">=", "lender_field": "min_credit_score", "offset": 50}, "points": 25},
+        {"name": "strong_qualification", "when": {"field": "ai.qualification_score", "op": ">=", "value": 80}, "points": 20},
+        {"name": "low_risk", "when": {"field": "ai.risk_assessment", "op": "==", "value": "Low"}, "points": 15, "else": 10},
+    ],
+}
+
+# Lender fields copied into each match result
+RESULT_FIELDS = ("lender_name", "lender_type", "interest_rate_range")
+
+class RuleError(ValueError):
+    """Raised when a rule definition is malformed"""
+
+def likelihood(match_score: int) -> str:
+    return "High" if match_score >= 70 else "Medium" if match_score >= 50 else "Low"
+
+def effective_rules(lender: dict, rules: dict = DEFAULT_RULES) -> dict:
+    """Merge a lender's named overrides into the default rule set"""
+    overrides = lender.get("rules") or {}
+    merged = {}
+    for section in ("eligibility", "scoring"):
+        by_name = {rule["name"]: copy.deepcopy(rule) for rule in rules.get(section, [])}
+        for name, override in (overrides.get(section) or {}).items():
+            if override.get("enabled") is False:
+                by_name.pop(name, None)
+            elif name in by_name:
+                by_name[name].update(override)
+            else:
+                by_name[name] = dict(override, name=name)
+        merged[section] = list(by_name.values())
+    return merged
+
+def merge_catalog(lenders: List[dict], rules: dict = DEFAULT_RULES) -> List[dict]:
+    """Validated effective rules for every lender, in catalog order"""
+    merged = []
+    for lender in lenders:
+        lender_rules = effective_rules(lender, rules)
+        for section in ("eligibility", "scoring"):
+            for rule in lender_rules[section]:
+                _check(rule, section)
+        merged.append(lender_rules)
+    return merged
+
+def _operand(rule: dict, lender: dict):
+    """Resolve the right-hand side of a condition against one lender"""
+    when = rule["when"]
+    if "lender_field" in when:
+        value = lender[when["lender_field"]]
+        if "offset" in when:
+            value = value + when["offset"]
+    else:
+        value = when["value"]
+    if when["op"] in ("in", "not in") and isinstance(value, (list, tuple, set)):
+        value = frozenset(value)
+    return value
+
+def _check(rule: dict, section: str):
+    when = rule.get("when")
+    if not isinstance(when, dict) or "field" not in when:
+        raise RuleError(f"{section} rule {rule.get('name')!r} needs a 'when' with a 'field'")
+    if when.get("op") not in OPERATORS:
+        raise RuleError(f"{section} rule {rule.get('name')!r} has unsupported op {when.get('op')!r}")
+    field = when["field"]
+    name = field[3:] if field.startswith("ai.") else field
+    if not name.isidentifier():
+        raise RuleError(f"{section} rule {rule.get('name')!r} has invalid field {field!r}")
+    if section == "eligibility" and field.startswith("ai."):
+        raise RuleError(f"eligibility rule {rule.get('name')!r} can't depend on the AI analysis")
+    if "lender_field" not in when and "value" not in when:
+        raise RuleError(f"{section} rule {rule.get('name')!r} needs a 'value' or 'lender_field'")
+    if section == "scoring":
+        for key in ("points", "else"):
+            if not isinstance(rule.get(key, 0), (int, float)):
+                raise RuleError(f"scoring rule {rule.get('name')!r} has non-numeric {key!r}")
+
+def _local_name(field: str) -> str:
+    """Local variable the compiled function binds a field to"""
+    return f"ai_{field[3:]}" if field.startswith("ai.") else f"app_{field}"
+
+_by_score = itemgetter(1)
+
+class CompiledCatalog:
+    """
+    A lender catalog with its rules compiled into two functions:
+    prefilter(app) applies eligibility and the scoring rules that only read the application,
+    finalize(candidates, ai) adds the AI-dependent terms. prefilter can therefore run while the
+    LLM call is still in flight.
+    """
+
+    def __init__(self, lenders: List[dict], rules: dict = DEFAULT_RULES):
+        self.lenders = lenders
+        self.rules = rules
+        self.results = [{field: lender[field] for field in RESULT_FIELDS} for lender in lenders]
+        self.source, self._prefilter, self._finalize = self._compile()
+
+    def _compile(self):
+        constants = {}
+
+        def const(value) -> str:
+            name = f"K{len(constants)}"
+            constants[name] = value
+            return name
+
+        prefilter_body, app_fields = [], {"industry"}
+        # Lenders sharing identical AI-dependent rules share one bonus computation
+        bonus_groups, lender_groups, ai_fields = {}, [], set()
+        for index, (lender, rules) in enumerate(zip(self.lenders, merge_catalog(self.lenders, self.rules))):
+
+            def condition(rule):
+                when = rule["when"]
+                return f"{_local_name(when['field'])} {when['op']} {const(_operand(rule, lender))}"
+
+            static = [r for r in rules["scoring"] if not r["when"]["field"].startswith("ai.")]
+            dynamic = [r for r in rules["scoring"] if r["when"]["field"].startswith("ai.")]
+            app_fields.update(r["when"]["field"] for r in rules["eligibility"] + static)
+            ai_fields.update(r["when"]["field"] for r in dynamic)
+
+            conditions = [condition(rule) for rule in rules["eligibility"]]
+            # repr keeps a catalog-supplied name from breaking out of the comment
+            prefilter_body.append(f"    # {lender['lender_name']!r}")
+            indent = "    "
+            if conditions:
+                prefilter_body.append(f"    if {' and '.join(conditions)}:")
+                indent = "        "
+            prefilter_body.append(f"{indent}score = 0")
+            prefilter_body.extend(_scoring_lines(static, condition, const, indent))
+            specialties = const(frozenset(lender.get("specialties", ())))
+            prefilter_body.append(f"{indent}candidates.append(({index}, score, app_industry in {specialties}))")
+
+            signature = tuple(
+                (r["when"]["field"], r["when"]["op"], _operand(r, lender), r.get("points", 0), r.get("else", 0))
+                for r in dynamic
+            )
+            if signature not in bonus_groups:
+                bonus_groups[signature] = (f"bonus{len(bonus_groups)}", dynamic, lender)
+            lender_groups.append(bonus_groups[signature][0])
+
+        finalize_body = []
+        for name, dynamic, lender in bonus_groups.values():
+            def condition(rule, lender=lender):
+                when = rule["when"]
+                return f"{_local_name(when['field'])} {when['op']} {const(_operand(rule, lender))}"
+            finalize_body.append(f"    {name} = 0")
+            finalize_body.extend(_scoring_lines(dynamic, condition, const, "    ", target=name))
+        finalize_body.append(f"    bonus = ({', '.join(lender_groups)}{',' if len(lender_groups) == 1 else ''})")
+        finalize_body.append("    return [(index, score + bonus[index], industry_match) for index, score, industry_match in candidates]")
+
+        # Constants are bound as default arguments and fields are read once into locals,
+        # so the bodies run on fast local lookups only
+        defaults = "".join(f", {name}={name}" for name in constants)
+        lines = [f"def prefilter(app{defaults}):"]
+        lines.extend(f"    {_local_name(field)} = app.{field}" for field in sorted(app_fields))
+        lines.append("    candidates = []")
+        lines.extend(prefilter_body)
+        lines.append("    return candidates")
+        lines.append("")
+        lines.append(f"def finalize(candidates, ai{defaults}):")
+        lines.extend(f"    {_local_name(field)} = ai[{field[3:]!r}]" for field in sorted(ai_fields))
+        lines.extend(finalize_body)
+
+        source = "\n".join(lines)
+        namespace = dict(constants)
+        exec(compile(source, "<lender_rules>", "exec"), namespace)
+        return source, namespace["prefilter"], namespace["finalize"]
+
+    def prefilter(self, application) -> list:
+        """Eligible lenders with their application-only partial scores"""
+        return self._prefilter(application)
+
+    def finalize(self, candidates: list, ai_analysis: dict, limit: int = 3) -> List[dict]:
+        """Apply the AI-dependent terms to prefiltered candidates and return the top matches"""
+        matches = self._finalize(candidates, ai_analysis) if candidates else candidates
+        matches.sort(key=_by_score, reverse=True)
+        results = []
+        for index, score, industry_match in matches[:limit]:
+            result = self.results[index].copy()
+            result["match_score"] = score
+            result["industry_match"] = industry_match
+            result["pre_approval_likelihood"] = "High" if score >= 70 else "Medium" if score >= 50 else "Low"
+            results.append(result)
+        return results
+
+    def match(self, application, ai_analysis: dict, limit: int = 3) -> List[dict]:
+        """Return the top matching lenders, best first"""
+        return self.finalize(self._prefilter(application), ai_analysis, limit)
+
+def _scoring_lines(rules: List[dict], condition: Callable, const: Callable, indent: str, target: str = "score") -> List[str]:
+    """Source lines adding each rule's points (or else-points) to `target`"""
+    lines = []
+    for rule in rules:
+        lines.append(f"{indent}if {condition(rule)}:")
+        lines.append(f"{indent}    {target} += {const(rule.get('points', 0))}")
+        if rule.get("else"):
+            lines.append(f"{indent}else:")
+            lines.append(f"{indent}    {target} += {const(rule['else'])}")
+    return lines
+
+def evaluate_interpreted(lenders: List[dict], merged_rules: List[dict], application, ai_analysis: dict,
+                         limit: int = 3) -> List[dict]:
+    """
+    Reference evaluator that walks the rule dicts on every call; used to check the compiler.
+    `merged_rules` comes from merge_catalog, so only evaluation is repeated per call.
+    """
+    matches = []
+    for lender, merged in zip(lenders, merged_rules):
+
+        def holds(rule):
+            field = rule["when"]["field"]
+            left = ai_analysis[field[3:]] if field.startswith("ai.") else getattr(application, field)
+            return OPERATORS[rule["when"]["op"]](left, _operand(rule, lender))
+
+        if not all(holds(rule) for rule in merged["eligibility"]):
+            continue
+        score = 0
+        for rule in merged["scoring"]:
+            score += rule.get("points", 0) if holds(rule) else rule.get("else", 0)
+        matches.append(dict(
+            {field: lender[field] for field in RESULT_FIELDS},
+            match_score=score,
+            industry_match=application.industry in lender.get("specialties", ()),
+            pre_approval_likelihood=likelihood(score),
+        ))
+    matches.sort(key=lambda m: m["match_score"], reverse=True)
+    return matches[:limit]
+
+def score_columns(lenders: List[dict], columns: dict, rules: dict = DEFAULT_RULES):
+    """
+    Vectorized rule evaluation for offline scoring. `columns` maps application fields and
+    `ai.<key>` fields to equal-length NumPy arrays. Returns (scores, eligible, industry_match),
+    each shaped (rows, lenders).
+    """
+    import numpy as np
+
+    rows = len(columns["industry"])
+    scores = np.zeros((rows, len(lenders)))
+    eligible = np.ones((rows, len(lenders)), dtype=bool)
+    industry_match = np.zeros((rows, len(lenders)), dtype=bool)
+
+    def holds(rule, lender):
+        when = rule["when"]
+        column, operand = columns[when["field"]], _operand(rule, lender)
+        if when["op"] in ("in", "not in"):
+            result = np.isin(column, list(operand))
+            return ~result if when["op"] == "not in" else result
+        return OPERATORS[when["op"]](column, operand)
+
+    for j, (lender, merged) in enumerate(zip(lenders, merge_catalog(lenders, rules))):
+        for rule in merged["eligibility"]:
+            eligible[:, j] &= holds(rule, lender)
+        for rule in merged["scoring"]:
+            scores[:, j] += np.where(holds(rule, lender), rule.get("points", 0), rule.get("else", 0))
+        industry_match[:, j] = np.isin(columns["industry"], list(lender.get("specialties", ())))
+    return scores, eligible, industry_match
+
+def load_catalog(default_lenders: List[dict], path: Optional[str] = None) -> CompiledCatalog:
+    """
+    Compile the lender catalog. A JSON file (LENDER_CATALOG_FILE) may supply
+    {"lenders": [...], "rules": {...}}; missing keys fall back to the defaults.
+    """
+    path = path or os.environ.get('LENDER_CATALOG_FILE')
+    lenders, rules = default_lenders, DEFAULT_RULES
+    if path:
+        with open(path) as f:
+            catalog = json.load(f)
+        lenders = catalog.get("lenders", lenders)
+        rules = catalog.get("rules", rules)
+    return CompiledCatalog(lenders, rules)
@@ -0,0 +1,152 @@
+"""
+Non-blocking structured logging for the QuickFlow Capital API
+Log calls on the request path only enqueue the record; a background thread formats it as a
+JSON line and writes it out. The queue is bounded: when it is full the record is dropped and
+counted instead of blocking the event loop. Every record carries the current request ID and
+application ID from context variables.
+
+LOG_SAMPLE_RATES keeps a fraction of sub-WARNING records per logger for high-volume events,
+e.g. LOG_SAMPLE_RATES="rate_limit=0.1,pubsub=0.5".
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+import metrics
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+LOG_SAMPLE_RATES = os.environ.get('LOG_SAMPLE_RATES', '')
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+application_id_var: ContextVar[Optional[str]] = ContextVar("application_id", default=None)
+
+metrics.describe("log_records_dropped_total", "counter", "Log records dropped because the log queue was full")
+metrics.describe("log_records_sampled_out_total", "counter", "Log records skipped by per-logger sampling")
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "application_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def bind_application(application_id: str):
+    """Attach an application ID to every log record for the rest of this request"""
+    application_id_var.set(application_id)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with context IDs and any `extra=` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.request_id:
+            entry["request_id"] = record.request_id
+        if record.application_id:
+            entry["application_id"] = record.application_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Keeps a configured fraction of sub-WARNING records for selected loggers"""
+
+    def __init__(self, spec: str = LOG_SAMPLE_RATES):
+        super().__init__()
+        self.rates = {}
+        for part in filter(None, (p.strip() for p in spec.split(","))):
+            name, _, rate = part.partition("=")
+            self.rates[name.strip()] = float(rate)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self.rates.get(record.name)
+        if rate is None or random.random() < rate:
+            return True
+        metrics.inc("log_records_sampled_out_total", logger=record.name)
+        return False
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """Captures request context and enqueues without ever blocking"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Context variables must be read on the calling thread; formatting happens later
+        record.request_id = request_id_var.get()
+        record.application_id = application_id_var.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.inc("log_records_dropped_total")
+
+def setup_logging(stream=None):
+    """Route the root logger through the background queue; safe to call more than once"""
+    global _listener
+    if _listener is not None:
+        return
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+
+    handler = BoundedQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter())
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+class RequestContextMiddleware:
+    """ASGI middleware assigning each request an ID (X-Request-ID is honoured and echoed)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            return await self.app(scope, receive, send)
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        request_token = request_id_var.set(request_id)
+        application_token = application_id_var.set(None)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(request_token)
+            application_id_var.reset(application_token)
@@ -0,0 +1,91 @@
+"""
+In-process metrics for the QuickFlow Capital API
+Counters, gauges and histograms rendered in the Prometheus text format at /api/metrics.
+"""
+
+import threading
+from typing import Dict, Tuple
+
+# Histogram buckets in seconds, tuned for request and LLM latencies
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, tuple], float] = {}
+_gauges: Dict[Tuple[str, tuple], float] = {}
+_histograms: Dict[Tuple[str, tuple], list] = {}
+_help: Dict[str, Tuple[str, str]] = {}
+
+def _key(name: str, labels: dict) -> Tuple[str, tuple]:
+    return name, tuple(sorted(labels.items())) if labels else ()
+
+def describe(name: str, kind: str, help_text: str):
+    """Register HELP/TYPE metadata for a metric"""
+    _help[name] = (kind, help_text)
+
+def inc(name: str, value: float = 1, **labels):
+    """Increment a counter"""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def set_gauge(name: str, value: float, **labels):
+    """Set a gauge to an absolute value"""
+    _gauges[_key(name, labels)] = value
+
+def observe(name: str, value: float, **labels):
+    """Record one observation in a histogram"""
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            # [bucket counts..., count, sum]
+            hist = _histograms[key] = [0] * len(DEFAULT_BUCKETS) + [0, 0.0]
+        for i, bound in enumerate(DEFAULT_BUCKETS):
+            if value <= bound:
+                hist[i] += 1
+        hist[-2] += 1
+        hist[-1] += value
+
+def get_counter(name: str, **labels) -> float:
+    """Read a counter value (0 if never incremented)"""
+    return _counters.get(_key(name, labels), 0)
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+def render() -> str:
+    """Render all metrics in the Prometheus text exposition format"""
+    lines = []
+    seen = set()
+
+    def header(name, kind):
+        if name in seen:
+            return
+        seen.add(name)
+        meta = _help.get(name)
+        if meta:
+            lines.append(f"# HELP {name} {meta[1]}")
+        lines.append(f"# TYPE {name} {meta[0] if meta else kind}")
+
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted((k, list(v)) for k, v in _histograms.items())
+    gauges = sorted(_gauges.items())
+
+    for (name, labels), value in counters:
+        header(name, "counter")
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), value in gauges:
+        header(name, "gauge")
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), hist in histograms:
+        header(name, "histogram")
+        for bound, count in zip(DEFAULT_BUCKETS, hist):
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', bound),))} {count}")
+        lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {hist[-2]}")
+        lines.append(f"{name}_count{_format_labels(labels)} {hist[-2]}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {hist[-1]}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,161 @@
+"""
+MongoDB client configuration: connection pool sizing and read routing
+Writes always go to the primary. Reads that tolerate slightly stale data (application lookups,
+index loading) use a separate database handle whose read preference comes from
+MONGO_READ_PREFERENCE, bounded by MONGO_MAX_STALENESS_SECONDS (MongoDB requires at least 90).
+Pool checkouts are tracked per server by a ConnectionPoolListener and exported as metrics.
+
+To try routing locally, run a single-host replica set; with no secondaries available,
+secondaryPreferred reads fall back to the primary:
+
+    mongod --replSet rs0 --dbpath /tmp/rs0 --port 27017
+    mongosh --eval 'rs.initiate()'
+    MONGO_URL="mongodb://localhost:27017/?replicaSet=rs0" MONGO_READ_PREFERENCE=secondaryPreferred \\
+        python mongo_routing.py
+"""
+
+import asyncio
+import os
+import threading
+from typing import Dict
+
+from pymongo import monitoring, read_preferences
+
+import metrics
+
+MONGO_READ_PREFERENCE = os.environ.get('MONGO_READ_PREFERENCE', 'primary')
+MONGO_MAX_STALENESS_SECONDS = int(os.environ.get('MONGO_MAX_STALENESS_SECONDS', '90'))
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '0'))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '0'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '30000'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '0'))
+
+_READ_MODES = {
+    "primaryPreferred": read_preferences.PrimaryPreferred,
+    "secondary": read_preferences.Secondary,
+    "secondaryPreferred": read_preferences.SecondaryPreferred,
+    "nearest": read_preferences.Nearest,
+}
+
+metrics.describe("mongo_pool_connections", "gauge", "Open MongoDB connections per server")
+metrics.describe("mongo_pool_checked_out", "gauge", "MongoDB connections in use per server")
+metrics.describe("mongo_pool_checkout_failures_total", "counter", "Failed MongoDB connection checkouts")
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Tracks open and checked-out connections per server; events arrive on driver threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pools: Dict[str, dict] = {}
+
+    def _pool(self, address) -> dict:
+        key = f"{address[0]}:{address[1]}"
+        pool = self.pools.get(key)
+        if pool is None:
+            pool = self.pools[key] = {"open": 0, "checked_out": 0, "max_size": MONGO_MAX_POOL_SIZE}
+        return pool
+
+    def _update(self, address, field: str, delta: int):
+        with self.lock:
+            pool = self._pool(address)
+            pool[field] = max(0, pool[field] + delta)
+            value = pool[field]
+        name = "mongo_pool_connections" if field == "open" else "mongo_pool_checked_out"
+        metrics.set_gauge(name, value, address=f"{address[0]}:{address[1]}")
+
+    def pool_created(self, event):
+        with self.lock:
+            self._pool(event.address)["max_size"] = event.options.get("maxPoolSize", MONGO_MAX_POOL_SIZE)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        with self.lock:
+            self.pools.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    def connection_created(self, event):
+        self._update(event.address, "open", 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event.address, "open", -1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        metrics.inc("mongo_pool_checkout_failures_total", reason=str(event.reason))
+
+    def connection_checked_out(self, event):
+        self._update(event.address, "checked_out", 1)
+
+    def connection_checked_in(self, event):
+        self._update(event.address, "checked_out", -1)
+
+    def stats(self) -> dict:
+        """Per-server pool usage; utilization is checked-out connections over the pool cap"""
+        with self.lock:
+            return {
+                address: dict(pool, utilization=round(pool["checked_out"] / pool["max_size"], 3) if pool["max_size"] else None)
+                for address, pool in self.pools.items()
+            }
+
+pool_monitor = PoolMonitor()
+
+def read_preference(mode: str = MONGO_READ_PREFERENCE, max_staleness: int = MONGO_MAX_STALENESS_SECONDS):
+    """Read preference for staleness-tolerant reads; primary unless configured otherwise"""
+    if mode == "primary":
+        return read_preferences.Primary()
+    if mode not in _READ_MODES:
+        raise ValueError(f"Unknown MONGO_READ_PREFERENCE {mode!r}; expected primary or one of {sorted(_READ_MODES)}")
+    return _READ_MODES[mode](max_staleness=max_staleness)
+
+def client_options() -> dict:
+    """Keyword arguments for the Motor client; these override the same options given in MONGO_URL"""
+    options = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "event_listeners": [pool_monitor],
+    }
+    if MONGO_MAX_IDLE_TIME_MS:
+        options["maxIdleTimeMS"] = MONGO_MAX_IDLE_TIME_MS
+    if MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = MONGO_WAIT_QUEUE_TIMEOUT_MS
+    return options
+
+def routing_state(client) -> dict:
+    """Topology, read routing and pool usage, for the admin endpoint and the CLI"""
+    # Motor proxies attribute access to databases, so ask the wrapped PyMongo client
+    description = client.delegate.topology_description
+    return {
+        "topology": description.topology_type_name,
+        "servers": {
+            f"{address[0]}:{address[1]}": server.server_type_name
+            for address, server in description.server_descriptions().items()
+        },
+        "read_preference": read_preference().document,
+        "pools": pool_monitor.stats(),
+    }
+
+def main():
+    import server
+
+    async def run():
+        server.connect_database()
+        await server.db.command("ping")
+        await server.read_db.loan_applications.find_one({}, {"_id": 1})
+        for key, value in routing_state(server.client).items():
+            print(f"{key}: {value}")
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+DAG-style stage pipeline for request processing
+Stages declare the stages they depend on; every stage starts as soon as its dependencies have
+finished, so independent work (e.g. lender prefiltering) overlaps slow I/O (the LLM call).
+
+    pipeline = Pipeline()
+
+    @pipeline.stage("analysis")
+    async def analysis(ctx): ...
+
+    @pipeline.stage("matches", after=("analysis",))
+    def matches(ctx): return use(ctx["analysis"])
+
+    ctx = await pipeline.run({"application": application})
+
+Stage functions receive the shared context dict; their return value is stored under the stage
+name. Each stage is timed as a tracing span of the same name.
+"""
+
+import asyncio
+import inspect
+from typing import Callable, Dict, Iterable, Tuple
+
+import tracing
+
+class PipelineError(ValueError):
+    """Raised when stages form an invalid graph"""
+
+class Stage:
+    __slots__ = ("name", "fn", "after", "is_async")
+
+    def __init__(self, name: str, fn: Callable, after: Tuple[str, ...]):
+        self.name = name
+        self.fn = fn
+        self.after = after
+        self.is_async = inspect.iscoroutinefunction(fn)
+
+class Pipeline:
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+        self._order = None
+
+    def stage(self, name: str, after: Iterable[str] = ()):
+        """Decorator registering a sync or async stage"""
+        def register(fn: Callable) -> Callable:
+            if name in self.stages:
+                raise PipelineError(f"Stage {name!r} already registered")
+            self.stages[name] = Stage(name, fn, tuple(after))
+            self._order = None
+            return fn
+        return register
+
+    def order(self) -> Tuple[str, ...]:
+        """Stages in a valid execution order; validates dependencies and cycles"""
+        if self._order is not None:
+            return self._order
+        order, state = [], {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise PipelineError(f"Stage cycle: {' -> '.join(path + [name])}")
+            if name not in self.stages:
+                raise PipelineError(f"Unknown stage {name!r} required by {path[-1]!r}")
+            state[name] = "visiting"
+            for dependency in self.stages[name].after:
+                visit(dependency, path + [name])
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        self._order = tuple(order)
+        return self._order
+
+    async def _run_stage(self, stage: Stage, context: dict, tasks: Dict[str, asyncio.Task]):
+        if stage.after:
+            await asyncio.gather(*(tasks[d] for d in stage.after))
+        with tracing.span(stage.name):
+            if stage.is_async:
+                result = await stage.fn(context)
+            else:
+                result = stage.fn(context)
+        context[stage.name] = result
+        return result
+
+    async def run(self, context: dict) -> dict:
+        """Run every stage, overlapping independent ones; the first failure cancels the rest"""
+        tasks: Dict[str, asyncio.Task] = {}
+        for name in self.order():
+            tasks[name] = asyncio.create_task(self._run_stage(self.stages[name], context, tasks))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return context
@@ -0,0 +1,163 @@
+"""
+Application status fan-out for WebSocket subscribers
+Each WebSocket connection owns a bounded queue and subscribes it to application IDs. Events are
+delivered in-process by default. With PUBSUB_BACKEND=changestream, status events are written
+to `application_events` and every worker tails a database change stream (events plus new
+`loan_applications` inserts for every tenant), so a subscriber on any worker sees results
+stored by any other.
+Subscriptions are keyed by (tenant, application_id), with the tenant taken from the event or
+the collection the result was stored in, so one brand never receives another's events.
+Change streams require MongoDB running as a replica set.
+"""
+
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+import metrics
+from tenancy import DEFAULT_TENANT, TENANT_STORAGE, application_namespace, namespace_tenant
+
+logger = logging.getLogger(__name__)
+
+PUBSUB_BACKEND = os.environ.get('PUBSUB_BACKEND', 'local')
+SUBSCRIBER_QUEUE_SIZE = int(os.environ.get('WS_SUBSCRIBER_QUEUE_SIZE', '100'))
+# Application IDs one connection may follow at once; the connection is closed past this
+MAX_SUBSCRIPTIONS = int(os.environ.get('WS_MAX_SUBSCRIPTIONS', '100'))
+EVENTS_COLLECTION = "application_events"
+
+# Status events only matter while a submission is in flight
+EVENT_TTL_SECONDS = 3600
+
+metrics.describe("ws_messages_dropped_total", "counter", "WebSocket messages dropped because a subscriber fell behind")
+
+def result_message(application_id: str, loan_result: dict) -> dict:
+    return {"type": "result", "application_id": application_id, "result": jsonable_encoder(loan_result)}
+
+def status_message(application_id: str, status: str, detail: Optional[str] = None) -> dict:
+    message = {"type": "status", "application_id": application_id, "status": status}
+    if detail:
+        message["detail"] = detail
+    return message
+
+class Subscription:
+    """One connection's queue, its tenant and the application IDs it listens to"""
+
+    def __init__(self, tenant: str = DEFAULT_TENANT):
+        self.tenant = tenant
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.application_ids: Set[str] = set()
+
+    def deliver(self, message: dict):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            metrics.inc("ws_messages_dropped_total")
+
+class ResultBroker:
+    """Routes status and result events to the subscriptions interested in them"""
+
+    def __init__(self, backend: str = PUBSUB_BACKEND):
+        self.backend = backend
+        self.subscribers: Dict[Tuple[str, str], Set[Subscription]] = defaultdict(set)
+        self.db = None
+        self.indexed = False
+        self._watcher: Optional[asyncio.Task] = None
+
+    def subscribe(self, subscription: Subscription, application_ids: Iterable[str]):
+        for application_id in application_ids:
+            subscription.application_ids.add(application_id)
+            self.subscribers[subscription.tenant, application_id].add(subscription)
+        metrics.set_gauge("ws_subscriptions", sum(len(s) for s in self.subscribers.values()))
+
+    def unsubscribe(self, subscription: Subscription, application_ids: Optional[Iterable[str]] = None):
+        for application_id in list(application_ids or subscription.application_ids):
+            subscription.application_ids.discard(application_id)
+            key = (subscription.tenant, application_id)
+            subscribers = self.subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[key]
+        metrics.set_gauge("ws_subscriptions", sum(len(s) for s in self.subscribers.values()))
+
+    def deliver(self, tenant: str, message: dict):
+        """Hand a message to the tenant's local subscribers of its application"""
+        for subscription in tuple(self.subscribers.get((tenant, message["application_id"]), ())):
+            subscription.deliver(message)
+
+    async def publish_status(self, tenant: str, application_id: str, status: str, detail: Optional[str] = None):
+        message = status_message(application_id, status, detail)
+        if self._watcher is None:
+            self.deliver(tenant, message)
+            return
+        await self.db[EVENTS_COLLECTION].insert_one({
+            **message,
+            "tenant": tenant,
+            "expires_at": datetime.utcnow() + timedelta(seconds=EVENT_TTL_SECONDS),
+        })
+
+    def publish_result(self, tenant: str, application_id: str, loan_result: dict):
+        """Results reach other workers through the tenant's loan_applications insert itself"""
+        if self._watcher is None:
+            self.deliver(tenant, result_message(application_id, loan_result))
+
+    async def start(self, db):
+        """
+        Start tailing the change stream when configured for cross-worker fan-out; nothing here
+        touches MongoDB, so startup can't block on it
+        """
+        self.db = db
+        if self.backend != "changestream":
+            return
+        self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+
+    async def ensure_indexes(self):
+        """TTL purge of status events"""
+        await self.db[EVENTS_COLLECTION].create_index("expires_at", expireAfterSeconds=0)
+        self.indexed = True
+
+    async def _watch(self):
+        pipeline = [{"$match": {
+            "operationType": "insert",
+            "$or": [
+                {"ns.db": self.db.name, "ns.coll": EVENTS_COLLECTION},
+                application_namespace(self.db.name),
+            ],
+        }}]
+        # Tenants with their own databases are only visible to a cluster-wide stream
+        source = self.db.client if TENANT_STORAGE == "database" else self.db
+        resume_token = None
+        while True:
+            if not self.indexed:
+                try:
+                    await self.ensure_indexes()
+                except Exception as e:
+                    # Events still flow without the TTL index; it is retried on the next reconnect
+                    logger.warning("Event index creation failed: %s", e)
+            try:
+                async with source.watch(pipeline, resume_after=resume_token) as stream:
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        doc = change["fullDocument"]
+                        if change["ns"]["coll"] == EVENTS_COLLECTION:
+                            tenant = doc.get("tenant", DEFAULT_TENANT)
+                            self.deliver(tenant, {k: v for k, v in doc.items() if k not in ("_id", "expires_at", "tenant")})
+                            continue
+                        tenant = namespace_tenant(change["ns"], self.db.name)
+                        if (tenant, doc.get("application_id")) in self.subscribers:
+                            self.deliver(tenant, result_message(doc["application_id"], doc["loan_result"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Change stream interrupted, reconnecting: %s", e)
+                await asyncio.sleep(1)
@@ -0,0 +1,219 @@
+"""
+Token-bucket rate limiting for the QuickFlow Capital API
+Buckets are keyed by client IP, API key and applicant email. The default store is
+in-process; set RATE_LIMIT_STORE=mongo to share buckets between workers. A request takes a
+token from each of its buckets only when every bucket has one, so a rejection costs nothing.
+
+The client IP is the right-most X-Forwarded-For entry not added by a trusted proxy (peers in
+TRUSTED_PROXIES, private ranges by default), so clients can't pick their own bucket by
+prepending addresses. Set TRUST_FORWARDED_FOR=true when the proxy in front of the API connects
+from a public address.
+"""
+
+import ipaddress
+import logging
+import math
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', 'memory')
+TRUST_FORWARDED_FOR = os.environ.get('TRUST_FORWARDED_FOR', 'false').lower() == 'true'
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(n.strip())
+    for n in os.environ.get(
+        'TRUSTED_PROXIES', '127.0.0.0/8,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16,::1/128,fc00::/7'
+    ).split(',')
+    if n.strip()
+]
+
+# Upper bound on in-process buckets before idle (full) ones are evicted
+MAX_LOCAL_BUCKETS = int(os.environ.get('RATE_LIMIT_MAX_BUCKETS', '100000'))
+
+def _limit(scope: str, per_minute: str, burst: str) -> Tuple[float, float]:
+    """Read (refill rate per second, capacity) for a scope from the environment"""
+    rate = float(os.environ.get(f'RATE_LIMIT_{scope}_PER_MINUTE', per_minute)) / 60.0
+    capacity = float(os.environ.get(f'RATE_LIMIT_{scope}_BURST', burst))
+    return rate, capacity
+
+LIMITS = {
+    "ip": _limit("IP", "30", "10"),
+    "api_key": _limit("API_KEY", "120", "30"),
+    "email": _limit("EMAIL", "5", "3"),
+}
+
+metrics.describe("rate_limit_rejections_total", "counter", "Requests rejected by the rate limiter")
+
+class LocalBucketStore:
+    """Token buckets held in a dict; each check is a couple of float operations"""
+
+    def __init__(self, max_buckets: int = MAX_LOCAL_BUCKETS):
+        self.buckets: Dict[str, list] = {}
+        self.max_buckets = max_buckets
+
+    def peek(self, key: str, rate: float, capacity: float) -> float:
+        """Like take, without consuming a token"""
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return 0.0
+        tokens = min(capacity, bucket[0] + (time.monotonic() - bucket[1]) * rate)
+        return 0.0 if tokens >= 1 else (1 - tokens) / rate
+
+    def take(self, key: str, rate: float, capacity: float) -> float:
+        """Take one token; returns 0 when allowed, otherwise seconds until a token is available"""
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_buckets:
+                self._evict(now)
+            self.buckets[key] = [capacity - 1, now, rate, capacity]
+            return 0.0
+
+        tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / rate
+
+    def _evict(self, now: float):
+        """Drop buckets that have refilled completely; they carry no state"""
+        full = [
+            key for key, (tokens, last, rate, capacity) in self.buckets.items()
+            if tokens + (now - last) * rate >= capacity
+        ]
+        for key in full:
+            del self.buckets[key]
+        if len(self.buckets) >= self.max_buckets:
+            self.buckets.clear()
+
+class MongoBucketStore:
+    """Token buckets shared between workers, updated atomically with a pipeline update"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._indexed = False
+
+    async def _ensure_index(self):
+        if not self._indexed:
+            await self.collection.create_index("expires_at", expireAfterSeconds=0)
+            self._indexed = True
+
+    async def peek(self, key: str, rate: float, capacity: float) -> float:
+        """Like take, without consuming a token"""
+        await self._ensure_index()
+        bucket = await self.collection.find_one({"_id": key}, {"tokens": 1, "ts": 1})
+        if bucket is None:
+            return 0.0
+        tokens = min(capacity, bucket["tokens"] + (time.time() - bucket["ts"]) * rate)
+        return 0.0 if tokens >= 1 else (1 - tokens) / rate
+
+    async def take(self, key: str, rate: float, capacity: float) -> float:
+        await self._ensure_index()
+        now = time.time()
+        # Idle buckets expire once they would have refilled anyway
+        expires_at = datetime.utcnow() + timedelta(seconds=capacity / rate + 60)
+        refilled = {"$min": [
+            capacity,
+            {"$add": [
+                {"$ifNull": ["$tokens", capacity]},
+                {"$multiply": [{"$subtract": [now, {"$ifNull": ["$ts", now]}]}, rate]},
+            ]},
+        ]}
+        from pymongo import ReturnDocument
+        bucket = await self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "ts": now, "expires_at": expires_at}},
+                {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]}}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if bucket["allowed"]:
+            return 0.0
+        return (1 - bucket["tokens"]) / rate
+
+class RateLimiter:
+    """Checks the configured buckets for a request, falling back to local buckets if Mongo fails"""
+
+    def __init__(self, limits: dict = LIMITS):
+        self.limits = limits
+        self.local = LocalBucketStore()
+        self.shared: Optional[MongoBucketStore] = None
+
+    def use_shared_store(self, collection):
+        self.shared = MongoBucketStore(collection)
+
+    async def check(self, identities: Iterable[Tuple[str, Optional[str]]]) -> Optional[Tuple[str, float]]:
+        """
+        Take a token from every (scope, identity) bucket if all of them have one. Otherwise
+        nothing is taken and (scope, Retry-After delay) of the first exhausted bucket is returned.
+        """
+        if not RATE_LIMIT_ENABLED:
+            return None
+        buckets = [(scope, f"{scope}:{identity}", *self.limits[scope]) for scope, identity in identities if identity]
+        if self.shared is not None:
+            try:
+                return await self._check_shared(buckets)
+            except Exception as e:
+                logger.warning("Shared rate limit store unavailable, using local buckets: %s", e)
+        return self._check_local(buckets)
+
+    def _check_local(self, buckets: list) -> Optional[Tuple[str, float]]:
+        for scope, key, rate, capacity in buckets:
+            delay = self.local.peek(key, rate, capacity)
+            if delay:
+                return scope, delay
+        for scope, key, rate, capacity in buckets:
+            self.local.take(key, rate, capacity)
+        return None
+
+    async def _check_shared(self, buckets: list) -> Optional[Tuple[str, float]]:
+        for scope, key, rate, capacity in buckets:
+            delay = await self.shared.peek(key, rate, capacity)
+            if delay:
+                return scope, delay
+        for scope, key, rate, capacity in buckets:
+            # Another worker can drain a bucket between the peek and the take; rare and bounded
+            # by one token per bucket, so it isn't worth a multi-document transaction
+            delay = await self.shared.take(key, rate, capacity)
+            if delay:
+                return scope, delay
+        return None
+
+def _trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+def client_ip(request) -> Optional[str]:
+    """
+    The caller's IP. X-Forwarded-For is read right to left, skipping entries added by trusted
+    proxies; anything left of the first untrusted address is client-supplied and ignored.
+    """
+    peer = request.client.host if request.client else None
+    if peer is None or not (TRUST_FORWARDED_FOR or _trusted_proxy(peer)):
+        return peer
+    forwarded = request.headers.get("x-forwarded-for")
+    if not forwarded:
+        return peer
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
+
+def retry_after_header(delay: float) -> str:
+    """Retry-After is whole seconds, rounded up so clients don't retry too early"""
+    return str(max(1, math.ceil(delay)))
@@ -0,0 +1,217 @@
+"""
+Bulk lender re-matching for stored loan applications
+Streams `loan_applications` in _id order, recomputes matched_lenders from the stored
+business_details and loan_result with the current lender catalog (no LLM calls), and writes
+changed results back in unordered bulk batches. Progress is checkpointed after every batch so
+an interrupted run resumes where it stopped. Documents that fail to re-match are recorded in the
+checkpoint (up to MAX_FAILED_IDS) and retried first when the job resumes.
+
+Run from the backend directory:
+    python rematch.py [--batch-size 500] [--restart] [--tenant acme]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from pymongo import UpdateOne
+
+from tiering import HOT_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_COLLECTION = "job_checkpoints"
+JOB_ID = "rematch_lenders"
+
+# How often progress is reported while a job runs
+REPORT_INTERVAL = 5.0
+
+# Failed document IDs kept in the checkpoint for retry; older ones beyond this are dropped
+MAX_FAILED_IDS = 1000
+
+class RematchJob:
+    """One re-matching run; `status()` reports progress and throughput"""
+
+    def __init__(self, db, match: Callable, build_application: Callable, batch_size: int = 500,
+                 collection: str = HOT_COLLECTION):
+        self.db = db
+        self.collection = collection
+        # Tenants sharing a database keep separate checkpoints
+        self.job_id = JOB_ID if collection == HOT_COLLECTION else f"{JOB_ID}:{collection}"
+        self.match = match
+        self.build_application = build_application
+        self.batch_size = batch_size
+        self.state = "pending"
+        self.processed = 0
+        self.updated = 0
+        self.failed = 0
+        # Documents processed by earlier runs of a resumed job; excluded from throughput
+        self.resumed_from = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.last_id = None
+        # Documents that failed to re-match, retried when the job resumes
+        self.failed_ids: list = []
+        self.error: Optional[str] = None
+
+    def status(self) -> dict:
+        end = self.finished_at or time.monotonic()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        return {
+            "state": self.state,
+            "processed": self.processed,
+            "updated": self.updated,
+            "failed": self.failed,
+            "elapsed_seconds": round(elapsed, 2),
+            "docs_per_second": round((self.processed - self.resumed_from) / elapsed, 1) if elapsed else 0.0,
+            "last_id": str(self.last_id) if self.last_id is not None else None,
+            "error": self.error,
+        }
+
+    async def _load_checkpoint(self, restart: bool):
+        checkpoints = self.db[CHECKPOINT_COLLECTION]
+        if restart:
+            await checkpoints.delete_one({"_id": self.job_id})
+            return
+        checkpoint = await checkpoints.find_one({"_id": self.job_id})
+        if checkpoint and not checkpoint.get("completed"):
+            self.last_id = checkpoint.get("last_id")
+            self.processed = self.resumed_from = checkpoint.get("processed", 0)
+            self.updated = checkpoint.get("updated", 0)
+            self.failed_ids = checkpoint.get("failed_ids", [])
+
+    async def _save_checkpoint(self, completed: bool = False):
+        await self.db[CHECKPOINT_COLLECTION].update_one(
+            {"_id": self.job_id},
+            {"$set": {
+                "last_id": self.last_id,
+                "processed": self.processed,
+                "updated": self.updated,
+                "failed_ids": self.failed_ids,
+                "completed": completed,
+                "updated_at": datetime.utcnow(),
+            }},
+            upsert=True,
+        )
+
+    def _rematch(self, doc: dict) -> Optional[UpdateOne]:
+        """Build the update for one document, or None if its matches are unchanged"""
+        loan_result = doc.get("loan_result") or {}
+        application = self.build_application(doc["business_details"])
+        matched = self.match(application, loan_result)
+        if matched == loan_result.get("matched_lenders"):
+            return None
+        return UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": {"loan_result.matched_lenders": matched, "rematched_at": datetime.utcnow()}},
+        )
+
+    def _process(self, doc: dict, operations: list):
+        try:
+            operation = self._rematch(doc)
+            if operation is not None:
+                operations.append(operation)
+        except Exception as e:
+            self.failed += 1
+            self.failed_ids.append(doc["_id"])
+            del self.failed_ids[:-MAX_FAILED_IDS]
+            logger.warning("Re-match failed for %s: %s", doc.get("_id"), e)
+
+    async def _retry_failed(self):
+        """Re-match documents an earlier run failed on; they were already counted as processed"""
+        retry, self.failed_ids = self.failed_ids, []
+        operations = []
+        cursor = self.db[self.collection].find({"_id": {"$in": retry}}, {"business_details": 1, "loan_result": 1})
+        async for doc in cursor:
+            self._process(doc, operations)
+        await self._flush(operations)
+
+    async def _flush(self, operations: list):
+        if not operations:
+            return
+        result = await self.db[self.collection].bulk_write(operations, ordered=False)
+        self.updated += result.modified_count
+
+    async def run(self, restart: bool = False):
+        """Process every stored application after the last checkpoint"""
+        self.state = "running"
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.error = None
+        last_report = self.started_at
+        try:
+            await self._load_checkpoint(restart)
+            if self.failed_ids:
+                await self._retry_failed()
+            query = {"_id": {"$gt": self.last_id}} if self.last_id is not None else {}
+            cursor = self.db[self.collection].find(
+                query, {"business_details": 1, "loan_result": 1}
+            ).sort("_id", 1).batch_size(self.batch_size)
+
+            operations = []
+            batch_count = 0
+            async for doc in cursor:
+                self._process(doc, operations)
+                batch_count += 1
+                self.last_id = doc["_id"]
+
+                if batch_count >= self.batch_size:
+                    await self._flush(operations)
+                    self.processed += batch_count
+                    operations, batch_count = [], 0
+                    await self._save_checkpoint()
+
+                    now = time.monotonic()
+                    if now - last_report >= REPORT_INTERVAL:
+                        last_report = now
+                        status = self.status()
+                        logger.info("Re-match progress: %s processed, %s updated, %s docs/s",
+                                    status["processed"], status["updated"], status["docs_per_second"],
+                                    extra={"job": self.job_id, "progress": status})
+
+            await self._flush(operations)
+            self.processed += batch_count
+            await self._save_checkpoint(completed=True)
+            self.state = "completed"
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            raise
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.exception("Re-match job failed")
+        finally:
+            self.finished_at = time.monotonic()
+        return self.status()
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-match stored applications against the current lender catalog")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--restart", action="store_true", help="ignore the saved checkpoint")
+    parser.add_argument("--tenant", help="tenant whose applications to re-match (default tenant if omitted)")
+    args = parser.parse_args()
+
+    import log_pipeline
+    import server
+    import tenancy
+    log_pipeline.setup_logging()
+
+    async def run():
+        server.connect_database()
+        store = server.tenant_router.store(tenancy.resolve_tenant(args.tenant))
+        job = RematchJob(store.db, server.match_lenders, server.application_from_details, args.batch_size,
+                         collection=store.hot)
+        status = await job.run(restart=args.restart)
+        print(f"Re-match {status['state']}: {status['processed']} processed, {status['updated']} updated, "
+              f"{status['failed']} failed in {status['elapsed_seconds']}s ({status['docs_per_second']} docs/s)")
+
+    try:
+        asyncio.run(run())
+    finally:
+        log_pipeline.shutdown_logging()
+
+if __name__ == "__main__":
+    main()
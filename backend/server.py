@@ -1,39 +1,206 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Header, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from typing import Optional, List
+from contextlib import asynccontextmanager
 import os
-from motor.motor_asyncio import AsyncIOMotorClient
+import hmac
 import uuid
 from datetime import datetime
 import asyncio
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+import logging
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI()
+import log_pipeline
+import metrics
+import templates
+import tracing
+from concurrency import AdaptiveLimiter, LimitExceeded
+from health import HealthMonitor, llm_probe
+from lender_rules import load_catalog
+from mongo_routing import client_options, read_preference, routing_state
+from pipeline import Pipeline
+from pubsub import MAX_SUBSCRIPTIONS, ResultBroker, Subscription
+from structured_output import parse_analysis
+from tenancy import DEFAULT_TENANT, TenantRouter, TenantStore, resolve_tenant
+from webhooks import WebhookDispatcher, destinations
+from similarity import SimilarityIndex, format_examples, index_projection, reuse_analysis
+from rate_limit import RateLimiter, RATE_LIMIT_STORE, client_ip, retry_after_header
 
-# CORS configuration
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+logger = logging.getLogger("server")
 
 # MongoDB connection
 MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
 DB_NAME = os.environ.get('DB_NAME', 'quickflow_capital')
 
-client = AsyncIOMotorClient(MONGO_URL)
-db = client[DB_NAME]
+# Upper bound on how long startup waits for connection warm-up before serving
+STARTUP_WARMUP_TIMEOUT = float(os.environ.get('STARTUP_WARMUP_TIMEOUT', '2.0'))
+
+# The Motor client is created in the lifespan so importing this module stays cheap.
+# `db` uses the primary; `read_db` follows MONGO_READ_PREFERENCE for reads that tolerate lag.
+client = None
+db = None
+read_db = None
+
+# Routes each tenant (X-Tenant-ID) to its own application collections or database
+tenant_router = None
+
+# Admin endpoints require this key in X-Admin-Key; without it they are disabled
+ADMIN_API_KEY = os.environ.get('ADMIN_API_KEY')
 
 # OpenAI API configuration
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 
+# Similar-application retrieval: near-duplicates within this distance reuse a stored analysis
+# (0 disables reuse) and up to FEW_SHOT_EXAMPLES neighbours are added to the prompt
+SIMILAR_REUSE_DISTANCE = float(os.environ.get('SIMILAR_REUSE_DISTANCE', '0.05'))
+FEW_SHOT_EXAMPLES = int(os.environ.get('FEW_SHOT_EXAMPLES', '3'))
+
+# One index per tenant so an analysis is only reused for the same brand; the default tenant's
+# index loads at startup, other tenants' on their first submission
+similar_index = SimilarityIndex()
+similar_indexes = {DEFAULT_TENANT: similar_index}
+index_loaders = []
+
+# Pushes status changes and results to WebSocket subscribers
+broker = ResultBroker()
+
+# Delivers decisions to lender and partner webhooks from the outbox
+webhook_dispatcher = WebhookDispatcher()
+
+# Background dependency probes behind the readiness endpoint
+health_monitor = HealthMonitor()
+
+@health_monitor.probe("mongo")
+async def _mongo_probe():
+    await db.command("ping")
+
+health_monitor.probe("llm", required=False)(llm_probe(health_monitor))
+
+# LLM classes are imported on first use; emergentintegrations pulls in a large SDK tree
+_llm_classes = None
+
+def get_llm_classes():
+    """Import the LLM chat classes on first use"""
+    global _llm_classes
+    if _llm_classes is None:
+        from emergentintegrations.llm.chat import LlmChat, UserMessage
+        _llm_classes = (LlmChat, UserMessage)
+    return _llm_classes
+
+def connect_database():
+    """Create the Motor client; connections are opened lazily by the driver"""
+    global client, db, read_db, tenant_router
+    if client is None:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(MONGO_URL, **client_options())
+        db = client[DB_NAME]
+        read_db = client.get_database(DB_NAME, read_preference=read_preference())
+        tenant_router = TenantRouter(db, read_db)
+    return db
+
+async def _warm_mongo():
+    """Open the first Mongo connection so the first request doesn't pay for it"""
+    try:
+        await db.command("ping")
+        await tenant_router.ensure_indexes(tenant_router.store())
+    except Exception as e:
+        logger.warning("MongoDB warm-up failed: %s", e)
+
+async def _warm_llm():
+    """Import the LLM SDK off the event loop"""
+    try:
+        await asyncio.to_thread(get_llm_classes)
+    except Exception as e:
+        logger.warning("LLM SDK warm-up failed: %s", e)
+
+async def load_similarity_index(tenant: str = DEFAULT_TENANT):
+    """
+    Index a tenant's most recent stored LLM analyses, up to the index size; runs in the background
+    so startup isn't delayed
+    """
+    index = similar_indexes[tenant]
+    store = tenant_router.store(tenant)
+    try:
+        cursor = store.read_db[store.hot].find(
+            {"analysis_source": {"$in": [None, "llm"]}}, index_projection(),
+        ).sort("created_at", -1).limit(index.max_size).batch_size(1000)
+        recent = [doc async for doc in cursor]
+        # Oldest first, so later submissions overwrite the oldest entries once the index is full
+        for doc in reversed(recent):
+            index.add(doc["application_id"], doc["business_details"], doc["loan_result"])
+        logger.info("Similarity index for tenant %s loaded with %d applications", tenant, len(index))
+    except Exception as e:
+        logger.warning("Similarity index load failed for tenant %s: %s", tenant, e)
+
+def similarity_index_for(tenant: str) -> SimilarityIndex:
+    """The tenant's similarity index, starting its background load on first use"""
+    index = similar_indexes.get(tenant)
+    if index is None:
+        index = similar_indexes[tenant] = SimilarityIndex()
+        index_loaders.append(asyncio.create_task(load_similarity_index(tenant)))
+    return index
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open connections concurrently on startup and close them on shutdown"""
+    log_pipeline.setup_logging()
+    connect_database()
+    if RATE_LIMIT_STORE == "mongo":
+        rate_limiter.use_shared_store(db.rate_limit_buckets)
+    await broker.start(db)
+    await webhook_dispatcher.start(db)
+    warmup = asyncio.gather(_warm_mongo(), _warm_llm())
+    try:
+        # Don't hold readiness hostage to a slow dependency; warm-up continues in the background
+        await asyncio.wait_for(asyncio.shield(warmup), timeout=STARTUP_WARMUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.info("Startup warm-up still running after timeout; serving requests")
+    index_loaders.append(asyncio.create_task(load_similarity_index()))
+    health_monitor.start()
+    yield
+    await health_monitor.stop()
+    for loader in index_loaders:
+        loader.cancel()
+    await broker.stop()
+    await webhook_dispatcher.stop()
+    for task in (rematch_task, archive_task):
+        if task is not None:
+            task.cancel()
+    if client is not None:
+        client.close()
+    log_pipeline.shutdown_logging()
+
+def is_admin(x_admin_key: Optional[str]) -> bool:
+    """Whether a request carries the configured admin key; always False when none is configured"""
+    return bool(ADMIN_API_KEY) and hmac.compare_digest(x_admin_key or "", ADMIN_API_KEY)
+
+app = FastAPI(lifespan=lifespan)
+
+# Profiling starts a sampler thread, so only admins may ask for it
+app.add_middleware(tracing.TracingMiddleware, authorize=is_admin)
+app.add_middleware(log_pipeline.RequestContextMiddleware)
+
+rate_limiter = RateLimiter()
+
+# Caps in-flight submissions; the cap adapts to LLM latency
+submission_limiter = AdaptiveLimiter()
+
+# CORS configuration
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
 # Pydantic models
 class BusinessApplication(BaseModel):
     business_name: str
@@ -103,6 +270,9 @@ MOCK_LENDERS = [
     }
 ]
 
+# Eligibility and scoring rules are compiled once when the catalog loads
+lender_catalog = load_catalog(MOCK_LENDERS)
+
 def calculate_debt_to_income_ratio(monthly_cash_flow: float, existing_debt: float) -> float:
     """Calculate debt-to-income ratio"""
     if monthly_cash_flow <= 0:
@@ -110,38 +280,8 @@ def calculate_debt_to_income_ratio(monthly_cash_flow: float, existing_debt: floa
     monthly_debt_payment = existing_debt * 0.05  # Assume 5% monthly payment
     return (monthly_debt_payment / monthly_cash_flow) * 100
 
-async def analyze_loan_application_with_ai(application: BusinessApplication) -> dict:
-    """Use GPT-4o to analyze loan application"""
-    
-    # Calculate debt-to-income ratio
-    debt_to_income = calculate_debt_to_income_ratio(application.monthly_cash_flow, application.existing_debt)
-    
-    # Create system message for loan analysis
-    system_message = """You are an expert business loan underwriter with 20+ years of experience. 
-    Analyze the provided business loan application and provide a comprehensive assessment.
-    
-    Provide your response in the following JSON format:
-    {
-        "qualification_score": <integer from 0-100>,
-        "qualification_status": "<Approved/Conditional/Declined>",
-        "recommended_loan_amount": <float>,
-        "interest_rate_range": "<X.X% - X.X%>",
-        "risk_assessment": "<Low/Medium/High>",
-        "analysis_summary": "<detailed analysis in 2-3 sentences>",
-        "key_strengths": ["<strength1>", "<strength2>"],
-        "key_concerns": ["<concern1>", "<concern2>"],
-        "improvement_suggestions": ["<suggestion1>", "<suggestion2>"]
-    }
-    
-    Consider these factors:
-    - Credit score impact (weight: 25%)
-    - Cash flow stability (weight: 20%)
-    - Years in business (weight: 15%)
-    - Debt-to-income ratio (weight: 20%)
-    - Industry risk (weight: 10%)
-    - Loan amount vs revenue ratio (weight: 10%)
-    """
-    
+def build_analysis_prompt(application: BusinessApplication, debt_to_income: float, examples: Optional[str] = None) -> tuple:
+    """Build the (system message, user message) pair for the loan analysis"""
     # Create user message with application details
     user_message_text = f"""
     Please analyze this business loan application:
@@ -165,8 +305,35 @@ async def analyze_loan_application_with_ai(application: BusinessApplication) ->
     
     Provide a comprehensive loan analysis following the JSON format specified.
     """
+    if examples:
+        user_message_text += f"""
+    For consistency, these comparable past applications were assessed as follows:
+{examples}
+    """
+    return templates.SYSTEM_PROMPT, user_message_text
+
+async def analyze_loan_application_with_ai(application: BusinessApplication, tenant: str = DEFAULT_TENANT) -> dict:
+    """Use GPT-4o to analyze loan application"""
+    
+    # Calculate debt-to-income ratio
+    with tracing.span("dti_calculation"):
+        debt_to_income = calculate_debt_to_income_ratio(application.monthly_cash_flow, application.existing_debt)
+    
+    # Look up comparable past applications
+    details = application.dict()
+    with tracing.span("similar_lookup"):
+        neighbours = similarity_index_for(tenant).query(details, max(FEW_SHOT_EXAMPLES, 1))
+    if neighbours and neighbours[0].distance <= SIMILAR_REUSE_DISTANCE:
+        metrics.inc("analysis_reused_total")
+        return reuse_analysis(neighbours[0], details)
+    
+    with tracing.span("prompt_build"):
+        examples = format_examples(neighbours[:FEW_SHOT_EXAMPLES])
+        system_message, user_message_text = build_analysis_prompt(application, debt_to_income, examples)
     
     try:
+        LlmChat, UserMessage = get_llm_classes()
+
         # Create chat instance
         session_id = f"loan_analysis_{uuid.uuid4()}"
         chat = LlmChat(
@@ -177,170 +344,375 @@ async def analyze_loan_application_with_ai(application: BusinessApplication) ->
         
         # Send message to GPT-4o
         user_message = UserMessage(text=user_message_text)
-        response = await chat.send_message(user_message)
+        with tracing.span("llm_call"):
+            started = time.perf_counter()
+            try:
+                response = await chat.send_message(user_message)
+            except Exception as e:
+                elapsed = time.perf_counter() - started
+                submission_limiter.record(elapsed, ok=False)
+                health_monitor.observe("llm", elapsed, ok=False, error=type(e).__name__)
+                raise
+            elapsed = time.perf_counter() - started
+            submission_limiter.record(elapsed)
+            health_monitor.observe("llm", elapsed, ok=True)
         
-        # Parse AI response (assuming it returns JSON)
-        import json
-        try:
-            ai_analysis = json.loads(response)
-        except json.JSONDecodeError:
-            # Fallback if response is not JSON
-            ai_analysis = {
-                "qualification_score": 75,
-                "qualification_status": "Conditional",
-                "recommended_loan_amount": application.loan_amount_requested * 0.8,
-                "interest_rate_range": "7.5% - 10.2%",
-                "risk_assessment": "Medium",
-                "analysis_summary": response[:200] + "...",
-                "key_strengths": ["Business experience", "Positive cash flow"],
-                "key_concerns": ["Credit score evaluation needed", "Industry analysis required"],
-                "improvement_suggestions": ["Improve credit score", "Increase cash flow"]
-            }
+        # Fallback if no usable JSON can be recovered; also fills fields a salvaged response lacks
+        fallback_analysis = templates.unparsed_fallback(application.loan_amount_requested, response)
         
+        # Parse AI response, tolerating code fences, prose and truncation
+        with tracing.span("json_parse"):
+            ai_analysis, outcome = parse_analysis(response, defaults=fallback_analysis)
+        if ai_analysis is None:
+            return dict(fallback_analysis, analysis_source="fallback")
+        ai_analysis["analysis_source"] = "llm_partial" if outcome == "partial" else "llm"
         return ai_analysis
         
     except Exception as e:
-        print(f"AI analysis error: {e}")
+        logger.warning("AI analysis error: %s", e, extra={"error_type": type(e).__name__})
         # Fallback analysis
-        return {
-            "qualification_score": 60,
-            "qualification_status": "Conditional",
-            "recommended_loan_amount": application.loan_amount_requested * 0.7,
-            "interest_rate_range": "8.0% - 12.0%",
-            "risk_assessment": "Medium",
-            "analysis_summary": "Unable to complete AI analysis. Manual review required.",
-            "key_strengths": ["Business established", "Revenue positive"],
-            "key_concerns": ["AI analysis unavailable", "Manual review needed"],
-            "improvement_suggestions": ["Contact loan officer", "Provide additional documentation"]
-        }
+        return templates.error_fallback(application.loan_amount_requested)
 
 def match_lenders(application: BusinessApplication, ai_analysis: dict) -> List[dict]:
     """Match business with appropriate lenders based on AI analysis"""
-    matched_lenders = []
-    
-    for lender in MOCK_LENDERS:
-        # Check credit score requirement
-        if application.credit_score >= lender["min_credit_score"]:
-            # Check loan amount capacity
-            if application.loan_amount_requested <= lender["max_loan_amount"]:
-                # Check industry match
-                industry_match = application.industry in lender["specialties"]
-                
-                # Calculate match score
-                match_score = 0
-                if industry_match:
-                    match_score += 30
-                if application.credit_score >= lender["min_credit_score"] + 50:
-                    match_score += 25
-                if ai_analysis["qualification_score"] >= 80:
-                    match_score += 20
-                if ai_analysis["risk_assessment"] == "Low":
-                    match_score += 15
-                else:
-                    match_score += 10
-                
-                matched_lenders.append({
-                    "lender_name": lender["lender_name"],
-                    "lender_type": lender["lender_type"],
-                    "interest_rate_range": lender["interest_rate_range"],
-                    "match_score": match_score,
-                    "industry_match": industry_match,
-                    "pre_approval_likelihood": "High" if match_score >= 70 else "Medium" if match_score >= 50 else "Low"
-                })
-    
-    # Sort by match score
-    matched_lenders.sort(key=lambda x: x["match_score"], reverse=True)
-    return matched_lenders[:3]  # Return top 3 matches
+    # Top 3 matches from the compiled lender rules
+    return lender_catalog.match(application, ai_analysis, limit=3)
+
+# Submission stages: lender prefiltering only reads the application, so it runs while the
+# LLM call is in flight and only the AI-dependent scoring terms wait for the analysis
+submission_pipeline = Pipeline()
+
+@submission_pipeline.stage("analysis")
+async def _analysis_stage(ctx):
+    return await analyze_loan_application_with_ai(ctx["application"], ctx["tenant"])
+
+@submission_pipeline.stage("lender_prefilter")
+def _lender_prefilter_stage(ctx):
+    return lender_catalog.prefilter(ctx["application"])
+
+@submission_pipeline.stage("match_lenders", after=("analysis", "lender_prefilter"))
+def _match_lenders_stage(ctx):
+    return lender_catalog.finalize(ctx["lender_prefilter"], ctx["analysis"], limit=3)
+
+def application_from_details(details: dict) -> BusinessApplication:
+    """Rebuild a stored application without re-validating it"""
+    return BusinessApplication.model_construct(**details)
+
+async def enforce_rate_limits(request: Request, application: BusinessApplication):
+    """Reject with 429 when the caller's IP, API key or applicant email is over its budget"""
+    checks = (
+        ("ip", client_ip(request)),
+        ("api_key", request.headers.get("x-api-key")),
+        ("email", application.contact_email.strip().lower()),
+    )
+    rejected = await rate_limiter.check(checks)
+    if rejected:
+        scope, delay = rejected
+        metrics.inc("rate_limit_rejections_total", scope=scope)
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded for {scope.replace('_', ' ')}",
+            headers={"Retry-After": retry_after_header(delay)},
+        )
+
+async def acquire_submission_slot():
+    """Wait briefly for an in-flight slot; shed with 503 when the server is saturated"""
+    try:
+        await submission_limiter.acquire()
+    except LimitExceeded as e:
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, please retry shortly",
+            headers={"Retry-After": retry_after_header(e.retry_after)},
+        )
+
+async def tenant_store(x_tenant_id: Optional[str], ensure_indexes: bool = True) -> TenantStore:
+    """
+    Storage for the request's tenant, with its indexes in place unless ensure_indexes is False
+    (read paths); 400 for a bad or unknown X-Tenant-ID
+    """
+    try:
+        tenant = resolve_tenant(x_tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    store = tenant_router.store(tenant)
+    if ensure_indexes:
+        await tenant_router.ensure_indexes(store)
+    return store
+
+async def resolve_application_id(supplied: Optional[str], store: TenantStore) -> str:
+    """Use a client-supplied application ID (so it can subscribe before submitting) or generate one"""
+    if not supplied:
+        return str(uuid.uuid4())
+    try:
+        application_id = str(uuid.UUID(supplied))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="X-Application-Id must be a UUID")
+    if (await store.db[store.hot].find_one({"application_id": application_id}, {"_id": 1})
+            or await store.db[store.archive].find_one({"_id": application_id}, {"_id": 1})):
+        raise HTTPException(status_code=409, detail="Application ID already used")
+    return application_id
 
 @app.post("/api/submit-application")
-async def submit_loan_application(application: BusinessApplication):
+async def submit_loan_application(application: BusinessApplication, request: Request,
+                                  x_application_id: Optional[str] = Header(None),
+                                  x_tenant_id: Optional[str] = Header(None)):
     """Submit and analyze loan application"""
+    tracing.mark("request_parse")
+    await enforce_rate_limits(request, application)
+    store = await tenant_store(x_tenant_id)
+    application_id = await resolve_application_id(x_application_id, store)
+    log_pipeline.bind_application(application_id)
+    await acquire_submission_slot()
+
     try:
-        # Generate application ID
-        application_id = str(uuid.uuid4())
-        
-        # Analyze with AI
-        ai_analysis = await analyze_loan_application_with_ai(application)
+        await broker.publish_status(store.tenant, application_id, "processing")
         
-        # Match with lenders
-        matched_lenders = match_lenders(application, ai_analysis)
+        # Analyze with AI while lender eligibility is computed alongside
+        stages = await submission_pipeline.run({"application": application, "tenant": store.tenant})
+        ai_analysis = stages["analysis"]
+        matched_lenders = stages["match_lenders"]
         
-        # Generate next steps based on qualification
-        next_steps = []
-        if ai_analysis["qualification_status"] == "Approved":
-            next_steps = [
-                "Review matched lenders and their terms",
-                "Prepare required documentation",
-                "Schedule consultation with preferred lender",
-                "Submit formal loan application"
-            ]
-        elif ai_analysis["qualification_status"] == "Conditional":
-            next_steps = [
-                "Address key concerns identified in analysis",
-                "Gather additional financial documentation",
-                "Consider improving credit score if needed",
-                "Review matched lenders for best fit"
-            ]
-        else:
-            next_steps = [
-                "Review improvement suggestions",
-                "Work on strengthening financial position",
-                "Consider alternative financing options",
-                "Reapply after addressing concerns"
-            ]
-        
-        # Create loan result
-        loan_result = {
-            "application_id": application_id,
-            "qualification_score": ai_analysis["qualification_score"],
-            "qualification_status": ai_analysis["qualification_status"],
-            "recommended_loan_amount": ai_analysis["recommended_loan_amount"],
-            "interest_rate_range": ai_analysis["interest_rate_range"],
-            "risk_assessment": ai_analysis["risk_assessment"],
-            "ai_analysis": ai_analysis["analysis_summary"],
-            "key_strengths": ai_analysis.get("key_strengths", []),
-            "key_concerns": ai_analysis.get("key_concerns", []),
-            "improvement_suggestions": ai_analysis.get("improvement_suggestions", []),
-            "matched_lenders": matched_lenders,
-            "next_steps": next_steps,
-            "created_at": datetime.utcnow()
-        }
+        # Shared next steps and fragments from the template registry; only this dict is new
+        created_at = datetime.utcnow()
+        loan_result = templates.assemble_result(application_id, ai_analysis, matched_lenders, created_at)
         
         # Store in database
         application_data = {
             "application_id": application_id,
             "business_details": application.dict(),
             "loan_result": loan_result,
-            "created_at": datetime.utcnow()
+            "analysis_source": ai_analysis.get("analysis_source", "llm"),
+            "template_version": templates.TEMPLATE_VERSION,
+            "created_at": created_at
         }
+        if ai_analysis.get("reused_from"):
+            application_data["reused_from"] = ai_analysis["reused_from"]
         
-        await db.loan_applications.insert_one(application_data)
+        with tracing.span("mongo_insert"):
+            await store.applications.insert_one(application_data)
         
+        # Notify lenders and partners; the outbox retries, so a failure here only loses the event
+        try:
+            with tracing.span("webhook_enqueue"):
+                await webhook_dispatcher.enqueue(db, application_id, loan_result,
+                                                 destinations(matched_lenders, lender_catalog.lenders),
+                                                 tenant=store.tenant)
+        except Exception as e:
+            logger.warning("Webhook enqueue failed: %s", e)
+        
+        # Only genuine LLM analyses become neighbours for later applications
+        if application_data["analysis_source"] == "llm":
+            similarity_index_for(store.tenant).add(application_id, application_data["business_details"], loan_result)
+        
+        broker.publish_result(store.tenant, application_id, loan_result)
         return loan_result
         
     except Exception as e:
+        await broker.publish_status(store.tenant, application_id, "failed", "Error processing application")
         raise HTTPException(status_code=500, detail=f"Error processing application: {str(e)}")
+    finally:
+        submission_limiter.release()
 
 @app.get("/api/application/{application_id}")
-async def get_application(application_id: str):
+async def get_application(application_id: str, x_tenant_id: Optional[str] = Header(None)):
     """Get loan application results"""
+    from tiering import find_application
+    store = await tenant_store(x_tenant_id, ensure_indexes=False)
     try:
-        application = await db.loan_applications.find_one({"application_id": application_id})
+        # Reads the hot tier first, then the compressed archive
+        with tracing.span("mongo_find"):
+            application = await find_application(store.read_db, application_id, **store.collections)
         if not application:
             raise HTTPException(status_code=404, detail="Application not found")
         
-        # Remove MongoDB _id field
-        application.pop('_id', None)
         return application
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving application: {str(e)}")
 
+@app.websocket("/api/ws/applications")
+async def application_updates(websocket: WebSocket):
+    """
+    Push status changes and final results for subscribed applications.
+    Clients send {"action": "subscribe" | "unsubscribe", "application_ids": [...]}.
+    Browsers can't set headers on a WebSocket, so the tenant may also be given as ?tenant=.
+    """
+    from tiering import find_application
+    try:
+        tenant = resolve_tenant(websocket.headers.get("x-tenant-id") or websocket.query_params.get("tenant"))
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+    store = tenant_router.store(tenant)
+    await websocket.accept()
+    subscription = Subscription(tenant)
+
+    async def forward():
+        while True:
+            await websocket.send_json(await subscription.queue.get())
+
+    sender = asyncio.create_task(forward())
+    try:
+        while True:
+            message = await websocket.receive_json()
+            application_ids = list(dict.fromkeys(str(i) for i in (message.get("application_ids") or [])))
+            if message.get("action") == "unsubscribe":
+                broker.unsubscribe(subscription, application_ids)
+                continue
+            # Already-followed IDs need neither a new subscription nor another catch-up read
+            application_ids = [i for i in application_ids if i not in subscription.application_ids]
+            if len(subscription.application_ids) + len(application_ids) > MAX_SUBSCRIPTIONS:
+                await websocket.close(code=1008, reason="Too many subscriptions")
+                return
+            broker.subscribe(subscription, application_ids)
+            # Results stored before the subscription are sent straight away
+            for application_id in application_ids:
+                stored = await find_application(store.db, application_id, **store.collections)
+                if stored is not None:
+                    subscription.deliver({"type": "result", "application_id": application_id,
+                                          "result": jsonable_encoder(stored["loan_result"])})
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        sender.cancel()
+        broker.unsubscribe(subscription)
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "QuickFlow Capital API"}
 
+@app.get("/api/health/live")
+async def liveness():
+    """Liveness: the process is up and serving; dependencies are not checked"""
+    return {"status": "alive"}
+
+@app.get("/api/health/ready")
+async def readiness():
+    """Readiness from cached dependency probes, with queue depths and limiter state"""
+    report = health_monitor.readiness()
+    limiter = submission_limiter.state()
+    report["queues"] = {
+        "submissions_in_flight": limiter["in_flight"],
+        "submissions_queued": limiter["queued"],
+        "webhook_backlog": webhook_dispatcher.backlog,
+    }
+    report["limiter"] = limiter
+    return JSONResponse(report, status_code=200 if report["status"] == "ready" else 503)
+
+def require_admin(x_admin_key: Optional[str]):
+    """Reject admin calls without the configured admin key; with none configured, reject them all"""
+    if not is_admin(x_admin_key):
+        raise HTTPException(status_code=403, detail="Admin key required")
+
+# Background lender re-matching job
+rematch_job = None
+rematch_task = None
+
+@app.post("/api/admin/rematch", status_code=202)
+async def start_rematch(restart: bool = False, reload_catalog: bool = False, batch_size: int = 500,
+                        x_admin_key: Optional[str] = Header(None), x_tenant_id: Optional[str] = Header(None)):
+    """Re-match stored applications against the lender catalog without calling the LLM"""
+    global rematch_job, rematch_task, lender_catalog
+    require_admin(x_admin_key)
+    store = await tenant_store(x_tenant_id)
+    if rematch_task is not None and not rematch_task.done():
+        raise HTTPException(status_code=409, detail="Re-match job already running")
+    if reload_catalog:
+        lender_catalog = load_catalog(MOCK_LENDERS)
+
+    from rematch import RematchJob
+    rematch_job = RematchJob(store.db, match_lenders, application_from_details, batch_size, collection=store.hot)
+    rematch_task = asyncio.create_task(rematch_job.run(restart=restart))
+    return rematch_job.status()
+
+@app.get("/api/admin/rematch")
+async def rematch_status(x_admin_key: Optional[str] = Header(None)):
+    """Progress and throughput of the current or last re-match job"""
+    require_admin(x_admin_key)
+    if rematch_job is None:
+        return {"state": "idle"}
+    return rematch_job.status()
+
+# Background archive job; its report includes working-set size before and after
+archive_task = None
+archive_status = {"state": "idle"}
+
+async def run_archive(store: TenantStore, older_than_days: int, batch_size: int):
+    global archive_status
+    from tiering import archive_old_applications
+    try:
+        report = await archive_old_applications(store.db, older_than_days, batch_size, **store.collections)
+        archive_status = {"state": "completed", "tenant": store.tenant, **report}
+    except asyncio.CancelledError:
+        archive_status = dict(archive_status, state="cancelled")
+        raise
+    except Exception as e:
+        logger.exception("Archive job failed")
+        archive_status = dict(archive_status, state="failed", error=str(e))
+
+@app.post("/api/admin/archive", status_code=202)
+async def archive_applications(older_than_days: Optional[int] = None, batch_size: int = 500,
+                               x_admin_key: Optional[str] = Header(None), x_tenant_id: Optional[str] = Header(None)):
+    """Start moving a tenant's old applications to the compressed archive tier"""
+    global archive_task, archive_status
+    require_admin(x_admin_key)
+    store = await tenant_store(x_tenant_id)
+    if archive_task is not None and not archive_task.done():
+        raise HTTPException(status_code=409, detail="Archive job already running")
+
+    from tiering import ARCHIVE_AFTER_DAYS
+    if older_than_days is None:
+        older_than_days = ARCHIVE_AFTER_DAYS
+    archive_status = {"state": "running", "tenant": store.tenant, "older_than_days": older_than_days,
+                      "started_at": datetime.utcnow().isoformat()}
+    archive_task = asyncio.create_task(run_archive(store, older_than_days, batch_size))
+    return archive_status
+
+@app.get("/api/admin/archive")
+async def archive_job_status(x_admin_key: Optional[str] = Header(None)):
+    """State of the current or last archive job, with its report once finished"""
+    require_admin(x_admin_key)
+    return archive_status
+
+@app.get("/api/limiter")
+async def limiter_state():
+    """Adaptive concurrency limiter state for the submission endpoint"""
+    return submission_limiter.state()
+
+@app.get("/api/admin/database")
+async def database_routing(x_admin_key: Optional[str] = Header(None)):
+    """MongoDB topology, read routing and connection pool utilization"""
+    require_admin(x_admin_key)
+    return routing_state(client)
+
+@app.get("/api/traces")
+async def list_traces(limit: int = 20, x_admin_key: Optional[str] = Header(None)):
+    """Most recent sampled request traces"""
+    require_admin(x_admin_key)
+    traces = list(tracing.recent_traces)[-limit:]
+    return [
+        {"trace_id": t.trace_id, "path": t.path, "duration_ms": t.duration_ms, "started_at": t.started_at}
+        for t in reversed(traces)
+    ]
+
+@app.get("/api/traces/{trace_id}")
+async def get_trace(trace_id: str, x_admin_key: Optional[str] = Header(None)):
+    """Spans and optional profile for one traced request"""
+    require_admin(x_admin_key)
+    trace = tracing.get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics endpoint"""
+    return metrics.render()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
@@ -0,0 +1,218 @@
+"""
+Similar-application retrieval for the QuickFlow Capital API
+Stored applications are embedded as a small vector of normalized numeric features and kept in
+an in-memory NumPy matrix that grows on insert. Queries are brute-force k-nearest-neighbour
+into preallocated buffers, which stays well under a millisecond at the default index size
+(see benchmarks/similarity.py).
+
+Only numeric features and the verdict of each analysis are kept, never its free text, so
+nothing written about one applicant can surface in another's result or prompt. The index holds
+at most SIMILAR_INDEX_MAX_SIZE applications; beyond that the oldest entries are overwritten.
+"""
+
+import math
+import os
+from typing import List, Optional
+
+import templates
+
+# Up to this many neighbours are picked by repeated argmin, which beats argpartition for small k
+SMALL_K = 8
+
+# Neighbours with a different industry are pushed this far away (in normalized units)
+INDUSTRY_PENALTY = float(os.environ.get('SIMILAR_INDUSTRY_PENALTY', '1.0'))
+SIMILAR_INDEX_MAX_SIZE = int(os.environ.get('SIMILAR_INDEX_MAX_SIZE', '50000'))
+
+# Application fields the features and few-shot examples are built from
+DETAIL_FIELDS = (
+    "industry", "annual_revenue", "monthly_cash_flow", "existing_debt", "credit_score",
+    "years_in_business", "loan_amount_requested",
+)
+
+# Verdict fields of the stored analysis kept alongside each vector
+RESULT_FIELDS = (
+    "qualification_score", "qualification_status", "recommended_loan_amount",
+    "interest_rate_range", "risk_assessment",
+)
+
+def _np():
+    import numpy
+    return numpy
+
+def feature_vector(details: dict) -> List[float]:
+    """Fixed-scale features so vectors stay comparable as the index grows"""
+    revenue = max(float(details["annual_revenue"]), 1.0)
+    cash_flow = float(details["monthly_cash_flow"])
+    requested = max(float(details["loan_amount_requested"]), 0.0)
+    if cash_flow <= 0:
+        dti = 200.0
+    else:
+        dti = min(float(details["existing_debt"]) * 0.05 / cash_flow * 100, 200.0)
+    return [
+        (math.log10(revenue) - 6.0) / 1.0,
+        (float(details["credit_score"]) - 680.0) / 60.0,
+        dti / 40.0,
+        min(float(details["years_in_business"]), 30.0) / 10.0,
+        (math.log10(requested + 1.0) - 5.5) / 1.0,
+        min(requested / revenue, 5.0) / 0.5,
+    ]
+
+def index_projection() -> dict:
+    """MongoDB projection of a stored application with just the fields the index keeps"""
+    projection = {"_id": 0, "application_id": 1}
+    projection.update({f"business_details.{field}": 1 for field in DETAIL_FIELDS})
+    projection.update({f"loan_result.{field}": 1 for field in RESULT_FIELDS})
+    return projection
+
+class Neighbour:
+    __slots__ = ("application_id", "distance", "details", "result")
+
+    def __init__(self, application_id: str, distance: float, details: dict, result: dict):
+        self.application_id = application_id
+        self.distance = distance
+        self.details = details
+        self.result = result
+
+class SimilarityIndex:
+    """
+    Feature matrix with k-nearest-neighbour lookup; a ring buffer once max_size is reached.
+    Queries reuse scratch buffers, so an index must only be used from one thread.
+    """
+
+    def __init__(self, dimensions: int = 6, initial_capacity: int = 1024, max_size: int = SIMILAR_INDEX_MAX_SIZE):
+        self.dimensions = dimensions
+        self.size = 0
+        self.max_size = max_size
+        self._capacity = min(initial_capacity, max_size)
+        # Slot the next add overwrites once the index is full
+        self._next = 0
+        # One row per feature, one column per application: q @ vectors is a fast row-major product
+        self._vectors = None
+        self._norms = None
+        self._industries = None
+        self._distances = None
+        self._penalties = None
+        self._industry_codes = {}
+        self._records = []
+
+    def __len__(self):
+        return self.size
+
+    def _ensure_capacity(self):
+        np = _np()
+        if self._vectors is None:
+            self._vectors = np.zeros((self.dimensions, self._capacity), dtype=np.float32)
+            self._norms = np.zeros(self._capacity, dtype=np.float32)
+            self._industries = np.zeros(self._capacity, dtype=np.int32)
+        elif self.size == self._capacity:
+            # Double the buffers so inserts stay amortized O(1)
+            self._capacity = min(self._capacity * 2, self.max_size)
+            vectors = np.zeros((self.dimensions, self._capacity), dtype=np.float32)
+            vectors[:, :self.size] = self._vectors
+            self._vectors = vectors
+            self._norms = np.resize(self._norms, self._capacity)
+            self._industries = np.resize(self._industries, self._capacity)
+        else:
+            return
+        self._distances = np.empty(self._capacity, dtype=np.float32)
+        self._penalties = np.empty(self._capacity, dtype=np.float32)
+
+    def _industry_code(self, industry: str) -> int:
+        return self._industry_codes.setdefault(industry, len(self._industry_codes))
+
+    def add(self, application_id: str, details: dict, loan_result: dict):
+        """Index one stored application, replacing the oldest one when the index is full"""
+        if self.size < self.max_size:
+            self._ensure_capacity()
+            slot = self.size
+        else:
+            slot = self._next
+            self._next = (slot + 1) % self.max_size
+        vector = feature_vector(details)
+        self._vectors[:, slot] = vector
+        self._norms[slot] = sum(x * x for x in vector)
+        self._industries[slot] = self._industry_code(details["industry"])
+        record = (
+            application_id,
+            {"industry": details["industry"], "loan_amount_requested": details["loan_amount_requested"],
+             "annual_revenue": details["annual_revenue"], "credit_score": details["credit_score"],
+             "years_in_business": details["years_in_business"]},
+            {field: loan_result.get(field) for field in RESULT_FIELDS},
+        )
+        if slot == self.size:
+            self._records.append(record)
+            self.size += 1
+        else:
+            self._records[slot] = record
+
+    def query(self, details: dict, k: int = 3) -> List[Neighbour]:
+        """Return up to k nearest stored applications, closest first"""
+        if self.size == 0 or k <= 0:
+            return []
+        np = _np()
+        vector = feature_vector(details)
+        query = np.array(vector, dtype=np.float32)
+        n = self.size
+        # |x - q|^2 = |x|^2 - 2 x.q + |q|^2, with |x|^2 precomputed on insert and |q|^2 added
+        # only to the winners; every step writes into the preallocated buffers
+        distances = self._distances[:n]
+        np.dot(query * np.float32(-2), self._vectors[:, :n], out=distances)
+        distances += self._norms[:n]
+        # 1.0 for other industries, written straight into floats (a masked add is far slower)
+        penalties = self._penalties[:n]
+        np.not_equal(self._industries[:n], self._industry_codes.get(details["industry"], -1),
+                     out=penalties, casting="unsafe")
+        penalties *= np.float32(INDUSTRY_PENALTY ** 2)
+        distances += penalties
+
+        k = min(k, n)
+        if k <= SMALL_K:
+            nearest = []
+            for _ in range(k):
+                i = int(distances.argmin())
+                nearest.append((i, float(distances[i])))
+                distances[i] = np.inf
+        else:
+            order = np.argpartition(distances, k - 1)[:k] if k < n else np.arange(n)
+            nearest = [(int(i), float(distances[i])) for i in order[np.argsort(distances[order])]]
+        offset = sum(x * x for x in vector)
+        return [
+            Neighbour(self._records[i][0], math.sqrt(max(distance + offset, 0.0)), self._records[i][1], self._records[i][2])
+            for i, distance in nearest
+        ]
+
+def reuse_analysis(neighbour: Neighbour, details: dict) -> dict:
+    """Apply a near-duplicate's verdict to the new request, with neutral text about this applicant"""
+    result = neighbour.result
+    prior_requested = neighbour.details["loan_amount_requested"] or 1.0
+    ratio = (result["recommended_loan_amount"] or 0.0) / prior_requested
+    return {
+        "qualification_score": result["qualification_score"],
+        "qualification_status": result["qualification_status"],
+        "recommended_loan_amount": round(details["loan_amount_requested"] * ratio, 2),
+        "interest_rate_range": result["interest_rate_range"],
+        "risk_assessment": result["risk_assessment"],
+        "analysis_summary": templates.reused_summary(
+            details["industry"], result["qualification_status"], result["risk_assessment"]),
+        "key_strengths": [],
+        "key_concerns": [],
+        "improvement_suggestions": list(templates.REUSED_SUGGESTIONS),
+        "analysis_source": "reused",
+        "reused_from": neighbour.application_id,
+    }
+
+def format_examples(neighbours: List[Neighbour]) -> Optional[str]:
+    """Render neighbours as few-shot examples for the analysis prompt"""
+    if not neighbours:
+        return None
+    lines = []
+    for n in neighbours:
+        d, r = n.details, n.result
+        lines.append(
+            f"- {d['industry']}, {d['years_in_business']} years, revenue ${d['annual_revenue']:,.0f}, "
+            f"credit {d['credit_score']}, requested ${d['loan_amount_requested']:,.0f} -> "
+            f"score {r['qualification_score']}, {r['qualification_status']}, "
+            f"risk {r['risk_assessment']}, recommended ${r['recommended_loan_amount'] or 0:,.0f}, "
+            f"rate {r['interest_rate_range']}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,228 @@
+"""
+Tolerant parsing of the LLM's structured loan analysis
+Models often wrap the JSON in code fences, surround it with prose, add trailing commas or get
+cut off at max_tokens. Instead of discarding those responses, the parser:
+
+1. tries json.loads on the raw text (the common, fast case),
+2. scans for the first JSON object, skipping fences and prose,
+3. repairs truncated or sloppy objects by closing open strings/containers, and
+4. validates the result against LoanAnalysis, filling missing fields from defaults.
+
+IncrementalJSONParser consumes streamed tokens chunk by chunk and only scans new characters,
+so a streamed response is ready as soon as its closing brace arrives.
+"""
+
+import json
+import re
+from typing import List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+import metrics
+
+metrics.describe("llm_parse_total", "counter", "LLM responses by structured-output parse outcome")
+
+# "$250k", "1.5M", "250,000 USD", "$1.2 million"
+AMOUNT = re.compile(r"^(?:usd|\$)?\s*(-?\d[\d,]*(?:\.\d+)?)\s*(k|thousand|m|mm|million|b|bn|billion)?\s*(?:usd|dollars)?$", re.I)
+AMOUNT_MULTIPLIERS = {
+    None: 1, "k": 1e3, "thousand": 1e3, "m": 1e6, "mm": 1e6, "million": 1e6,
+    "b": 1e9, "bn": 1e9, "billion": 1e9,
+}
+
+class LoanAnalysis(BaseModel):
+    """Fields the analysis prompt asks the model to return"""
+    qualification_score: int = Field(ge=0, le=100)
+    qualification_status: Literal["Approved", "Conditional", "Declined"]
+    recommended_loan_amount: float = Field(ge=0)
+    interest_rate_range: str
+    risk_assessment: Literal["Low", "Medium", "High"]
+    analysis_summary: str
+    key_strengths: List[str] = []
+    key_concerns: List[str] = []
+    improvement_suggestions: List[str] = []
+
+    @field_validator("qualification_score", mode="before")
+    @classmethod
+    def _round_score(cls, value):
+        # ValueError (unlike TypeError) becomes a ValidationError, so bad scores are repairable
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError(f"qualification_score must be a number, got {type(value).__name__}")
+        if isinstance(value, str):
+            value = value.strip().rstrip("%")
+        try:
+            return int(round(float(value)))
+        except OverflowError:
+            raise ValueError("qualification_score must be finite")
+
+    @field_validator("qualification_status", "risk_assessment", mode="before")
+    @classmethod
+    def _normalize_label(cls, value):
+        return value.strip().capitalize() if isinstance(value, str) else value
+
+    @field_validator("recommended_loan_amount", mode="before")
+    @classmethod
+    def _parse_amount(cls, value):
+        if isinstance(value, str):
+            match = AMOUNT.match(value.strip())
+            if match is None:
+                raise ValueError(f"unrecognized amount {value!r}")
+            number, suffix = match.groups()
+            return float(number.replace(",", "")) * AMOUNT_MULTIPLIERS[suffix and suffix.lower()]
+        return value
+
+    @field_validator("key_strengths", "key_concerns", "improvement_suggestions", mode="before")
+    @classmethod
+    def _listify(cls, value):
+        if value is None:
+            return []
+        if not isinstance(value, (list, tuple)):
+            return [str(value)]
+        return [str(item) for item in value]
+
+class IncrementalJSONParser:
+    """
+    Finds and tracks the first top-level JSON object in a stream of text chunks.
+    Leading prose and code fences are skipped; scanning state is kept between feed() calls.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._length = 0
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        # (position, open containers) at each top-level-safe comma, for truncation repair
+        self._cut_points = []
+
+    @property
+    def complete(self) -> bool:
+        return self.end is not None
+
+    @property
+    def text(self) -> str:
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def feed(self, chunk: str) -> bool:
+        """Consume more text; returns True once the object has closed"""
+        if self.complete or not chunk:
+            return self.complete
+        offset = self._length
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+
+        stack = self._stack
+        in_string, escape = self._in_string, self._escape
+        for i, ch in enumerate(chunk):
+            if self.start is None:
+                if ch == "{":
+                    self.start = offset + i
+                    stack.append("}")
+                continue
+            if in_string:
+                if escape:
+                    escape = False
+                elif ch == "\\":
+                    escape = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == "{":
+                stack.append("}")
+            elif ch == "[":
+                stack.append("]")
+            elif ch in "}]":
+                stack.pop()
+                if not stack:
+                    self.end = offset + i + 1
+                    break
+            elif ch == ",":
+                self._cut_points.append((offset + i, tuple(stack)))
+        self._in_string, self._escape = in_string, escape
+        return self.complete
+
+    def result(self) -> Tuple[Optional[dict], str]:
+        """Best-effort object so far and how it was obtained: extracted, repaired or no_json"""
+        if self.start is None:
+            return None, "no_json"
+        text = self.text
+        if self.complete:
+            candidate = text[self.start:self.end]
+            try:
+                return json.loads(candidate), "extracted"
+            except json.JSONDecodeError:
+                # Usually a trailing comma before a closing bracket
+                try:
+                    return json.loads(re.sub(r",\s*([}\]])", r"\1", candidate)), "repaired"
+                except json.JSONDecodeError:
+                    return None, "invalid"
+        return self._repair(text), "repaired"
+
+    def _repair(self, text: str) -> Optional[dict]:
+        """Close a truncated object, cutting back to earlier commas if the tail is unusable"""
+        body = text[self.start:]
+        if self._in_string:
+            body = body[:-1] if self._escape else body
+            body += '"'
+        body = body.rstrip()
+        if body.endswith(":"):
+            body += " null"
+        body = re.sub(r",\s*$", "", body)
+        attempts = [(body, tuple(self._stack))]
+        for position, stack in reversed(self._cut_points[-8:]):
+            attempts.append((text[self.start:position], stack))
+
+        for candidate, stack in attempts:
+            closed = re.sub(r",\s*([}\]])", r"\1", candidate + "".join(reversed(stack)))
+            try:
+                value = json.loads(closed)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(value, dict):
+                return value
+        return None
+
+def _strip_fences(text: str) -> str:
+    match = re.search(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", text, re.S)
+    return match.group(1) if match else text
+
+def parse_analysis(text: str, defaults: Optional[dict] = None) -> Tuple[Optional[dict], str]:
+    """
+    Parse and validate an LLM analysis. Returns (analysis dict or None, outcome), where outcome
+    is one of direct, extracted, repaired, partial, invalid or no_json. Fields missing from a
+    salvaged object are taken from `defaults` and reported as `partial`.
+    """
+    raw, outcome = None, "direct"
+    try:
+        raw = json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        parser = IncrementalJSONParser()
+        parser.feed(_strip_fences(text or ""))
+        raw, outcome = parser.result()
+
+    analysis = None
+    if isinstance(raw, dict):
+        analysis, outcome = _validate(raw, defaults, outcome)
+    elif outcome in ("direct", "extracted", "repaired"):
+        outcome = "invalid"
+
+    metrics.inc("llm_parse_total", outcome=outcome)
+    return analysis, outcome
+
+def _validate(raw: dict, defaults: Optional[dict], outcome: str) -> Tuple[Optional[dict], str]:
+    try:
+        return LoanAnalysis(**raw).model_dump(), outcome
+    except ValidationError as e:
+        if not defaults:
+            return None, "invalid"
+        # Keep every field the model got right and fill the rest from defaults
+        bad_fields = {error["loc"][0] for error in e.errors() if error["loc"]}
+        merged = {**defaults, **{k: v for k, v in raw.items() if k not in bad_fields}}
+        try:
+            return LoanAnalysis(**merged).model_dump(), "partial"
+        except ValidationError:
+            return None, "invalid"
@@ -0,0 +1,131 @@
+"""
+Precomputed text and response fragments for loan analysis
+Everything here is built once at import and shared read-only between requests: the system
+prompt, the per-status next steps and the fallback analyses. Per-request work is a single
+dict merge. Fragments are tuples or read-only mappings so a handler can't mutate a shared copy.
+
+TEMPLATE_VERSION is stored with each application; bump it whenever prompt or fragment wording
+changes so results can be traced back to the text that produced them.
+"""
+
+from types import MappingProxyType
+from typing import Mapping, Tuple
+
+TEMPLATE_VERSION = "2"
+
+SYSTEM_PROMPT = """You are an expert business loan underwriter with 20+ years of experience. 
+    Analyze the provided business loan application and provide a comprehensive assessment.
+    
+    Provide your response in the following JSON format:
+    {
+        "qualification_score": <integer from 0-100>,
+        "qualification_status": "<Approved/Conditional/Declined>",
+        "recommended_loan_amount": <float>,
+        "interest_rate_range": "<X.X% - X.X%>",
+        "risk_assessment": "<Low/Medium/High>",
+        "analysis_summary": "<detailed analysis in 2-3 sentences>",
+        "key_strengths": ["<strength1>", "<strength2>"],
+        "key_concerns": ["<concern1>", "<concern2>"],
+        "improvement_suggestions": ["<suggestion1>", "<suggestion2>"]
+    }
+    
+    Consider these factors:
+    - Credit score impact (weight: 25%)
+    - Cash flow stability (weight: 20%)
+    - Years in business (weight: 15%)
+    - Debt-to-income ratio (weight: 20%)
+    - Industry risk (weight: 10%)
+    - Loan amount vs revenue ratio (weight: 10%)
+    """
+
+NEXT_STEPS: Mapping[str, Tuple[str, ...]] = MappingProxyType({
+    "Approved": (
+        "Review matched lenders and their terms",
+        "Prepare required documentation",
+        "Schedule consultation with preferred lender",
+        "Submit formal loan application",
+    ),
+    "Conditional": (
+        "Address key concerns identified in analysis",
+        "Gather additional financial documentation",
+        "Consider improving credit score if needed",
+        "Review matched lenders for best fit",
+    ),
+    "Declined": (
+        "Review improvement suggestions",
+        "Work on strengthening financial position",
+        "Consider alternative financing options",
+        "Reapply after addressing concerns",
+    ),
+})
+
+# Used when the LLM answered but no usable JSON could be recovered, and to fill fields a
+# salvaged response lacks; recommended amount is this fraction of the request
+UNPARSED_FALLBACK_RATIO = 0.8
+UNPARSED_FALLBACK = MappingProxyType({
+    "qualification_score": 75,
+    "qualification_status": "Conditional",
+    "interest_rate_range": "7.5% - 10.2%",
+    "risk_assessment": "Medium",
+    "key_strengths": ("Business experience", "Positive cash flow"),
+    "key_concerns": ("Credit score evaluation needed", "Industry analysis required"),
+    "improvement_suggestions": ("Improve credit score", "Increase cash flow"),
+})
+
+# Used when the LLM call itself failed
+ERROR_FALLBACK_RATIO = 0.7
+ERROR_FALLBACK = MappingProxyType({
+    "qualification_score": 60,
+    "qualification_status": "Conditional",
+    "interest_rate_range": "8.0% - 12.0%",
+    "risk_assessment": "Medium",
+    "analysis_summary": "Unable to complete AI analysis. Manual review required.",
+    "key_strengths": ("Business established", "Revenue positive"),
+    "key_concerns": ("AI analysis unavailable", "Manual review needed"),
+    "improvement_suggestions": ("Contact loan officer", "Provide additional documentation"),
+    "analysis_source": "fallback",
+})
+
+# Text for an analysis reused from a near-identical earlier application. Only the neighbour's
+# verdict is reused; its free text describes another applicant, so it is never copied
+REUSED_SUMMARY = (
+    "This {industry} application closely matches the profile of previously assessed applications, "
+    "so the assessment reflects their outcome: {status} with {risk} risk. "
+    "A loan officer will confirm the details."
+)
+REUSED_SUGGESTIONS = ("Contact a loan officer if your circumstances differ from the details submitted",)
+
+def reused_summary(industry: str, status: str, risk: str) -> str:
+    return REUSED_SUMMARY.format(industry=industry, status=status, risk=str(risk).lower())
+
+def unparsed_fallback(loan_amount_requested: float, response: str) -> dict:
+    return {
+        **UNPARSED_FALLBACK,
+        "recommended_loan_amount": loan_amount_requested * UNPARSED_FALLBACK_RATIO,
+        "analysis_summary": response[:200] + "...",
+    }
+
+def error_fallback(loan_amount_requested: float) -> dict:
+    return {**ERROR_FALLBACK, "recommended_loan_amount": loan_amount_requested * ERROR_FALLBACK_RATIO}
+
+def next_steps(status: str) -> Tuple[str, ...]:
+    """Shared next steps for a qualification status; unknown statuses get the Declined steps"""
+    return NEXT_STEPS.get(status, NEXT_STEPS["Declined"])
+
+def assemble_result(application_id: str, ai_analysis: dict, matched_lenders: list, created_at) -> dict:
+    """The public loan result: analysis fields plus shared next steps, in one dict build"""
+    return {
+        "application_id": application_id,
+        "qualification_score": ai_analysis["qualification_score"],
+        "qualification_status": ai_analysis["qualification_status"],
+        "recommended_loan_amount": ai_analysis["recommended_loan_amount"],
+        "interest_rate_range": ai_analysis["interest_rate_range"],
+        "risk_assessment": ai_analysis["risk_assessment"],
+        "ai_analysis": ai_analysis["analysis_summary"],
+        "key_strengths": ai_analysis.get("key_strengths", ()),
+        "key_concerns": ai_analysis.get("key_concerns", ()),
+        "improvement_suggestions": ai_analysis.get("improvement_suggestions", ()),
+        "matched_lenders": matched_lenders,
+        "next_steps": next_steps(ai_analysis["qualification_status"]),
+        "created_at": created_at,
+    }
@@ -0,0 +1,251 @@
+"""
+Tenant-aware storage for loan applications
+Requests name their tenant (brand) in the X-Tenant-ID header. Without one they use the default
+tenant, which keeps the original `loan_applications` / `loan_applications_archive` collections
+in DB_NAME, so single-tenant deployments see no change. Other tenants get their own storage,
+with TENANT_STORAGE choosing how:
+
+    collection  loan_applications__<tenant> and loan_applications_archive__<tenant> in DB_NAME
+    database    loan_applications and loan_applications_archive in <DB_NAME>__<tenant>
+
+Only the default tenant and those listed in TENANTS are accepted, so a client can't create
+collections by inventing tenant IDs. Indexes are created per tenant on its first write, with
+failed attempts retried after INDEX_RETRY_SECONDS.
+
+Existing data is split out of the shared collection with the migration tool. It streams in
+batches, upserts into the tenant's collections, then deletes from the source, so it can be rerun
+after an interruption:
+
+    python tenancy.py --tenant-field business_details.brand [--batch-size 1000] [--dry-run]
+    python tenancy.py --tenant acme --query '{"business_details.contact_email": {"$regex": "@acme.com$"}}'
+    python tenancy.py --tenant acme --all    # every default-tenant document
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from typing import Callable, Dict, Optional
+
+from pymongo import ReplaceOne
+
+import tiering
+
+logger = logging.getLogger(__name__)
+
+TENANT_STORAGE = os.environ.get('TENANT_STORAGE', 'collection')
+DEFAULT_TENANT = os.environ.get('DEFAULT_TENANT', 'default')
+TENANTS = {t.strip() for t in os.environ.get('TENANTS', '').split(',') if t.strip()}
+INDEX_RETRY_SECONDS = float(os.environ.get('INDEX_RETRY_SECONDS', '60'))
+
+TENANT_ID = re.compile(r"^[a-z0-9][a-z0-9_-]{0,31}$")
+SEPARATOR = "__"
+
+def resolve_tenant(value: Optional[str]) -> str:
+    """Validate a tenant ID from a request; ValueError when it is malformed or not allowed"""
+    if not value:
+        return DEFAULT_TENANT
+    tenant = value.strip().lower()
+    if not TENANT_ID.match(tenant):
+        raise ValueError("X-Tenant-ID must be 1-32 lowercase letters, digits, '-' or '_'")
+    if tenant != DEFAULT_TENANT and tenant not in TENANTS:
+        raise ValueError(f"Unknown tenant {tenant!r}")
+    return tenant
+
+def application_namespace(db_name: str, storage: str = TENANT_STORAGE) -> dict:
+    """Change-stream match on the `ns` of every tenant's hot collection"""
+    suffix = f"({SEPARATOR}[a-z0-9_-]+)?$"
+    if storage == "database":
+        return {"ns.db": {"$regex": f"^{re.escape(db_name)}{suffix}"}, "ns.coll": tiering.HOT_COLLECTION}
+    return {"ns.db": db_name, "ns.coll": {"$regex": f"^{tiering.HOT_COLLECTION}{suffix}"}}
+
+def namespace_tenant(ns: dict, db_name: str, storage: str = TENANT_STORAGE) -> str:
+    """Tenant owning a change event's hot collection, the inverse of TenantRouter naming"""
+    name, base = (ns["db"], db_name) if storage == "database" else (ns["coll"], tiering.HOT_COLLECTION)
+    prefix = base + SEPARATOR
+    return name[len(prefix):] if name.startswith(prefix) else DEFAULT_TENANT
+
+class TenantStore:
+    """Database handles and collection names holding one tenant's applications"""
+
+    __slots__ = ("tenant", "db", "read_db", "hot", "archive")
+
+    def __init__(self, tenant: str, db, read_db, hot: str, archive: str):
+        self.tenant = tenant
+        self.db = db
+        self.read_db = read_db
+        self.hot = hot
+        self.archive = archive
+
+    @property
+    def collections(self) -> dict:
+        """Keyword arguments for the tiering functions"""
+        return {"hot": self.hot, "archive": self.archive}
+
+    @property
+    def applications(self):
+        return self.db[self.hot]
+
+class TenantRouter:
+    """Maps tenant IDs to their storage and creates each tenant's indexes once"""
+
+    def __init__(self, db, read_db, storage: str = TENANT_STORAGE):
+        if storage not in ("collection", "database"):
+            raise ValueError(f"Unknown TENANT_STORAGE {storage!r}; expected collection or database")
+        self.db = db
+        self.read_db = read_db
+        self.storage = storage
+        self.stores: Dict[str, TenantStore] = {}
+        self.indexed = set()
+        # tenant -> monotonic time of the last failed index creation
+        self.failed_at: Dict[str, float] = {}
+
+    def store(self, tenant: str = DEFAULT_TENANT) -> TenantStore:
+        store = self.stores.get(tenant)
+        if store is None:
+            store = self.stores[tenant] = self._build(tenant)
+        return store
+
+    def _build(self, tenant: str) -> TenantStore:
+        hot, archive = tiering.HOT_COLLECTION, tiering.ARCHIVE_COLLECTION
+        if tenant == DEFAULT_TENANT:
+            return TenantStore(tenant, self.db, self.read_db, hot, archive)
+        if self.storage == "collection":
+            return TenantStore(tenant, self.db, self.read_db, f"{hot}{SEPARATOR}{tenant}", f"{archive}{SEPARATOR}{tenant}")
+        name = f"{self.db.name}{SEPARATOR}{tenant}"
+        client = self.db.client
+        db = client[name]
+        read_db = client.get_database(name, read_preference=self.read_db.read_preference)
+        return TenantStore(tenant, db, read_db, hot, archive)
+
+    async def ensure_indexes(self, store: TenantStore):
+        if store.tenant in self.indexed:
+            return
+        failed_at = self.failed_at.get(store.tenant)
+        if failed_at is not None and time.monotonic() - failed_at < INDEX_RETRY_SECONDS:
+            return
+        try:
+            await tiering.ensure_indexes(store.db, **store.collections)
+            self.indexed.add(store.tenant)
+            self.failed_at.pop(store.tenant, None)
+        except Exception as e:
+            self.failed_at[store.tenant] = time.monotonic()
+            logger.warning("Index creation failed for tenant %s: %s", store.tenant, e)
+
+def field_value(doc: dict, path: str):
+    """Read a dotted field path, e.g. business_details.brand"""
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+async def migrate(router: TenantRouter, assign: Callable[[dict], Optional[str]], query: Optional[dict] = None,
+                  include_archive: bool = False, batch_size: int = 1000, dry_run: bool = False) -> dict:
+    """
+    Move default-tenant documents to the tenant `assign` returns for each (None or the default
+    tenant leaves a document where it is). Source documents are deleted only after their batch
+    has been written to the target.
+    """
+    started = time.monotonic()
+    source = router.store(DEFAULT_TENANT)
+    moved: Dict[str, int] = {}
+    skipped = 0
+
+    async def flush(tenant: str, docs: list, hot: bool):
+        store = router.store(tenant)
+        moved[tenant] = moved.get(tenant, 0) + len(docs)
+        if dry_run:
+            return
+        await router.ensure_indexes(store)
+        target = store.db[store.hot if hot else store.archive]
+        await target.bulk_write([ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs], ordered=False)
+        await source.db[source.hot if hot else source.archive].delete_many({"_id": {"$in": [d["_id"] for d in docs]}})
+
+    async def stream(collection: str, hot: bool):
+        nonlocal skipped
+        buffers: Dict[str, list] = {}
+        cursor = source.db[collection].find(query if hot else {}).sort("_id", 1).batch_size(batch_size)
+        async for doc in cursor:
+            try:
+                tenant = assign(doc if hot else tiering.expand_document(doc))
+                tenant = resolve_tenant(tenant) if tenant else DEFAULT_TENANT
+            except ValueError as e:
+                skipped += 1
+                logger.warning("Skipping %s: %s", doc["_id"], e)
+                continue
+            if tenant == DEFAULT_TENANT:
+                continue
+            buffer = buffers.setdefault(tenant, [])
+            buffer.append(doc)
+            if len(buffer) >= batch_size:
+                await flush(tenant, buffer, hot)
+                buffers[tenant] = []
+        for tenant, buffer in buffers.items():
+            if buffer:
+                await flush(tenant, buffer, hot)
+
+    await stream(source.hot, hot=True)
+    if include_archive:
+        await stream(source.archive, hot=False)
+    return {
+        "moved": moved,
+        "skipped": skipped,
+        "dry_run": dry_run,
+        "elapsed_seconds": round(time.monotonic() - started, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Split the shared loan_applications collection into per-tenant storage")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--tenant-field", help="dotted field holding each document's tenant ID")
+    source.add_argument("--tenant", help="move every document matching --query to this tenant")
+    parser.add_argument("--query", help="JSON filter on the hot collection (required with --tenant unless --all)")
+    parser.add_argument("--all", action="store_true", help="with --tenant, move every default-tenant document")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="count what would move without writing")
+    args = parser.parse_args()
+    if args.tenant:
+        try:
+            query = json.loads(args.query) if args.query else {}
+        except json.JSONDecodeError as e:
+            parser.error(f"--query is not valid JSON: {e}")
+        # An empty filter would move the whole shared collection into one tenant
+        if not query and not args.all:
+            parser.error("--tenant needs a non-empty --query, or --all to move every document")
+        if query and args.all:
+            parser.error("--all can't be combined with --query")
+    elif args.query or args.all:
+        parser.error("--query and --all only apply with --tenant")
+
+    import log_pipeline
+    import server
+    log_pipeline.setup_logging()
+
+    if args.tenant_field:
+        field = args.tenant_field
+        assign, query = (lambda doc: field_value(doc, field)), {field: {"$exists": True}}
+    else:
+        tenant = resolve_tenant(args.tenant)
+        assign = lambda doc: tenant
+
+    async def run():
+        server.connect_database()
+        # Archived documents are compressed, so only a field lookup can route them
+        report = await migrate(server.tenant_router, assign, query, include_archive=bool(args.tenant_field),
+                               batch_size=args.batch_size, dry_run=args.dry_run)
+        verb = "Would move" if report["dry_run"] else "Moved"
+        for tenant, count in sorted(report["moved"].items()):
+            print(f"{verb} {count} documents to tenant {tenant}")
+        print(f"{report['skipped']} skipped, {report['elapsed_seconds']}s")
+
+    try:
+        asyncio.run(run())
+    finally:
+        log_pipeline.shutdown_logging()
+
+if __name__ == "__main__":
+    main()
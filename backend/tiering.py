@@ -0,0 +1,173 @@
+"""
+Hot/cold tiering for loan applications
+Applications older than ARCHIVE_AFTER_DAYS move from `loan_applications` into
+`loan_applications_archive` with a compact schema:
+
+    {"_id": application_id, "c": created_at, "s": qualification_status,
+     "q": qualification_score, "z": zlib(BSON of everything else)}
+
+The duplicated application_id/created_at fields are dropped and restored on read. When
+ARCHIVE_RETENTION_DAYS is set, a TTL index purges archived documents past retention.
+
+Collection names default to the default tenant's; other tenants pass their own (see tenancy.py).
+
+Run from the backend directory:
+    python tiering.py [--older-than-days 90] [--batch-size 500] [--tenant acme]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Optional
+
+import bson
+from pymongo import ReplaceOne
+from pymongo.errors import OperationFailure
+
+HOT_COLLECTION = "loan_applications"
+ARCHIVE_COLLECTION = "loan_applications_archive"
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '90'))
+ARCHIVE_RETENTION_DAYS = os.environ.get('ARCHIVE_RETENTION_DAYS')
+ARCHIVE_COMPRESSION_LEVEL = int(os.environ.get('ARCHIVE_COMPRESSION_LEVEL', '6'))
+
+def compact_document(doc: dict) -> dict:
+    """Convert a hot-tier document to the archive schema"""
+    body = {k: v for k, v in doc.items() if k not in ("_id", "application_id", "created_at")}
+    loan_result = dict(body.get("loan_result") or {})
+    loan_result.pop("application_id", None)
+    loan_result.pop("created_at", None)
+    body["loan_result"] = loan_result
+    return {
+        "_id": doc["application_id"],
+        "c": doc["created_at"],
+        "s": loan_result.get("qualification_status"),
+        "q": loan_result.get("qualification_score"),
+        "z": bson.Binary(zlib.compress(bson.encode(body), ARCHIVE_COMPRESSION_LEVEL)),
+    }
+
+def expand_document(archived: dict) -> dict:
+    """Restore the hot-tier shape of an archived document"""
+    body = bson.decode(zlib.decompress(archived["z"]))
+    loan_result = body.get("loan_result") or {}
+    loan_result["application_id"] = archived["_id"]
+    loan_result["created_at"] = archived["c"]
+    return {
+        "application_id": archived["_id"],
+        **body,
+        "loan_result": loan_result,
+        "created_at": archived["c"],
+    }
+
+async def find_application(db, application_id: str, hot: str = HOT_COLLECTION,
+                           archive: str = ARCHIVE_COLLECTION) -> Optional[dict]:
+    """Look up an application in the hot tier, then the archive"""
+    application = await db[hot].find_one({"application_id": application_id}, {"_id": 0})
+    if application is not None:
+        return application
+    archived = await db[archive].find_one({"_id": application_id})
+    if archived is not None:
+        return expand_document(archived)
+    return None
+
+async def ensure_indexes(db, hot: str = HOT_COLLECTION, archive: str = ARCHIVE_COLLECTION):
+    """Indexes used by lookups and the tiering job; TTL on the archive when retention is set"""
+    await db[hot].create_index("application_id", unique=True)
+    await db[hot].create_index("created_at")
+    if ARCHIVE_RETENTION_DAYS:
+        ttl_seconds = int(ARCHIVE_RETENTION_DAYS) * 86400
+        try:
+            await db[archive].create_index("c", name="retention_ttl", expireAfterSeconds=ttl_seconds)
+        except OperationFailure:
+            # Retention changed: update the existing TTL in place
+            await db.command("collMod", archive,
+                             index={"name": "retention_ttl", "expireAfterSeconds": ttl_seconds})
+
+async def collection_stats(db, name: str) -> dict:
+    """Document count and on-disk/in-memory footprint of one collection"""
+    try:
+        stats = await db.command("collStats", name)
+    except OperationFailure:
+        return {"count": 0, "size": 0, "storage_size": 0, "index_size": 0, "avg_obj_size": 0}
+    return {
+        "count": stats.get("count", 0),
+        "size": stats.get("size", 0),
+        "storage_size": stats.get("storageSize", 0),
+        "index_size": stats.get("totalIndexSize", 0),
+        "avg_obj_size": stats.get("avgObjSize", 0),
+    }
+
+async def working_set(db, hot: str = HOT_COLLECTION, archive: str = ARCHIVE_COLLECTION) -> dict:
+    hot_stats = await collection_stats(db, hot)
+    archive_stats = await collection_stats(db, archive)
+    return {"hot": hot_stats, "archive": archive_stats, "hot_bytes": hot_stats["size"] + hot_stats["index_size"]}
+
+async def archive_old_applications(db, older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = 500,
+                                   hot: str = HOT_COLLECTION, archive: str = ARCHIVE_COLLECTION) -> dict:
+    """
+    Move applications older than the cutoff into the archive. Each batch is upserted into the
+    archive before it is deleted from the hot tier, so an interrupted run can simply be rerun.
+    """
+    started = time.monotonic()
+    before = await working_set(db, hot, archive)
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    moved = 0
+    cursor = db[hot].find({"created_at": {"$lt": cutoff}}).sort("created_at", 1).batch_size(batch_size)
+    batch = []
+
+    async def flush():
+        nonlocal moved
+        if not batch:
+            return
+        compacted = [compact_document(doc) for doc in batch]
+        await db[archive].bulk_write(
+            [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in compacted], ordered=False
+        )
+        await db[hot].delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+        moved += len(batch)
+        batch.clear()
+
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            await flush()
+    await flush()
+
+    after = await working_set(db, hot, archive)
+    return {
+        "moved": moved,
+        "cutoff": cutoff.isoformat(),
+        "elapsed_seconds": round(time.monotonic() - started, 2),
+        "before": before,
+        "after": after,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old loan applications into the compressed archive tier")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--tenant", help="tenant whose applications to archive (default tenant if omitted)")
+    args = parser.parse_args()
+
+    import server
+    import tenancy
+
+    async def run():
+        server.connect_database()
+        store = server.tenant_router.store(tenancy.resolve_tenant(args.tenant))
+        await ensure_indexes(store.db, **store.collections)
+        report = await archive_old_applications(store.db, args.older_than_days, args.batch_size, **store.collections)
+        before, after = report["before"], report["after"]
+        print(f"Archived {report['moved']} applications older than {report['cutoff']} in {report['elapsed_seconds']}s")
+        print(f"Hot tier: {before['hot']['count']} docs / {before['hot_bytes']:,} bytes "
+              f"-> {after['hot']['count']} docs / {after['hot_bytes']:,} bytes")
+        print(f"Archive: {after['archive']['count']} docs / {after['archive']['size']:,} bytes")
+
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Opt-in request tracing for the QuickFlow Capital API
+A sampled fraction of requests (TRACE_SAMPLE_RATE) records timed spans into a ring buffer
+and, optionally, a JSONL file. With TRACE_PROFILE_ENABLED=true a single request can ask for
+a statistical profile with the `X-Profile: 1` header or `?profile=1`; the middleware's
+`authorize` callback must accept the request's X-Admin-Key, otherwise the ask is ignored.
+When a request is not traced, span() returns a shared no-op context manager.
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Optional
+from urllib.parse import parse_qs
+
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '0'))
+TRACE_FILE = os.environ.get('TRACE_FILE')
+TRACE_BUFFER_SIZE = int(os.environ.get('TRACE_BUFFER_SIZE', '200'))
+TRACE_PROFILE_ENABLED = os.environ.get('TRACE_PROFILE_ENABLED', 'false').lower() == 'true'
+TRACE_PROFILE_INTERVAL = float(os.environ.get('TRACE_PROFILE_INTERVAL', '0.001'))
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_NO_SPAN = nullcontext()
+
+# Most recent traces, newest last
+recent_traces = deque(maxlen=TRACE_BUFFER_SIZE)
+
+class Trace:
+    """Spans recorded for one request"""
+
+    __slots__ = ("trace_id", "method", "path", "started_at", "start", "spans", "profile", "duration_ms")
+
+    def __init__(self, method: str, path: str):
+        self.trace_id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.started_at = datetime.utcnow().isoformat()
+        self.start = time.perf_counter()
+        self.spans = []
+        self.profile = None
+        self.duration_ms = None
+
+    def add(self, name: str, start: float, end: float):
+        self.spans.append({
+            "name": name,
+            "offset_ms": round((start - self.start) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+        })
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "spans": self.spans,
+            "profile": self.profile,
+        }
+
+class _Span:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, self.start, time.perf_counter())
+        return False
+
+def span(name: str):
+    """Time a block of code as a span of the current trace, if any"""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name)
+
+def mark(name: str):
+    """Record a span from the start of the request up to now (e.g. request parsing)"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, trace.start, time.perf_counter())
+
+def get_trace(trace_id: str) -> Optional[dict]:
+    for trace in reversed(recent_traces):
+        if trace.trace_id == trace_id:
+            return trace.to_dict()
+    return None
+
+class StackSampler:
+    """
+    Samples the event-loop thread's stack on a timer thread and counts collapsed stacks.
+    Other requests running on the same loop can appear in the samples.
+    """
+
+    def __init__(self, thread_id: int, interval: float = TRACE_PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="trace-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> dict:
+        self._stop.set()
+        self._thread.join()
+        total = sum(self.samples.values())
+        return {
+            "interval_ms": self.interval * 1000,
+            "samples": total,
+            "stacks": [
+                {"stack": stack, "count": count}
+                for stack, count in self.samples.most_common(50)
+            ],
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+def _wants_profile(scope, authorize: Optional[Callable[[str], bool]]) -> bool:
+    if not TRACE_PROFILE_ENABLED or authorize is None:
+        return False
+    headers = dict(scope.get("headers", ()))
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    if headers.get(b"x-profile") not in (b"1", b"true") and "1" not in query.get("profile", ()):
+        return False
+    return authorize(headers.get(b"x-admin-key", b"").decode("latin-1"))
+
+def _write_trace_file(record: dict):
+    with open(TRACE_FILE, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+class TracingMiddleware:
+    """ASGI middleware that starts a trace for sampled or profiled requests"""
+
+    def __init__(self, app, authorize: Optional[Callable[[str], bool]] = None):
+        self.app = app
+        # Called with the X-Admin-Key header; profiling is refused without it
+        self.authorize = authorize
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        profile = _wants_profile(scope, self.authorize)
+        if not profile and (TRACE_SAMPLE_RATE <= 0 or random.random() >= TRACE_SAMPLE_RATE):
+            return await self.app(scope, receive, send)
+
+        trace = Trace(scope["method"], scope["path"])
+        token = _current_trace.set(trace)
+        sampler = None
+        if profile:
+            sampler = StackSampler(threading.get_ident())
+            sampler.start()
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", trace.trace_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            _current_trace.reset(token)
+            trace.duration_ms = round((time.perf_counter() - trace.start) * 1000, 3)
+            if sampler is not None:
+                trace.profile = sampler.stop()
+            recent_traces.append(trace)
+            if TRACE_FILE:
+                await asyncio.to_thread(_write_trace_file, trace.to_dict())
@@ -0,0 +1,303 @@
+"""
+Outbound webhook delivery of loan decisions
+Each decision is written to the `webhook_outbox` collection once per destination: every URL in
+WEBHOOK_PARTNER_URLS, plus the `webhook_url` of each matched lender when the lender catalog
+sets one. A background worker claims due entries, groups them by endpoint and POSTs them in
+batches over one pooled HTTP client. Each endpoint is delivered by its own task, so a slow
+partner only delays its own entries:
+
+    {"batch_id": "...", "events": [{"type": "application.decision", ...}, ...]}
+
+A batch that fails is retried with exponential backoff and jitter. After WEBHOOK_MAX_ATTEMPTS
+it is marked dead, and 4xx responses other than 408/429 are dead straight away. Each destination
+gets at most WEBHOOK_MAX_PER_DESTINATION concurrent requests. When WEBHOOK_SIGNING_SECRET is set,
+each body is signed with HMAC-SHA256 in X-QuickFlow-Signature.
+
+Delivered entries are purged by a TTL index after WEBHOOK_RETENTION_DAYS and dead ones after
+WEBHOOK_DEAD_RETENTION_DAYS, so the outbox only holds recent history. Indexes are created by
+the worker, which retries on its next cycle if MongoDB is unreachable; startup never waits on it.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from fastapi.encoders import jsonable_encoder
+from pymongo import UpdateOne
+
+import metrics
+from tenancy import DEFAULT_TENANT
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = "webhook_outbox"
+
+WEBHOOK_PARTNER_URLS = [u.strip() for u in os.environ.get('WEBHOOK_PARTNER_URLS', '').split(',') if u.strip()]
+WEBHOOK_SIGNING_SECRET = os.environ.get('WEBHOOK_SIGNING_SECRET')
+WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', '50'))
+WEBHOOK_MAX_PER_DESTINATION = int(os.environ.get('WEBHOOK_MAX_PER_DESTINATION', '4'))
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', '8'))
+WEBHOOK_TIMEOUT = float(os.environ.get('WEBHOOK_TIMEOUT', '10'))
+WEBHOOK_POLL_INTERVAL = float(os.environ.get('WEBHOOK_POLL_INTERVAL', '2'))
+WEBHOOK_RETENTION_DAYS = int(os.environ.get('WEBHOOK_RETENTION_DAYS', '7'))
+WEBHOOK_DEAD_RETENTION_DAYS = int(os.environ.get('WEBHOOK_DEAD_RETENTION_DAYS', '30'))
+
+# Backoff doubles from the base up to the cap; jitter spreads retries from many workers
+BACKOFF_BASE_SECONDS = 2.0
+BACKOFF_MAX_SECONDS = 900.0
+
+# Entries claimed by a worker that died are retried once the lease expires
+CLAIM_LEASE_SECONDS = 120
+
+# Due entries fetched per worker cycle
+FETCH_LIMIT = 1000
+
+# The backlog gauge is recomputed at most this often
+BACKLOG_REPORT_INTERVAL = 15.0
+
+metrics.describe("webhook_deliveries_total", "counter", "Webhook batch deliveries by outcome")
+metrics.describe("webhook_delivery_latency_seconds", "histogram", "Time from decision to successful webhook delivery")
+metrics.describe("webhook_backlog", "gauge", "Undelivered webhook events per endpoint host")
+
+def decision_event(application_id: str, loan_result: dict, tenant: str = DEFAULT_TENANT) -> dict:
+    """Webhook payload for a decision; applicant contact details are left out"""
+    return jsonable_encoder({
+        "type": "application.decision",
+        "event_id": str(uuid.uuid4()),
+        "application_id": application_id,
+        "tenant": tenant,
+        "qualification_status": loan_result["qualification_status"],
+        "qualification_score": loan_result["qualification_score"],
+        "recommended_loan_amount": loan_result["recommended_loan_amount"],
+        "interest_rate_range": loan_result["interest_rate_range"],
+        "risk_assessment": loan_result["risk_assessment"],
+        "matched_lenders": [
+            {"lender_name": m["lender_name"], "match_score": m["match_score"]}
+            for m in loan_result["matched_lenders"]
+        ],
+        "decided_at": loan_result["created_at"],
+    })
+
+def destinations(matched_lenders: Iterable[dict], lenders: Iterable[dict]) -> List[str]:
+    """Partner URLs plus the webhook URL of every matched lender that has one"""
+    urls = {lender["lender_name"]: lender.get("webhook_url") for lender in lenders}
+    endpoints = list(WEBHOOK_PARTNER_URLS)
+    for match in matched_lenders:
+        url = urls.get(match["lender_name"])
+        if url and url not in endpoints:
+            endpoints.append(url)
+    return endpoints
+
+def endpoint_host(endpoint: str) -> str:
+    """Host (and port) of an endpoint; metric labels leave out paths and queries that may hold tokens"""
+    parts = urlsplit(endpoint)
+    host = parts.hostname or "unknown"
+    return f"{host}:{parts.port}" if parts.port else host
+
+def backoff_delay(attempts: int) -> float:
+    return min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+def sign(body: bytes, secret: str) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+class WebhookDispatcher:
+    """Persists decisions to the outbox and delivers them from a background task"""
+
+    def __init__(self, batch_size: int = WEBHOOK_BATCH_SIZE, per_destination: int = WEBHOOK_MAX_PER_DESTINATION):
+        self.batch_size = batch_size
+        self.per_destination = per_destination
+        self.db = None
+        self.http = None
+        self.backlog = 0
+        self.indexed = False
+        self._backlog_reported_at = 0.0
+        self.semaphores: Dict[str, asyncio.Semaphore] = defaultdict(lambda: asyncio.Semaphore(self.per_destination))
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        # endpoint -> task delivering its claimed entries; busy endpoints are not claimed again
+        self.deliveries: Dict[str, asyncio.Task] = {}
+
+    async def enqueue(self, db, application_id: str, loan_result: dict, endpoints: List[str],
+                      tenant: str = DEFAULT_TENANT):
+        """Write one outbox entry per endpoint and nudge the worker"""
+        if not endpoints:
+            return
+        event = decision_event(application_id, loan_result, tenant)
+        now = datetime.utcnow()
+        await db[OUTBOX_COLLECTION].insert_many([
+            {"endpoint": endpoint, "event": event, "status": "pending", "attempts": 0,
+             "created_at": now, "next_attempt_at": now}
+            for endpoint in endpoints
+        ])
+        self._wakeup.set()
+
+    async def ensure_indexes(self):
+        """Due-entry and claim lookups, plus TTL purges of delivered and dead entries"""
+        outbox = self.db[OUTBOX_COLLECTION]
+        await outbox.create_index([("status", 1), ("next_attempt_at", 1)])
+        await outbox.create_index("claimed_by", sparse=True)
+        await outbox.create_index("delivered_at", expireAfterSeconds=WEBHOOK_RETENTION_DAYS * 86400)
+        await outbox.create_index("dead_at", expireAfterSeconds=WEBHOOK_DEAD_RETENTION_DAYS * 86400)
+        self.indexed = True
+
+    async def start(self, db):
+        """Start the worker; nothing here touches MongoDB, so startup can't block on it"""
+        import httpx
+
+        self.db = db
+        self.http = httpx.AsyncClient(
+            timeout=WEBHOOK_TIMEOUT,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        for task in list(self.deliveries.values()):
+            task.cancel()
+        if self.http is not None:
+            await self.http.aclose()
+            self.http = None
+
+    async def _run(self):
+        while True:
+            # Cleared before the cycle so decisions enqueued during it trigger another pass
+            self._wakeup.clear()
+            try:
+                if not self.indexed:
+                    await self.ensure_indexes()
+                await self.deliver_due()
+                if time.monotonic() - self._backlog_reported_at >= BACKLOG_REPORT_INTERVAL:
+                    await self.report_backlog()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Webhook delivery cycle failed: %s", e)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), WEBHOOK_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def claim_due(self) -> List[dict]:
+        """
+        Claim due entries for this worker; other workers skip anything already claimed, and
+        endpoints this worker is still delivering to are left for a later cycle
+        """
+        outbox = self.db[OUTBOX_COLLECTION]
+        now = datetime.utcnow()
+        due = {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "sending", "lease_expires": {"$lt": now}},
+        ]}
+        if self.deliveries:
+            due["endpoint"] = {"$nin": list(self.deliveries)}
+        ids = [doc["_id"] async for doc in outbox.find(due, {"_id": 1}).sort("next_attempt_at", 1).limit(FETCH_LIMIT)]
+        if not ids:
+            return []
+        claim = uuid.uuid4().hex
+        await outbox.update_many(
+            {"_id": {"$in": ids}, **due},
+            {"$set": {"status": "sending", "claimed_by": claim, "lease_expires": now + timedelta(seconds=CLAIM_LEASE_SECONDS)}},
+        )
+        return [doc async for doc in outbox.find({"claimed_by": claim, "status": "sending"})]
+
+    async def deliver_due(self) -> int:
+        """
+        Start delivering every due entry, one task per endpoint; returns the number of entries
+        claimed without waiting for their deliveries
+        """
+        entries = await self.claim_due()
+        by_endpoint = defaultdict(list)
+        for entry in entries:
+            by_endpoint[entry["endpoint"]].append(entry)
+        for endpoint, claimed in by_endpoint.items():
+            task = self.deliveries[endpoint] = asyncio.create_task(self.deliver_endpoint(endpoint, claimed))
+            task.add_done_callback(lambda _, endpoint=endpoint: self.deliveries.pop(endpoint, None))
+        return len(entries)
+
+    async def join(self):
+        """Wait for the deliveries in flight"""
+        while self.deliveries:
+            await asyncio.gather(*self.deliveries.values(), return_exceptions=True)
+
+    async def deliver_endpoint(self, endpoint: str, entries: List[dict]):
+        """Deliver one endpoint's claimed entries in batches; unsent ones are re-claimed after the lease"""
+        try:
+            await asyncio.gather(*(
+                self.deliver_batch(endpoint, entries[i:i + self.batch_size])
+                for i in range(0, len(entries), self.batch_size)
+            ))
+        except Exception as e:
+            logger.warning("Webhook delivery to %s failed: %s", endpoint_host(endpoint), e)
+
+    async def deliver_batch(self, endpoint: str, entries: List[dict]):
+        batch_id = uuid.uuid4().hex
+        body = json.dumps({"batch_id": batch_id, "events": [e["event"] for e in entries]}).encode()
+        headers = {"Content-Type": "application/json", "X-QuickFlow-Batch-Id": batch_id}
+        if WEBHOOK_SIGNING_SECRET:
+            headers["X-QuickFlow-Signature"] = sign(body, WEBHOOK_SIGNING_SECRET)
+
+        error, permanent = None, False
+        async with self.semaphores[endpoint]:
+            try:
+                response = await self.http.post(endpoint, content=body, headers=headers)
+                if response.status_code >= 300:
+                    error = f"HTTP {response.status_code}"
+                    permanent = 400 <= response.status_code < 500 and response.status_code not in (408, 429)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+
+        now = datetime.utcnow()
+        outbox = self.db[OUTBOX_COLLECTION]
+        if error is None:
+            metrics.inc("webhook_deliveries_total", outcome="delivered")
+            for entry in entries:
+                metrics.observe("webhook_delivery_latency_seconds", (now - entry["created_at"]).total_seconds())
+            await outbox.update_many(
+                {"_id": {"$in": [e["_id"] for e in entries]}},
+                {"$set": {"status": "delivered", "delivered_at": now},
+                 "$inc": {"attempts": 1},
+                 "$unset": {"claimed_by": "", "lease_expires": ""}},
+            )
+            return
+
+        operations, dead = [], 0
+        for entry in entries:
+            attempts = entry["attempts"] + 1
+            if permanent or attempts >= WEBHOOK_MAX_ATTEMPTS:
+                dead += 1
+                update = {"status": "dead", "attempts": attempts, "last_error": error, "dead_at": now}
+            else:
+                update = {"status": "pending", "attempts": attempts, "last_error": error,
+                          "next_attempt_at": now + timedelta(seconds=backoff_delay(attempts))}
+            operations.append(UpdateOne({"_id": entry["_id"]}, {"$set": update, "$unset": {"claimed_by": "", "lease_expires": ""}}))
+        await outbox.bulk_write(operations, ordered=False)
+        outcome = "dead" if dead else "retry"
+        metrics.inc("webhook_deliveries_total", outcome=outcome)
+        logger.warning("Webhook batch to %s failed (%s); %d events marked %s", endpoint, error, len(entries), outcome)
+
+    async def report_backlog(self):
+        """Publish undelivered entries per endpoint host"""
+        cursor = self.db[OUTBOX_COLLECTION].aggregate([
+            {"$match": {"status": {"$in": ["pending", "sending"]}}},
+            {"$group": {"_id": "$endpoint", "count": {"$sum": 1}}},
+        ])
+        depths = defaultdict(int)
+        async for doc in cursor:
+            depths[endpoint_host(doc["_id"])] += doc["count"]
+        self.backlog = sum(depths.values())
+        self._backlog_reported_at = time.monotonic()
+        for host in {endpoint_host(endpoint) for endpoint in self.semaphores} | set(depths):
+            metrics.set_gauge("webhook_backlog", depths.get(host, 0), endpoint_host=host)
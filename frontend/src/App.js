@@ -45,6 +45,7 @@ function App() {
     e.preventDefault();
     setIsLoading(true);
     setError('');
+    let socket = null;
 
     try {
       // Convert string numbers to actual numbers
@@ -58,11 +59,18 @@ function App() {
         loan_amount_requested: parseFloat(formData.loan_amount_requested)
       };
 
+      // Subscribe before submitting so the result is pushed as soon as it is stored.
+      // randomUUID only exists on secure origins; without it, just wait for the response.
+      const headers = { 'Content-Type': 'application/json' };
+      if (typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function') {
+        const applicationId = crypto.randomUUID();
+        headers['X-Application-Id'] = applicationId;
+        socket = subscribeToApplication(applicationId);
+      }
+
       const response = await fetch(`${process.env.REACT_APP_BACKEND_URL}/api/submit-application`, {
         method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
+        headers,
         body: JSON.stringify(processedData),
       });
 
@@ -71,16 +79,47 @@ function App() {
       }
 
       const result = await response.json();
-      setResults(result);
-      setCurrentStep('results');
+      showResults(result);
     } catch (err) {
       setError('Error submitting application. Please try again.');
       console.error('Error:', err);
     } finally {
+      if (socket) {
+        socket.close();
+      }
       setIsLoading(false);
     }
   };
 
+  const showResults = (result) => {
+    setResults(result);
+    setCurrentStep('results');
+  };
+
+  const subscribeToApplication = (applicationId) => {
+    const wsUrl = `${process.env.REACT_APP_BACKEND_URL.replace(/^http/, 'ws')}/api/ws/applications`;
+    try {
+      const ws = new WebSocket(wsUrl);
+      ws.onopen = () => {
+        ws.send(JSON.stringify({ action: 'subscribe', application_ids: [applicationId] }));
+      };
+      ws.onmessage = (event) => {
+        const message = JSON.parse(event.data);
+        if (message.type === 'result') {
+          showResults(message.result);
+          setIsLoading(false);
+          ws.close();
+        }
+      };
+      ws.onerror = () => ws.close();
+      return ws;
+    } catch (err) {
+      // Push updates are best-effort; the HTTP response still carries the result
+      console.error('WebSocket error:', err);
+      return null;
+    }
+  };
+
   const getScoreColor = (score) => {
     if (score >= 80) return 'text-green-600';
     if (score >= 60) return 'text-yellow-600';
@@ -0,0 +1,31 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+ADMIN_ROUTES = [
+    ("post", "/api/admin/rematch"),
+    ("get", "/api/admin/rematch"),
+    ("post", "/api/admin/archive"),
+    ("get", "/api/admin/archive"),
+    ("get", "/api/admin/database"),
+    ("get", "/api/traces"),
+    ("get", "/api/traces/0123abcd"),
+]
+
+@pytest.fixture
+def client():
+    # No lifespan: these requests must be rejected before touching the database
+    return TestClient(server.app)
+
+@pytest.mark.parametrize("method, path", ADMIN_ROUTES)
+def test_admin_disabled_without_configured_key(client, monkeypatch, method, path):
+    monkeypatch.setattr(server, "ADMIN_API_KEY", None)
+    assert getattr(client, method)(path).status_code == 403
+    assert getattr(client, method)(path, headers={"X-Admin-Key": ""}).status_code == 403
+
+@pytest.mark.parametrize("method, path", ADMIN_ROUTES)
+def test_admin_rejects_wrong_key(client, monkeypatch, method, path):
+    monkeypatch.setattr(server, "ADMIN_API_KEY", "s3cret")
+    assert getattr(client, method)(path).status_code == 403
+    assert getattr(client, method)(path, headers={"X-Admin-Key": "wrong"}).status_code == 403
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+import concurrency
+from concurrency import AdaptiveLimiter, LimitExceeded
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(concurrency.time, "monotonic", lambda: now[0])
+    return now
+
+def limiter(**kwargs):
+    options = dict(initial=4, min_limit=2, max_limit=8, latency_target=1.0, queue_size=2, queue_timeout=0.05,
+                   enabled=True)
+    options.update(kwargs)
+    return AdaptiveLimiter(**options)
+
+def fill(lim, slots):
+    async def run():
+        for _ in range(slots):
+            await lim.acquire()
+    asyncio.run(run())
+
+def test_fast_calls_grow_limit_additively(clock):
+    lim = limiter()
+    fill(lim, 4)
+    for _ in range(4):
+        lim.record(0.1)
+    # About one slot per window of `limit` successful calls
+    assert lim.limit == pytest.approx(5.0, abs=0.1)
+
+def test_no_growth_while_limit_is_unused(clock):
+    lim = limiter()
+    fill(lim, 1)
+    for _ in range(20):
+        lim.record(0.1)
+    assert lim.limit == 4
+
+def test_growth_capped_at_max(clock):
+    lim = limiter(initial=8)
+    fill(lim, 8)
+    for _ in range(50):
+        lim.record(0.1)
+    assert lim.limit == 8
+
+def test_slow_call_cuts_limit_multiplicatively(clock):
+    lim = limiter(initial=8)
+    lim.record(5.0)
+    assert lim.limit == pytest.approx(8 * concurrency.BACKOFF_RATIO)
+
+def test_decrease_at_most_once_per_target_interval(clock):
+    lim = limiter(initial=8)
+    lim.record(5.0)
+    lim.record(5.0, ok=False)
+    assert lim.limit == pytest.approx(6.0)
+    clock[0] += 1.0
+    lim.record(5.0)
+    assert lim.limit == pytest.approx(4.5)
+
+def test_decrease_floors_at_min(clock):
+    lim = limiter(initial=2)
+    for _ in range(5):
+        lim.record(5.0)
+        clock[0] += 1.0
+    assert lim.limit == 2
+
+def test_failure_counts_as_congestion(clock):
+    lim = limiter(initial=8)
+    lim.record(0.1, ok=False)
+    assert lim.limit == pytest.approx(6.0)
+
+def test_full_queue_sheds():
+    lim = limiter(initial=2, queue_size=0)
+    fill(lim, 2)
+    with pytest.raises(LimitExceeded) as exc:
+        fill(lim, 1)
+    assert exc.value.reason == "queue_full"
+    assert lim.state()["shed_total"] == 1
+
+def test_queued_request_times_out():
+    lim = limiter(initial=2)
+    fill(lim, 2)
+    with pytest.raises(LimitExceeded) as exc:
+        fill(lim, 1)
+    assert exc.value.reason == "queue_timeout"
+    assert lim.state()["queued"] == 0
+
+def test_release_hands_slot_to_waiter():
+    lim = limiter(initial=2, queue_timeout=1.0)
+
+    async def run():
+        await lim.acquire()
+        await lim.acquire()
+        waiter = asyncio.ensure_future(lim.acquire())
+        await asyncio.sleep(0)
+        assert lim.state()["queued"] == 1
+        lim.release()
+        await waiter
+
+    asyncio.run(run())
+    assert lim.in_flight == 2 and not lim.waiters
+
+def test_disabled_never_sheds():
+    lim = limiter(initial=2, queue_size=0, enabled=False)
+    fill(lim, 10)
+    assert lim.in_flight == 10
@@ -0,0 +1,86 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import health
+from health import STALE_AFTER_INTERVALS, HealthMonitor, llm_probe
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    # Only health's view of the clock; the event loop keeps the real one for sleeps and timeouts
+    monkeypatch.setattr(health, "time", SimpleNamespace(monotonic=lambda: now[0], perf_counter=time.perf_counter))
+    return now
+
+def monitor(**probes):
+    """Monitor with stub probes; each value is (required, outcome), outcome an exception or a dict"""
+    m = HealthMonitor(interval=10, timeout=0.05)
+    for name, (required, outcome) in probes.items():
+        async def check(outcome=outcome):
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        m.probe(name, required=required)(check)
+    return m
+
+def test_starting_until_first_cycle(clock):
+    m = monitor(mongodb=(True, None))
+    assert m.readiness() == {"status": "starting", "checks": {}}
+    asyncio.run(m.refresh())
+    assert m.readiness()["status"] == "ready"
+
+def test_failing_required_probe_not_ready(clock):
+    m = monitor(mongodb=(True, ConnectionError("refused")))
+    asyncio.run(m.refresh())
+    report = m.readiness()
+    assert report["status"] == "not_ready"
+    assert report["checks"]["mongodb"]["error"] == "ConnectionError: refused"
+
+def test_failing_optional_probe_still_ready(clock):
+    m = monitor(mongodb=(True, None), llm=(False, RuntimeError("HTTP 503")))
+    asyncio.run(m.refresh())
+    report = m.readiness()
+    assert report["status"] == "ready"
+    assert report["checks"]["llm"]["status"] == "failing"
+
+def test_probe_fields_override_defaults(clock):
+    m = monitor(llm=(False, {"mode": "passive", "status": "unknown", "latency_ms": None}))
+    asyncio.run(m.refresh())
+    assert m.readiness()["checks"]["llm"] == {
+        "status": "unknown", "mode": "passive", "latency_ms": None,
+        "checked_at": m.results["llm"]["checked_at"],
+    }
+
+def test_probe_timeout_marks_failing(clock):
+    m = HealthMonitor(interval=10, timeout=0.01)
+
+    @m.probe("mongodb")
+    async def hangs():
+        await asyncio.sleep(1)
+
+    asyncio.run(m.refresh())
+    result = m.readiness()["checks"]["mongodb"]
+    assert result["status"] == "failing" and result["error"] == "timed out after 0.01s"
+
+def test_stale_results_not_ready(clock):
+    m = monitor(mongodb=(True, None))
+    asyncio.run(m.refresh())
+    clock[0] += 10 * STALE_AFTER_INTERVALS
+    assert m.readiness()["status"] == "ready"
+    clock[0] += 1
+    report = m.readiness()
+    assert report["status"] == "not_ready"
+    assert report["checks"]["probes"]["status"] == "failing"
+    # The cached probe result itself is left as it was
+    assert report["checks"]["mongodb"]["status"] == "ok"
+
+def test_passive_llm_probe_reports_last_call(clock, monkeypatch):
+    monkeypatch.setattr(health, "LLM_HEALTH_URL", None)
+    m = HealthMonitor()
+    check = llm_probe(m)
+    assert asyncio.run(check())["status"] == "unknown"
+    m.observe("llm", 1.5, ok=False, error="timeout")
+    result = asyncio.run(check())
+    assert (result["status"], result["latency_ms"], result["error"]) == ("failing", 1500.0, "timeout")
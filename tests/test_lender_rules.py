@@ -0,0 +1,76 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from lender_rules import CompiledCatalog, RuleError, evaluate_interpreted, merge_catalog
+
+LENDERS = [
+    {"lender_name": "Alpha", "lender_type": "Bank", "interest_rate_range": "5% - 7%",
+     "min_credit_score": 700, "max_loan_amount": 500_000, "specialties": ["Technology"]},
+    {"lender_name": "Beta", "lender_type": "Online", "interest_rate_range": "8% - 12%",
+     "min_credit_score": 600, "max_loan_amount": 250_000, "specialties": ["Retail", "Technology"]},
+    {"lender_name": "Gamma", "lender_type": "Credit Union", "interest_rate_range": "6% - 9%",
+     "min_credit_score": 650, "max_loan_amount": 1_000_000, "specialties": ["Agriculture"],
+     "rules": {"scoring": {"industry_match": {"points": 40}, "low_risk": {"enabled": False}}}},
+]
+
+def application(**overrides):
+    base = {"industry": "Technology", "credit_score": 720, "loan_amount_requested": 200_000.0}
+    return SimpleNamespace(**dict(base, **overrides))
+
+AI = {"qualification_score": 85, "risk_assessment": "Low"}
+
+def test_compiled_matches_interpreted():
+    catalog = CompiledCatalog(LENDERS)
+    merged = merge_catalog(LENDERS)
+    rng = random.Random(7)
+    for _ in range(300):
+        app = application(
+            industry=rng.choice(["Technology", "Retail", "Agriculture", "Education"]),
+            credit_score=rng.randint(550, 800),
+            loan_amount_requested=float(rng.randint(10, 1200) * 1000),
+        )
+        ai = {"qualification_score": rng.randint(30, 95), "risk_assessment": rng.choice(["Low", "Medium", "High"])}
+        assert catalog.match(app, ai, limit=3) == evaluate_interpreted(LENDERS, merged, app, ai, limit=3)
+
+def test_eligibility_and_scores():
+    matches = CompiledCatalog(LENDERS).match(application(), AI)
+    by_name = {m["lender_name"]: m for m in matches}
+    # Alpha: industry 30 + strong qualification 20 + low risk 15; credit margin not met
+    assert by_name["Alpha"]["match_score"] == 65
+    # Beta: 30 + 25 + 20 + 15
+    assert by_name["Beta"]["match_score"] == 90
+    assert matches[0]["lender_name"] == "Beta"
+    assert by_name["Beta"]["pre_approval_likelihood"] == "High"
+
+def test_lender_overrides():
+    ag = application(industry="Agriculture", credit_score=710)
+    gamma = next(m for m in CompiledCatalog(LENDERS).match(ag, AI) if m["lender_name"] == "Gamma")
+    # industry 40 + credit margin 25 + strong qualification 20; low_risk disabled
+    assert gamma["match_score"] == 85
+
+def test_prefilter_then_finalize_equals_match():
+    catalog = CompiledCatalog(LENDERS)
+    app = application(credit_score=660)
+    assert catalog.finalize(catalog.prefilter(app), AI) == catalog.match(app, AI)
+
+def test_ineligible_application_has_no_matches():
+    assert CompiledCatalog(LENDERS).match(application(credit_score=500), AI) == []
+
+@pytest.mark.parametrize("rule, section", [
+    ({"name": "bad_op", "when": {"field": "credit_score", "op": "~", "value": 1}}, "eligibility"),
+    ({"name": "ai_gate", "when": {"field": "ai.qualification_score", "op": ">=", "value": 50}}, "eligibility"),
+    ({"name": "bad_field", "when": {"field": "credit_score; import os", "op": ">=", "value": 1}}, "scoring"),
+    ({"name": "no_operand", "when": {"field": "credit_score", "op": ">="}}, "scoring"),
+])
+def test_malformed_rules_rejected(rule, section):
+    rules = {"eligibility": [], "scoring": []}
+    rules[section].append(dict(rule, points=5) if section == "scoring" else rule)
+    with pytest.raises(RuleError):
+        CompiledCatalog(LENDERS, rules)
+
+def test_lender_name_cannot_inject_code():
+    lenders = [dict(LENDERS[0], lender_name="Evil\nraise SystemExit")]
+    catalog = CompiledCatalog(lenders)
+    assert catalog.match(application(), AI)[0]["lender_name"] == "Evil\nraise SystemExit"
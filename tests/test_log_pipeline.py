@@ -0,0 +1,121 @@
+import asyncio
+import io
+import json
+import logging
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import log_pipeline
+import metrics
+from log_pipeline import RequestContextMiddleware, SamplingFilter, bind_application
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Starts the pipeline against a given stream and restores the root logger afterwards"""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+
+    def start(stream, queue_size=100):
+        monkeypatch.setattr(log_pipeline, "LOG_QUEUE_SIZE", queue_size)
+        monkeypatch.setattr(log_pipeline, "LOG_SAMPLE_RATES", "")
+        log_pipeline.setup_logging(stream)
+
+    yield start
+    log_pipeline.shutdown_logging()
+    root.handlers, root.level = handlers, level
+
+def lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+def record(name="noisy", level=logging.INFO):
+    return logging.makeLogRecord({"name": name, "levelno": level, "levelname": logging.getLevelName(level)})
+
+class BlockedStream(io.StringIO):
+    """Holds the writer thread on its first write until released"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.release.wait(5)
+        return super().write(text)
+
+def test_full_queue_drops_and_counts(pipeline):
+    stream = BlockedStream()
+    pipeline(stream, queue_size=1)
+    before = metrics.get_counter("log_records_dropped_total")
+    log = logging.getLogger("burst")
+    for i in range(6):
+        log.warning("event %d", i)
+
+    # One record held by the blocked writer at most, one in the queue, the rest dropped
+    dropped = metrics.get_counter("log_records_dropped_total") - before
+    assert dropped >= 4
+    stream.release.set()
+    # Stopping enqueues a sentinel, which needs room in the queue
+    queue = log_pipeline._listener.queue
+    while not queue.empty():
+        time.sleep(0.001)
+    log_pipeline.shutdown_logging()
+    assert len(lines(stream)) == 6 - dropped
+
+def test_sampling_keeps_configured_fraction(monkeypatch):
+    monkeypatch.setattr(log_pipeline, "random", random.Random(7))
+    sampler = SamplingFilter("noisy=0.25, other=1")
+    before = metrics.get_counter("log_records_sampled_out_total", logger="noisy")
+    kept = sum(sampler.filter(record()) for _ in range(4000))
+    assert 900 <= kept <= 1100
+    assert metrics.get_counter("log_records_sampled_out_total", logger="noisy") - before == 4000 - kept
+
+def test_sampling_spares_warnings_and_unlisted_loggers(monkeypatch):
+    monkeypatch.setattr(log_pipeline, "random", SimpleNamespace(random=lambda: 0.99))
+    sampler = SamplingFilter("noisy=0.5")
+    assert sampler.rates == {"noisy": 0.5}
+    assert not sampler.filter(record())
+    assert sampler.filter(record(level=logging.WARNING))
+    assert sampler.filter(record(name="quiet"))
+    assert SamplingFilter("").filter(record())
+
+def test_request_and_application_ids_captured(pipeline):
+    stream = io.StringIO()
+    pipeline(stream)
+    log = logging.getLogger("server")
+    sent = []
+
+    async def app(scope, receive, send):
+        log.info("received")
+        bind_application("app-1")
+        # Formatted later on the writer thread, so the IDs must be captured here
+        await asyncio.to_thread(log.info, "from a worker thread")
+        log.info("matched", extra={"lenders": 3})
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def send(message):
+        sent.append(message)
+
+    async def run():
+        middleware = RequestContextMiddleware(app)
+        await middleware({"type": "http", "headers": [(b"x-request-id", b"req-1")]}, None, send)
+        await middleware({"type": "http", "headers": []}, None, send)
+        log.info("after")
+
+    asyncio.run(run())
+    log_pipeline.shutdown_logging()
+
+    entries = lines(stream)
+    first, second, after = entries[:3], entries[3:6], entries[6]
+    assert [(e["request_id"], e.get("application_id")) for e in first] == [
+        ("req-1", None), ("req-1", "app-1"), ("req-1", "app-1"),
+    ]
+    assert first[2]["lenders"] == 3
+    # A fresh ID per request, and the application ID doesn't leak into the next one
+    generated = second[0]["request_id"]
+    assert generated != "req-1" and "application_id" not in second[0]
+    assert (b"x-request-id", b"req-1") in sent[0]["headers"]
+    assert (b"x-request-id", generated.encode()) in sent[1]["headers"]
+    assert "request_id" not in after and "application_id" not in after
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from pipeline import Pipeline, PipelineError
+
+def test_dependencies_see_results_and_order_is_valid():
+    pipeline = Pipeline()
+
+    @pipeline.stage("matches", after=("analysis", "prefilter"))
+    def matches(ctx):
+        return ctx["prefilter"] + [ctx["analysis"]]
+
+    @pipeline.stage("analysis")
+    async def analysis(ctx):
+        return ctx["input"] * 2
+
+    @pipeline.stage("prefilter")
+    def prefilter(ctx):
+        return [ctx["input"]]
+
+    order = pipeline.order()
+    assert order.index("matches") > order.index("analysis")
+    assert order.index("matches") > order.index("prefilter")
+    ctx = asyncio.run(pipeline.run({"input": 3}))
+    assert ctx["matches"] == [3, 6]
+
+def test_independent_stages_overlap():
+    pipeline = Pipeline()
+    events = []
+
+    @pipeline.stage("slow")
+    async def slow(ctx):
+        events.append("slow started")
+        await asyncio.sleep(0.05)
+        events.append("slow finished")
+
+    @pipeline.stage("fast")
+    def fast(ctx):
+        events.append("fast ran")
+
+    @pipeline.stage("last", after=("slow", "fast"))
+    def last(ctx):
+        events.append("last ran")
+
+    asyncio.run(pipeline.run({}))
+    assert events.index("fast ran") < events.index("slow finished")
+    assert events[-1] == "last ran"
+
+def test_failure_cancels_other_stages():
+    pipeline = Pipeline()
+    finished = []
+
+    @pipeline.stage("boom")
+    async def boom(ctx):
+        raise RuntimeError("failed")
+
+    @pipeline.stage("slow")
+    async def slow(ctx):
+        await asyncio.sleep(1)
+        finished.append("slow")
+
+    @pipeline.stage("after_boom", after=("boom",))
+    def after_boom(ctx):
+        finished.append("after_boom")
+
+    with pytest.raises(RuntimeError, match="failed"):
+        asyncio.run(pipeline.run({}))
+    assert finished == []
+
+def test_cycle_rejected():
+    pipeline = Pipeline()
+    pipeline.stage("a", after=("b",))(lambda ctx: None)
+    pipeline.stage("b", after=("a",))(lambda ctx: None)
+    with pytest.raises(PipelineError, match="cycle"):
+        pipeline.order()
+
+def test_unknown_dependency_rejected():
+    pipeline = Pipeline()
+    pipeline.stage("a", after=("missing",))(lambda ctx: None)
+    with pytest.raises(PipelineError, match="Unknown stage 'missing'"):
+        pipeline.order()
+
+def test_duplicate_stage_rejected():
+    pipeline = Pipeline()
+    pipeline.stage("a")(lambda ctx: None)
+    with pytest.raises(PipelineError, match="already registered"):
+        pipeline.stage("a")(lambda ctx: None)
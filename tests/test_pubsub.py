@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+import pubsub
+from pubsub import EVENTS_COLLECTION, ResultBroker, Subscription
+
+def drain(subscription):
+    messages = []
+    while not subscription.queue.empty():
+        messages.append(subscription.queue.get_nowait())
+    return messages
+
+def test_local_events_stay_within_tenant():
+    broker = ResultBroker("local")
+    acme, default = Subscription("acme"), Subscription()
+    broker.subscribe(acme, ["app-1"])
+    broker.subscribe(default, ["app-1"])
+
+    async def publish():
+        await broker.publish_status("acme", "app-1", "processing")
+    asyncio.run(publish())
+    broker.publish_result("default", "app-1", {"qualification_score": 70})
+
+    assert [m["type"] for m in drain(acme)] == ["status"]
+    assert [m["type"] for m in drain(default)] == ["result"]
+
+def test_unsubscribe_removes_tenant_key():
+    broker = ResultBroker("local")
+    subscription = Subscription("acme")
+    broker.subscribe(subscription, ["app-1", "app-2"])
+    broker.unsubscribe(subscription, ["app-1"])
+    assert set(broker.subscribers) == {("acme", "app-2")}
+    broker.unsubscribe(subscription)
+    assert not broker.subscribers
+
+class FakeStream:
+    def __init__(self, changes):
+        self.changes = changes
+        self.resume_token = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.changes:
+            raise asyncio.CancelledError
+        return self.changes.pop(0)
+
+class FakeCollection:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.indexes = []
+
+    async def create_index(self, key, **options):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("mongo down")
+        self.indexes.append(key)
+
+class FakeDatabase:
+    name = "loans"
+
+    def __init__(self, changes, index_failures=0):
+        self.changes = changes
+        self.events = FakeCollection(index_failures)
+
+    def __getitem__(self, name):
+        assert name == EVENTS_COLLECTION
+        return self.events
+
+    def watch(self, pipeline, resume_after=None):
+        return FakeStream(self.changes)
+
+def test_change_stream_routes_by_tenant(monkeypatch):
+    monkeypatch.setattr(pubsub, "TENANT_STORAGE", "collection")
+    changes = [
+        {"ns": {"db": "loans", "coll": EVENTS_COLLECTION},
+         "fullDocument": {"_id": 1, "type": "status", "application_id": "app-1", "status": "processing",
+                          "tenant": "acme", "expires_at": None}},
+        {"ns": {"db": "loans", "coll": "loan_applications__acme"},
+         "fullDocument": {"application_id": "app-1", "loan_result": {"qualification_score": 70}}},
+        {"ns": {"db": "loans", "coll": "loan_applications"},
+         "fullDocument": {"application_id": "app-1", "loan_result": {"qualification_score": 40}}},
+    ]
+    broker = ResultBroker("changestream")
+    broker.db = FakeDatabase(changes)
+    acme, default = Subscription("acme"), Subscription()
+    broker.subscribe(acme, ["app-1"])
+    broker.subscribe(default, ["app-1"])
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(broker._watch())
+
+    assert drain(acme) == [
+        {"type": "status", "application_id": "app-1", "status": "processing"},
+        {"type": "result", "application_id": "app-1", "result": {"qualification_score": 70}},
+    ]
+    assert drain(default) == [{"type": "result", "application_id": "app-1", "result": {"qualification_score": 40}}]
+
+def test_start_does_not_touch_mongo():
+    class Unreachable:
+        def __getitem__(self, name):
+            raise AssertionError("startup must not wait for MongoDB")
+
+    async def run():
+        broker = ResultBroker("changestream")
+        await broker.start(Unreachable())
+        await broker.stop()
+    asyncio.run(run())
+
+def test_event_index_retried_on_reconnect(monkeypatch):
+    monkeypatch.setattr(pubsub, "TENANT_STORAGE", "collection")
+    broker = ResultBroker("changestream")
+    broker.db = FakeDatabase([], index_failures=1)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(broker._watch())
+    assert not broker.indexed
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(broker._watch())
+    assert broker.indexed and broker.db.events.indexes == ["expires_at"]
@@ -0,0 +1,70 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limit
+from rate_limit import LocalBucketStore, RateLimiter, client_ip, retry_after_header
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+def test_bucket_allows_burst_then_refills(clock):
+    store = LocalBucketStore()
+    assert [store.take("k", 1.0, 3) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert store.take("k", 1.0, 3) == pytest.approx(1.0)
+    clock[0] += 1.0
+    assert store.take("k", 1.0, 3) == 0.0
+
+def test_peek_does_not_consume(clock):
+    store = LocalBucketStore()
+    store.take("k", 1.0, 1)
+    assert store.peek("k", 1.0, 1) == pytest.approx(1.0)
+    clock[0] += 1.0
+    assert store.peek("k", 1.0, 1) == 0.0
+    assert store.peek("k", 1.0, 1) == 0.0
+    assert store.take("k", 1.0, 1) == 0.0
+
+def test_eviction_drops_only_full_buckets(clock):
+    store = LocalBucketStore(max_buckets=2)
+    store.take("drained", 0.001, 1)
+    store.take("full", 1.0, 1)
+    clock[0] += 5.0
+    store.take("new", 1.0, 1)
+    assert set(store.buckets) == {"drained", "new"}
+
+def test_rejection_takes_no_tokens_from_other_buckets(clock):
+    limiter = RateLimiter({"ip": (1.0, 5), "email": (1.0, 1)})
+    identities = [("ip", "1.2.3.4"), ("email", "a@b.com")]
+    assert asyncio.run(limiter.check(identities)) is None
+    scope, delay = asyncio.run(limiter.check(identities))
+    assert scope == "email" and delay == pytest.approx(1.0)
+    # Only the first, allowed request took an IP token
+    assert limiter.local.buckets["ip:1.2.3.4"][0] == pytest.approx(4)
+
+def test_missing_identity_is_not_limited(clock):
+    limiter = RateLimiter({"api_key": (1.0, 1)})
+    for _ in range(3):
+        assert asyncio.run(limiter.check([("api_key", None)])) is None
+
+def request(peer, forwarded=None):
+    headers = {"x-forwarded-for": forwarded} if forwarded else {}
+    return SimpleNamespace(client=SimpleNamespace(host=peer), headers=headers)
+
+def test_forwarded_for_ignored_from_untrusted_peer():
+    assert client_ip(request("203.0.113.9", "198.51.100.1")) == "203.0.113.9"
+
+def test_forwarded_for_uses_rightmost_untrusted_hop():
+    # The client prepended a fake address; the ingress appended the real one
+    assert client_ip(request("10.0.0.5", "1.1.1.1, 198.51.100.7")) == "198.51.100.7"
+    assert client_ip(request("10.0.0.5", "198.51.100.7, 10.0.0.4")) == "198.51.100.7"
+
+def test_forwarded_for_missing_uses_peer():
+    assert client_ip(request("10.0.0.5")) == "10.0.0.5"
+
+def test_retry_after_rounds_up():
+    assert retry_after_header(0.2) == "1"
+    assert retry_after_header(2.01) == "3"
@@ -0,0 +1,152 @@
+import asyncio
+from types import SimpleNamespace
+
+import rematch
+from rematch import CHECKPOINT_COLLECTION, JOB_ID, RematchJob
+
+class Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs.sort(key=lambda d: d[field], reverse=direction < 0)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+def matches(doc, query):
+    for field, condition in query.items():
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            if "$gt" in condition and not value > condition["$gt"]:
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+class Applications:
+    def __init__(self, docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+        self.writes = []
+
+    def find(self, query, projection=None):
+        return Cursor([dict(d) for d in self.docs.values() if matches(d, query)])
+
+    async def bulk_write(self, operations, ordered=True):
+        modified = 0
+        for operation in operations:
+            self.writes.append(operation._filter["_id"])
+            doc = self.docs[operation._filter["_id"]]
+            for path, value in operation._doc["$set"].items():
+                if path == "loan_result.matched_lenders":
+                    if doc["loan_result"].get("matched_lenders") != value:
+                        modified += 1
+                    doc["loan_result"]["matched_lenders"] = value
+                else:
+                    doc[path] = value
+        return SimpleNamespace(modified_count=modified)
+
+class Checkpoints:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    async def delete_one(self, query):
+        self.docs.pop(query["_id"], None)
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs.setdefault(query["_id"], {}).update(update["$set"])
+
+def database(docs):
+    return {"loan_applications": Applications(docs), CHECKPOINT_COLLECTION: Checkpoints()}
+
+def application(i, matched, score=70):
+    return {"_id": i, "business_details": {"score": score}, "loan_result": {"matched_lenders": matched}}
+
+def match(application, loan_result):
+    if application["score"] < 0:
+        raise ValueError("bad application")
+    return ["A"] if application["score"] >= 50 else []
+
+def job(db, batch_size=2):
+    return RematchJob(db, match, lambda details: details, batch_size=batch_size)
+
+def test_only_changed_documents_are_written():
+    db = database([application(1, ["A"]), application(2, []), application(3, ["A"], score=10), application(4, ["A"])])
+    status = asyncio.run(job(db).run())
+    assert db["loan_applications"].writes == [2, 3]
+    assert (status["state"], status["processed"], status["updated"], status["failed"]) == ("completed", 4, 2, 0)
+    checkpoint = db[CHECKPOINT_COLLECTION].docs[JOB_ID]
+    assert checkpoint["completed"] and checkpoint["last_id"] == 4 and checkpoint["processed"] == 4
+
+def test_updated_counts_modified_documents_only(monkeypatch):
+    db = database([application(1, [])])
+
+    async def unmodified(operations, ordered=True):
+        return SimpleNamespace(modified_count=0)
+
+    monkeypatch.setattr(db["loan_applications"], "bulk_write", unmodified)
+    assert asyncio.run(job(db).run())["updated"] == 0
+
+def test_resumes_after_checkpoint():
+    db = database([application(i, []) for i in range(1, 6)])
+    db[CHECKPOINT_COLLECTION].docs[JOB_ID] = {"last_id": 3, "processed": 3, "updated": 3, "completed": False}
+    status = asyncio.run(job(db).run())
+    assert db["loan_applications"].writes == [4, 5]
+    assert (status["processed"], status["updated"]) == (5, 5)
+
+def test_completed_checkpoint_starts_over():
+    db = database([application(i, []) for i in range(1, 4)])
+    db[CHECKPOINT_COLLECTION].docs[JOB_ID] = {"last_id": 3, "processed": 3, "updated": 0, "completed": True}
+    assert asyncio.run(job(db).run())["processed"] == 3
+
+def test_restart_ignores_checkpoint():
+    db = database([application(i, []) for i in range(1, 4)])
+    db[CHECKPOINT_COLLECTION].docs[JOB_ID] = {"last_id": 2, "processed": 2, "updated": 0, "completed": False}
+    assert asyncio.run(job(db).run(restart=True))["processed"] == 3
+
+def test_failed_documents_are_retried_on_resume():
+    db = database([application(1, []), application(2, [], score=-1), application(3, [])])
+    first = job(db, batch_size=1)
+
+    async def interrupted():
+        # Stop after the failing document's batch has been checkpointed
+        original = first._save_checkpoint
+        async def save(completed=False):
+            await original(completed)
+            if first.last_id == 2:
+                raise asyncio.CancelledError
+        first._save_checkpoint = save
+        await first.run()
+
+    try:
+        asyncio.run(interrupted())
+    except asyncio.CancelledError:
+        pass
+    checkpoint = db[CHECKPOINT_COLLECTION].docs[JOB_ID]
+    assert checkpoint["failed_ids"] == [2] and checkpoint["last_id"] == 2
+
+    db["loan_applications"].docs[2]["business_details"]["score"] = 70
+    status = asyncio.run(job(db, batch_size=1).run())
+    assert db["loan_applications"].docs[2]["loan_result"]["matched_lenders"] == ["A"]
+    assert (status["processed"], status["failed"]) == (3, 0)
+    assert db[CHECKPOINT_COLLECTION].docs[JOB_ID]["failed_ids"] == []
+
+def test_failed_ids_capped(monkeypatch):
+    monkeypatch.setattr(rematch, "MAX_FAILED_IDS", 2)
+    db = database([application(i, [], score=-1) for i in range(1, 5)])
+    status = asyncio.run(job(db).run())
+    assert status["failed"] == 4
+    assert db[CHECKPOINT_COLLECTION].docs[JOB_ID]["failed_ids"] == [3, 4]
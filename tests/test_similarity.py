@@ -0,0 +1,84 @@
+import pytest
+
+from similarity import SimilarityIndex, format_examples, reuse_analysis
+
+def details(**overrides):
+    base = {
+        "business_name": "Acme Widgets", "industry": "Technology", "years_in_business": 5,
+        "annual_revenue": 1_000_000.0, "credit_score": 700, "monthly_cash_flow": 30_000.0,
+        "existing_debt": 100_000.0, "loan_amount_requested": 200_000.0,
+    }
+    return dict(base, **overrides)
+
+RESULT = {
+    "qualification_score": 80, "qualification_status": "Approved", "recommended_loan_amount": 180_000.0,
+    "interest_rate_range": "6% - 8%", "risk_assessment": "Low",
+    "ai_analysis": "Acme Widgets shows strong cash flow.",
+    "key_strengths": ["Acme's long-standing contracts"], "key_concerns": ["Acme's customer concentration"],
+    "improvement_suggestions": ["Acme should diversify"],
+}
+
+def test_nearest_neighbour_first():
+    index = SimilarityIndex()
+    index.add("far", details(credit_score=550, annual_revenue=90_000.0), RESULT)
+    index.add("near", details(credit_score=705), RESULT)
+    neighbours = index.query(details(), k=2)
+    assert [n.application_id for n in neighbours] == ["near", "far"]
+    assert neighbours[0].distance < neighbours[1].distance
+
+def test_other_industry_is_penalised():
+    index = SimilarityIndex()
+    index.add("retail", details(industry="Retail"), RESULT)
+    index.add("tech", details(credit_score=720), RESULT)
+    assert index.query(details(), k=1)[0].application_id == "tech"
+
+def test_reuse_never_copies_another_applicants_text():
+    index = SimilarityIndex()
+    index.add("prior", details(), RESULT)
+    neighbour = index.query(details(), k=1)[0]
+    reused = reuse_analysis(neighbour, details(business_name="Other Co", loan_amount_requested=100_000.0))
+    assert reused["qualification_status"] == "Approved"
+    assert reused["recommended_loan_amount"] == 90_000.0
+    assert reused["reused_from"] == "prior"
+    text = " ".join([reused["analysis_summary"], *reused["key_strengths"], *reused["key_concerns"],
+                     *reused["improvement_suggestions"]])
+    assert "Acme" not in text
+
+def test_index_is_bounded_and_overwrites_oldest():
+    index = SimilarityIndex(initial_capacity=2, max_size=3)
+    for i in range(5):
+        index.add(f"app-{i}", details(credit_score=600 + i), RESULT)
+    assert len(index) == 3
+    assert {n.application_id for n in index.query(details(), k=10)} == {"app-2", "app-3", "app-4"}
+
+def test_examples_only_include_verdicts():
+    index = SimilarityIndex()
+    index.add("prior", details(), RESULT)
+    examples = format_examples(index.query(details(), k=1))
+    assert "Approved" in examples and "Acme" not in examples
+
+def reference_distances(index, query):
+    from similarity import INDUSTRY_PENALTY, feature_vector
+    q = feature_vector(query)
+    distances = []
+    for slot, (application_id, stored, _) in enumerate(index._records):
+        x = index._vectors[:, slot]
+        squared = sum((a - b) ** 2 for a, b in zip(x, q))
+        if stored["industry"] != query["industry"]:
+            squared += INDUSTRY_PENALTY ** 2
+        distances.append((squared ** 0.5, application_id))
+    return sorted(distances)
+
+@pytest.mark.parametrize("k", [1, 3, 12])
+def test_query_matches_brute_force(k):
+    index = SimilarityIndex(initial_capacity=4, max_size=40)
+    for i in range(50):
+        index.add(f"app-{i}", details(industry="Retail" if i % 3 else "Technology", credit_score=500 + 7 * i,
+                                      annual_revenue=200_000.0 + 37_000.0 * i), RESULT)
+    query = details(credit_score=640)
+    expected = reference_distances(index, query)[:k]
+    neighbours = index.query(query, k)
+    assert [n.application_id for n in neighbours] == [application_id for _, application_id in expected]
+    assert [n.distance for n in neighbours] == pytest.approx([d for d, _ in expected], abs=1e-3)
+    # Scratch buffers are reused; a second query gives the same answer
+    assert [n.application_id for n in index.query(query, k)] == [n.application_id for n in neighbours]
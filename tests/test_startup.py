@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+from benchmarks import startup
+
+@pytest.fixture(scope="module")
+def server_import():
+    return startup.measure_import()
+
+# Opt-in: a loaded CI runner can blow a wall-clock budget at random
+@pytest.mark.skipif(not os.environ.get('RUN_TIMING_TESTS'), reason="timing test; set RUN_TIMING_TESTS=1")
+def test_import_within_budget(server_import):
+    import_ms, _, _ = server_import
+    assert import_ms <= startup.IMPORT_BUDGET_MS
+
+def test_heavy_modules_not_imported_eagerly(server_import):
+    _, _, loaded = server_import
+    assert not set(startup.FORBIDDEN_AT_IMPORT) & loaded
@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+import metrics
+from structured_output import IncrementalJSONParser, parse_analysis
+
+ANALYSIS = {
+    "qualification_score": 78,
+    "qualification_status": "Conditional",
+    "recommended_loan_amount": 150000.0,
+    "interest_rate_range": "7.0% - 9.5%",
+    "risk_assessment": "Medium",
+    "analysis_summary": "Solid revenue with moderate leverage.",
+    "key_strengths": ["Revenue growth"],
+    "key_concerns": ["Debt load"],
+    "improvement_suggestions": ["Reduce debt"],
+}
+
+DEFAULTS = dict(ANALYSIS, qualification_score=75, recommended_loan_amount=160000.0)
+
+def with_fields(**fields):
+    return json.dumps(dict(ANALYSIS, **fields))
+
+def test_direct_json():
+    analysis, outcome = parse_analysis(json.dumps(ANALYSIS))
+    assert outcome == "direct"
+    assert analysis == ANALYSIS
+
+def test_fenced_json_with_prose():
+    text = f"Here is my assessment:\n```json\n{json.dumps(ANALYSIS)}\n```\nLet me know."
+    analysis, outcome = parse_analysis(text)
+    assert outcome == "extracted"
+    assert analysis["qualification_score"] == 78
+
+def test_trailing_comma_repaired():
+    text = json.dumps(ANALYSIS)[:-1] + ",}"
+    analysis, outcome = parse_analysis("Result: " + text)
+    assert outcome == "repaired"
+    assert analysis["risk_assessment"] == "Medium"
+
+def test_truncated_response_filled_from_defaults():
+    text = json.dumps(ANALYSIS)
+    truncated = text[:text.index('"analysis_summary"') + 30]
+    analysis, outcome = parse_analysis(truncated, defaults=DEFAULTS)
+    assert outcome in ("repaired", "partial")
+    assert analysis["qualification_score"] == 78
+
+def test_no_json():
+    assert parse_analysis("I cannot assess this application.") == (None, "no_json")
+
+@pytest.mark.parametrize("score", [None, [80], {"value": 80}, "high", "inf", True])
+def test_non_numeric_score_is_a_validation_failure(score):
+    before = metrics.get_counter("llm_parse_total", outcome="partial")
+    analysis, outcome = parse_analysis(with_fields(qualification_score=score), defaults=DEFAULTS)
+    assert outcome == "partial"
+    assert analysis["qualification_score"] == 75
+    assert analysis["analysis_summary"] == ANALYSIS["analysis_summary"]
+    assert metrics.get_counter("llm_parse_total", outcome="partial") == before + 1
+
+def test_non_numeric_score_without_defaults_is_invalid():
+    assert parse_analysis(with_fields(qualification_score=None)) == (None, "invalid")
+
+@pytest.mark.parametrize("score, expected", [("85%", 85), (79.6, 80), (" 64 ", 64)])
+def test_score_normalisation(score, expected):
+    analysis, _ = parse_analysis(with_fields(qualification_score=score))
+    assert analysis["qualification_score"] == expected
+
+@pytest.mark.parametrize("amount, expected", [
+    ("$250k", 250_000.0),
+    ("1.5M", 1_500_000.0),
+    ("$1.2 million", 1_200_000.0),
+    ("250,000", 250_000.0),
+    ("USD 90000", 90_000.0),
+    ("120000 dollars", 120_000.0),
+    (175000, 175_000.0),
+])
+def test_amounts(amount, expected):
+    analysis, outcome = parse_analysis(with_fields(recommended_loan_amount=amount))
+    assert outcome == "direct"
+    assert analysis["recommended_loan_amount"] == pytest.approx(expected)
+
+@pytest.mark.parametrize("amount", ["about 250k or so", "250-300k", "N/A", ""])
+def test_unrecognised_amount_falls_back(amount):
+    analysis, outcome = parse_analysis(with_fields(recommended_loan_amount=amount), defaults=DEFAULTS)
+    assert outcome == "partial"
+    assert analysis["recommended_loan_amount"] == DEFAULTS["recommended_loan_amount"]
+
+def test_labels_and_lists_normalised():
+    analysis, _ = parse_analysis(with_fields(qualification_status=" approved", risk_assessment="LOW",
+                                             key_strengths="Strong brand", key_concerns=None,
+                                             improvement_suggestions=3))
+    assert analysis["qualification_status"] == "Approved"
+    assert analysis["risk_assessment"] == "Low"
+    assert analysis["key_strengths"] == ["Strong brand"]
+    assert analysis["key_concerns"] == []
+    assert analysis["improvement_suggestions"] == ["3"]
+
+def test_incremental_parser_across_chunks():
+    text = "Sure! " + json.dumps(ANALYSIS) + " trailing prose"
+    parser = IncrementalJSONParser()
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+    completed_at = next(i for i, chunk in enumerate(chunks) if parser.feed(chunk))
+    assert completed_at < len(chunks) - 1
+    assert parser.result() == (ANALYSIS, "extracted")
+
+def test_incremental_parser_ignores_braces_in_strings():
+    parser = IncrementalJSONParser()
+    parser.feed('{"analysis_summary": "uses {braces} and \\"quotes\\"", "qualification_score": 5}')
+    assert parser.complete
+    assert parser.result()[0]["qualification_score"] == 5
@@ -0,0 +1,133 @@
+import asyncio
+import re
+
+import pytest
+
+import tenancy
+from tenancy import DEFAULT_TENANT, TenantRouter, application_namespace, namespace_tenant, resolve_tenant
+
+@pytest.fixture(autouse=True)
+def allowed(monkeypatch):
+    monkeypatch.setattr(tenancy, "TENANTS", {"acme", "globex"})
+
+def test_missing_tenant_is_default():
+    assert resolve_tenant(None) == DEFAULT_TENANT
+    assert resolve_tenant("") == DEFAULT_TENANT
+
+def test_listed_tenant_normalized():
+    assert resolve_tenant(" ACME ") == "acme"
+
+def test_unlisted_tenant_rejected():
+    with pytest.raises(ValueError, match="Unknown tenant"):
+        resolve_tenant("initech")
+
+def test_without_tenants_only_default_accepted(monkeypatch):
+    monkeypatch.setattr(tenancy, "TENANTS", set())
+    assert resolve_tenant(DEFAULT_TENANT) == DEFAULT_TENANT
+    with pytest.raises(ValueError):
+        resolve_tenant("acme")
+
+def test_malformed_tenant_rejected():
+    for value in ("../admin", "a" * 33, "-acme", "ac me"):
+        with pytest.raises(ValueError):
+            resolve_tenant(value)
+
+class FakeDatabase:
+    def __init__(self, name, client=None):
+        self.name = name
+        self.client = client
+        self.read_preference = "primary"
+
+class FakeClient:
+    def __getitem__(self, name):
+        return FakeDatabase(name, self)
+
+    def get_database(self, name, read_preference=None):
+        return FakeDatabase(name, self)
+
+def router(storage):
+    client = FakeClient()
+    return TenantRouter(client["loans"], client["loans"], storage=storage)
+
+def test_default_tenant_keeps_original_collections():
+    store = router("collection").store()
+    assert (store.db.name, store.hot, store.archive) == ("loans", "loan_applications", "loan_applications_archive")
+
+def test_collection_storage_names():
+    store = router("collection").store("acme")
+    assert (store.db.name, store.hot, store.archive) == (
+        "loans", "loan_applications__acme", "loan_applications_archive__acme")
+
+def test_database_storage_names():
+    store = router("database").store("acme")
+    assert (store.db.name, store.read_db.name, store.hot) == ("loans__acme", "loans__acme", "loan_applications")
+
+def test_unknown_storage_rejected():
+    with pytest.raises(ValueError):
+        router("bucket")
+
+def test_failed_index_creation_backs_off(monkeypatch):
+    now = [1000.0]
+    calls = []
+
+    async def failing(db, **collections):
+        calls.append(collections)
+        raise RuntimeError("mongo down")
+
+    monkeypatch.setattr(tenancy.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(tenancy.tiering, "ensure_indexes", failing)
+    tenants = router("collection")
+    store = tenants.store("acme")
+    asyncio.run(tenants.ensure_indexes(store))
+    asyncio.run(tenants.ensure_indexes(store))
+    assert len(calls) == 1
+
+    now[0] += tenancy.INDEX_RETRY_SECONDS
+    asyncio.run(tenants.ensure_indexes(store))
+    assert len(calls) == 2 and "acme" not in tenants.indexed
+
+def test_indexes_created_once(monkeypatch):
+    calls = []
+
+    async def succeed(db, **collections):
+        calls.append(collections)
+
+    monkeypatch.setattr(tenancy.tiering, "ensure_indexes", succeed)
+    tenants = router("collection")
+    store = tenants.store("acme")
+    for _ in range(3):
+        asyncio.run(tenants.ensure_indexes(store))
+    assert calls == [{"hot": "loan_applications__acme", "archive": "loan_applications_archive__acme"}]
+
+def matches(condition, value):
+    return re.search(condition["$regex"], value) is not None if isinstance(condition, dict) else condition == value
+
+def test_namespace_matches_every_tenant_collection():
+    match = application_namespace("loans", "collection")
+    assert matches(match["ns.coll"], "loan_applications")
+    assert matches(match["ns.coll"], "loan_applications__acme")
+    assert not matches(match["ns.coll"], "loan_applications_archive")
+
+def test_namespace_matches_every_tenant_database():
+    match = application_namespace("loans", "database")
+    assert matches(match["ns.db"], "loans") and matches(match["ns.db"], "loans__acme")
+    assert not matches(match["ns.db"], "loansx")
+
+def test_namespace_tenant_inverts_naming():
+    assert namespace_tenant({"db": "loans", "coll": "loan_applications__acme"}, "loans", "collection") == "acme"
+    assert namespace_tenant({"db": "loans", "coll": "loan_applications"}, "loans", "collection") == DEFAULT_TENANT
+    assert namespace_tenant({"db": "loans__acme", "coll": "loan_applications"}, "loans", "database") == "acme"
+    assert namespace_tenant({"db": "loans", "coll": "loan_applications"}, "loans", "database") == DEFAULT_TENANT
+
+@pytest.mark.parametrize("argv", [
+    ["--tenant", "acme"],
+    ["--tenant", "acme", "--query", "{}"],
+    ["--tenant", "acme", "--query", "not json"],
+    ["--tenant", "acme", "--all", "--query", '{"business_details.brand": "acme"}'],
+    ["--tenant-field", "business_details.brand", "--all"],
+])
+def test_migration_refuses_unscoped_moves(monkeypatch, capsys, argv):
+    monkeypatch.setattr("sys.argv", ["tenancy.py", *argv])
+    with pytest.raises(SystemExit) as exc:
+        tenancy.main()
+    assert exc.value.code == 2
@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import bson
+
+from tiering import compact_document, expand_document
+
+def stored_application():
+    created_at = datetime(2024, 1, 15, 12, 30)
+    return {
+        "_id": bson.ObjectId(),
+        "application_id": "0b8f6a2e-1111-4c3a-9d7e-5a2b3c4d5e6f",
+        "business_details": {"business_name": "Acme", "industry": "Retail", "credit_score": 690,
+                             "annual_revenue": 500000.0, "contact_email": "a@acme.test"},
+        "loan_result": {
+            "application_id": "0b8f6a2e-1111-4c3a-9d7e-5a2b3c4d5e6f",
+            "qualification_score": 72,
+            "qualification_status": "Conditional",
+            "key_strengths": ["Steady revenue"] * 20,
+            "matched_lenders": [{"lender_name": "Beta", "match_score": 60}],
+            "created_at": created_at,
+        },
+        "analysis_source": "llm",
+        "created_at": created_at,
+    }
+
+def test_round_trip_restores_hot_document():
+    doc = stored_application()
+    restored = expand_document(compact_document(doc))
+    expected = {k: v for k, v in doc.items() if k != "_id"}
+    assert restored == expected
+
+def test_archive_schema_keeps_queryable_fields():
+    doc = stored_application()
+    archived = compact_document(doc)
+    assert set(archived) == {"_id", "c", "s", "q", "z"}
+    assert archived["_id"] == doc["application_id"]
+    assert archived["c"] == doc["created_at"]
+    assert (archived["s"], archived["q"]) == ("Conditional", 72)
+
+def test_archived_document_is_smaller():
+    doc = stored_application()
+    assert len(bson.encode(compact_document(doc))) < len(bson.encode(doc))
+
+def test_compaction_does_not_mutate_source():
+    doc = stored_application()
+    compact_document(doc)
+    assert doc["loan_result"]["application_id"] == doc["application_id"]
+    assert "created_at" in doc["loan_result"]
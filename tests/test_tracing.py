@@ -0,0 +1,34 @@
+import pytest
+
+import tracing
+from tracing import _wants_profile
+
+@pytest.fixture(autouse=True)
+def profiling_enabled(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_PROFILE_ENABLED", True)
+
+def admin(key):
+    return key == "s3cret"
+
+def scope(query=b"", **headers):
+    return {"query_string": query, "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]}
+
+def test_profile_requires_admin_key():
+    assert _wants_profile(scope(b"profile=1", x_admin_key="s3cret"), admin)
+    assert _wants_profile(scope(x_profile="1", x_admin_key="s3cret"), admin)
+    assert not _wants_profile(scope(b"profile=1"), admin)
+    assert not _wants_profile(scope(x_profile="1", x_admin_key="wrong"), admin)
+
+def test_profile_refused_without_authorizer():
+    assert not _wants_profile(scope(b"profile=1", x_admin_key="s3cret"), None)
+
+def test_profile_disabled(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_PROFILE_ENABLED", False)
+    assert not _wants_profile(scope(b"profile=1", x_admin_key="s3cret"), admin)
+
+@pytest.mark.parametrize("query", [b"noprofile=1", b"profile=10", b"profile=0", b"x=profile=1"])
+def test_profile_query_parsed_exactly(query):
+    assert not _wants_profile(scope(query, x_admin_key="s3cret"), admin)
+
+def test_profile_query_among_other_parameters():
+    assert _wants_profile(scope(b"limit=5&profile=1", x_admin_key="s3cret"), admin)
@@ -0,0 +1,250 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+
+import metrics
+import webhooks
+from webhooks import OUTBOX_COLLECTION, WebhookDispatcher
+
+PARTNER = "https://partner.example/hooks?token=s3cret"
+LENDER = "https://lender.example:8443/decisions"
+
+def matches(doc, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(matches(doc, option) for option in condition):
+                return False
+            continue
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+                if op == "$lte" and not (value is not None and value <= operand):
+                    return False
+                if op == "$lt" and not (value is not None and value < operand):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+class Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs.sort(key=lambda d: d[field], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+class Outbox:
+    """In-memory stand-in for the webhook_outbox collection"""
+
+    def __init__(self):
+        self.docs = []
+
+    async def insert_many(self, docs):
+        for doc in docs:
+            self.docs.append({"_id": len(self.docs), **doc})
+
+    def find(self, query, projection=None):
+        return Cursor([dict(d) for d in self.docs if matches(d, query)])
+
+    def _apply(self, doc, update):
+        doc.update(update.get("$set", {}))
+        for field, amount in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + amount
+        for field in update.get("$unset", {}):
+            doc.pop(field, None)
+
+    async def update_many(self, query, update):
+        for doc in self.docs:
+            if matches(doc, query):
+                self._apply(doc, update)
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            await self.update_many(operation._filter, operation._doc)
+
+    def aggregate(self, pipeline):
+        match, group = pipeline[0]["$match"], pipeline[1]["$group"]
+        field = group["_id"].lstrip("$")
+        counts = {}
+        for doc in self.docs:
+            if matches(doc, match):
+                counts[doc[field]] = counts.get(doc[field], 0) + 1
+        return Cursor([{"_id": key, "count": count} for key, count in counts.items()])
+
+    def status(self, endpoint=None):
+        return [d["status"] for d in self.docs if endpoint is None or d["endpoint"] == endpoint]
+
+def dispatcher(handler, **options):
+    d = WebhookDispatcher(**options)
+    d.db = {OUTBOX_COLLECTION: Outbox()}
+    d.http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return d
+
+def outbox(d) -> Outbox:
+    return d.db[OUTBOX_COLLECTION]
+
+LOAN_RESULT = {
+    "qualification_status": "Approved", "qualification_score": 80, "recommended_loan_amount": 100000.0,
+    "interest_rate_range": "6% - 8%", "risk_assessment": "Low", "created_at": datetime(2024, 1, 1),
+    "matched_lenders": [{"lender_name": "A", "match_score": 90.0}],
+}
+
+async def enqueue(d, count, endpoints):
+    for i in range(count):
+        await d.enqueue(d.db, f"app-{i}", LOAN_RESULT, endpoints)
+
+async def cycle(d):
+    claimed = await d.deliver_due()
+    await d.join()
+    return claimed
+
+def test_entries_batched_per_endpoint():
+    bodies = []
+
+    def handler(request):
+        bodies.append((request.url.host, json.loads(request.content)))
+        return httpx.Response(200)
+
+    async def run():
+        d = dispatcher(handler, batch_size=2)
+        await enqueue(d, 3, [PARTNER, LENDER])
+        assert await cycle(d) == 6
+        return d
+
+    d = asyncio.run(run())
+    sizes = sorted((host, len(body["events"])) for host, body in bodies)
+    assert sizes == [("lender.example", 1), ("lender.example", 2), ("partner.example", 1), ("partner.example", 2)]
+    assert set(outbox(d).status()) == {"delivered"}
+    assert all(doc["attempts"] == 1 and "claimed_by" not in doc for doc in outbox(d).docs)
+
+def test_server_error_backs_off():
+    async def run():
+        d = dispatcher(lambda request: httpx.Response(503))
+        await enqueue(d, 1, [PARTNER])
+        await cycle(d)
+        # Not due again until the backoff has passed
+        assert await cycle(d) == 0
+        return d
+
+    d = asyncio.run(run())
+    entry = outbox(d).docs[0]
+    assert entry["status"] == "pending" and entry["attempts"] == 1 and entry["last_error"] == "HTTP 503"
+    assert entry["next_attempt_at"] > datetime.utcnow()
+
+@pytest.mark.parametrize("status, outcome", [(400, "dead"), (410, "dead"), (408, "pending"), (429, "pending")])
+def test_client_errors_dead_letter_except_timeouts_and_throttling(status, outcome):
+    async def run():
+        d = dispatcher(lambda request: httpx.Response(status))
+        await enqueue(d, 1, [PARTNER])
+        await cycle(d)
+        return d
+
+    assert outbox(asyncio.run(run())).status() == [outcome]
+
+def test_dead_after_max_attempts(monkeypatch):
+    monkeypatch.setattr(webhooks, "WEBHOOK_MAX_ATTEMPTS", 2)
+
+    async def run():
+        d = dispatcher(lambda request: httpx.Response(500))
+        await enqueue(d, 1, [PARTNER])
+        for _ in range(2):
+            outbox(d).docs[0]["next_attempt_at"] = datetime.utcnow() - timedelta(seconds=1)
+            await cycle(d)
+        return d
+
+    entry = outbox(asyncio.run(run())).docs[0]
+    assert entry["status"] == "dead" and entry["attempts"] == 2 and "dead_at" in entry
+
+def test_per_destination_concurrency_bounded():
+    in_flight, peak = [0], [0]
+
+    async def handler(request):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        in_flight[0] -= 1
+        return httpx.Response(200)
+
+    async def run():
+        d = dispatcher(handler, batch_size=1, per_destination=2)
+        await enqueue(d, 6, [PARTNER])
+        await cycle(d)
+        return d
+
+    d = asyncio.run(run())
+    assert peak[0] == 2
+    assert outbox(d).status() == ["delivered"] * 6
+
+def test_expired_lease_is_reclaimed():
+    async def run():
+        d = dispatcher(lambda request: httpx.Response(200))
+        await enqueue(d, 2, [PARTNER])
+        now = datetime.utcnow()
+        # Claimed by a worker that died, and by one still within its lease
+        outbox(d).docs[0].update(status="sending", claimed_by="dead", lease_expires=now - timedelta(seconds=1))
+        outbox(d).docs[1].update(status="sending", claimed_by="alive", lease_expires=now + timedelta(seconds=60))
+        assert await cycle(d) == 1
+        return d
+
+    assert outbox(asyncio.run(run())).status() == ["delivered", "sending"]
+
+def test_slow_endpoint_does_not_hold_up_others():
+    release = None
+
+    async def handler(request):
+        if request.url.host == "partner.example":
+            await release.wait()
+        return httpx.Response(200)
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        d = dispatcher(handler)
+        await enqueue(d, 1, [PARTNER, LENDER])
+        await d.deliver_due()
+        await asyncio.wait_for(d.deliveries[LENDER], 1)
+        assert outbox(d).status(LENDER) == ["delivered"]
+        assert outbox(d).status(PARTNER) == ["sending"]
+
+        # The busy endpoint isn't claimed again while its delivery runs
+        await enqueue(d, 1, [PARTNER])
+        assert await d.deliver_due() == 0
+        release.set()
+        await d.join()
+        assert await cycle(d) == 1
+        return d
+
+    assert outbox(asyncio.run(run())).status(PARTNER) == ["delivered", "delivered"]
+
+def test_backlog_gauge_labelled_by_host():
+    async def run():
+        d = dispatcher(lambda request: httpx.Response(200))
+        await enqueue(d, 2, [PARTNER, LENDER])
+        await d.report_backlog()
+        return d
+
+    d = asyncio.run(run())
+    assert d.backlog == 4
+    rendered = metrics.render()
+    assert 'webhook_backlog{endpoint_host="partner.example"} 2' in rendered
+    assert 'webhook_backlog{endpoint_host="lender.example:8443"} 2' in rendered
+    assert "s3cret" not in rendered
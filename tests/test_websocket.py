@@ -0,0 +1,46 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import server
+import tiering
+from tenancy import TenantRouter
+
+class FakeDatabase:
+    name = "loans"
+
+@pytest.fixture
+def lookups(monkeypatch):
+    calls = []
+
+    async def find_application(db, application_id, **collections):
+        calls.append(application_id)
+        return None
+
+    monkeypatch.setattr(tiering, "find_application", find_application)
+    monkeypatch.setattr(server, "tenant_router", TenantRouter(FakeDatabase(), FakeDatabase()))
+    monkeypatch.setattr(server, "MAX_SUBSCRIPTIONS", 3)
+    return calls
+
+def subscribe(ws, ids, action="subscribe"):
+    ws.send_json({"action": action, "application_ids": ids})
+
+def test_resubscribing_skips_catch_up_reads(lookups):
+    with TestClient(server.app).websocket_connect("/api/ws/applications") as ws:
+        subscribe(ws, ["a", "b", "a"])
+        subscribe(ws, ["a", "b"])
+        subscribe(ws, ["c"])
+        ws.send_json({"action": "unsubscribe", "application_ids": ["c"]})
+        subscribe(ws, ["c"])
+        subscribe(ws, ["a"])
+    assert lookups == ["a", "b", "c", "c"]
+
+def test_too_many_subscriptions_closes_connection(lookups):
+    with TestClient(server.app).websocket_connect("/api/ws/applications") as ws:
+        subscribe(ws, ["a", "b"])
+        subscribe(ws, ["c", "d"])
+        with pytest.raises(WebSocketDisconnect) as exc:
+            ws.receive_json()
+    assert exc.value.code == 1008
+    assert lookups == ["a", "b"]
+    assert not server.broker.subscribers